@@ -0,0 +1,271 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any, Callable, NamedTuple, Optional, Sequence, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
+
+import budget as budget_rules
+from budget import BudgetPolicy, BudgetUsage, merge_budget
+from llm_cache import cache_policy_scope
+from prompting import SystemPrompt
+from routing import Signals, merge_signals, tool_calls_signal, is_set, TOOL_CALLS_PENDING
+from structured_log import get_logger, kv
+from tracing import traced_graph
+
+# One place that builds the llm <-> tools agents, instead of every script
+# copy-pasting AgentState / should_continue / call_llm / a tool executor.
+#
+#   agent = build_agent(AgentConfig(llm=llm, tools=tools, system_prompt=system_prompt))
+#
+# Shared concerns are wired in here once: the stable prompt prefix, routing
+# signals, per-node cache policy, parallel tool execution, the loop budget
+# (budget.py) and tracing.
+
+log = get_logger("agent_factory")
+
+
+class AgentState(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+    signals: Annotated[Signals, merge_signals]
+    budget: Annotated[BudgetUsage, merge_budget]
+
+
+def should_continue(state) -> bool:
+    """Default routing policy: go to the tools while the last LLM reply has tool calls."""
+    return is_set(state, TOOL_CALLS_PENDING)
+
+
+class AgentConfig(NamedTuple):
+    llm: Any
+    tools: Sequence = ()
+    system_prompt: Any = None            # SystemPrompt, str or None
+    agent_node: str = "llm"
+    tools_node: str = "tools"
+    route: Callable = should_continue    # state -> bool (True = run the tools)
+    cache: Optional[bool] = None         # per-node LLM cache policy; None = leave as is
+    max_workers: int = 8                 # parallel tool calls per step
+    budget: Any = None                   # BudgetPolicy; None = budget.default_policy(), False = no limits
+    finalize_node: str = "finalize"
+    state_schema: type = AgentState
+    trace: bool = True
+
+
+# =============== LLM NODE ===============
+def _prepare(system_prompt, messages):
+    return system_prompt.assemble(messages) if system_prompt is not None else list(messages)
+
+
+def make_llm_node(llm, system_prompt=None, cache: Optional[bool] = None, budget: BudgetPolicy = None):
+    """call_llm node (sync + async): sets the routing signal and charges the budget."""
+    if isinstance(system_prompt, str):
+        system_prompt = SystemPrompt(system_prompt)
+
+    def update(state, prompt, message, called_at):
+        result = {"messages": [message], **tool_calls_signal(message)}
+        if budget is not None:
+            result.update(budget_rules.charge(budget, state, prompt, message, called_at))
+        return result
+
+    def call_llm(state):
+        prompt = _prepare(system_prompt, state["messages"])
+        called_at = time.time()
+        if cache is None:
+            message = llm.invoke(prompt)
+        else:
+            with cache_policy_scope(cache):
+                message = llm.invoke(prompt)
+        return update(state, prompt, message, called_at)
+
+    async def acall_llm(state):
+        prompt = _prepare(system_prompt, state["messages"])
+        called_at = time.time()
+        if cache is None:
+            message = await llm.ainvoke(prompt)
+        else:
+            with cache_policy_scope(cache):
+                message = await llm.ainvoke(prompt)
+        return update(state, prompt, message, called_at)
+
+    return RunnableLambda(call_llm, afunc=acall_llm, name="call_llm")
+
+
+# =============== BUDGET ===============
+FINALIZE_INSTRUCTION = (
+    "The tool budget for this request is used up ({reason}). Do not call any more tools. "
+    "Answer the user's question now with the information gathered so far, and say briefly "
+    "if the answer may be incomplete."
+)
+FALLBACK_ANSWER = "Sorry, I could not finish this request within its {reason} budget. Please try a narrower question."
+
+
+def make_router(route):
+    """Wrap a bool routing policy: tools, finalize (budget used up) or end."""
+    def router(state) -> str:
+        if not route(state):
+            return "end"
+        if budget_rules.exhausted(state):
+            return "finalize"
+        return "tools"
+    return router
+
+
+def make_finalize_node(llm, system_prompt=None):
+    """Forced final answer once the budget runs out.
+
+    The pending tool calls get a "not run" result (providers reject a tool call
+    without a result), then the model answers once more with an instruction to
+    stop calling tools. Past the deadline no extra LLM call is made.
+    """
+    if isinstance(system_prompt, str):
+        system_prompt = SystemPrompt(system_prompt)
+
+    def skipped(state, reason):
+        return [
+            ToolMessage(tool_call_id=c["id"], name=c["name"], content=f"Not run: {reason} budget exhausted.")
+            for c in state["messages"][-1].tool_calls
+        ]
+
+    def answer(reply, reason):
+        content = reply.content if reply is not None else ""
+        return AIMessage(content=content or FALLBACK_ANSWER.format(reason=reason))  # tool calls are dropped
+
+    def result(reason, tool_messages, final):
+        budget_rules.record_exhausted(reason)
+        return {
+            "messages": tool_messages + [final],
+            **tool_calls_signal(final),
+            "budget": {"exhausted": reason},
+        }
+
+    def prompt(state, tool_messages, reason):
+        messages = list(state["messages"]) + tool_messages
+        return [*_prepare(system_prompt, messages), HumanMessage(content=FINALIZE_INSTRUCTION.format(reason=reason))]
+
+    def finalize(state):
+        reason = budget_rules.exhausted(state) or budget_rules.STEPS
+        tool_messages = skipped(state, reason)
+        reply = None
+        if reason != budget_rules.DEADLINE:
+            reply = llm.invoke(prompt(state, tool_messages, reason))
+        return result(reason, tool_messages, answer(reply, reason))
+
+    async def afinalize(state):
+        reason = budget_rules.exhausted(state) or budget_rules.STEPS
+        tool_messages = skipped(state, reason)
+        reply = None
+        if reason != budget_rules.DEADLINE:
+            reply = await llm.ainvoke(prompt(state, tool_messages, reason))
+        return result(reason, tool_messages, answer(reply, reason))
+
+    return RunnableLambda(finalize, afunc=afinalize, name="finalize")
+
+
+# =============== TOOL NODE ===============
+class ToolExecutor:
+    """Runs all tool calls of one LLM reply concurrently, results in call order."""
+
+    def __init__(self, tools: Sequence, max_workers: int = 8):
+        self.tools = {t.name: t for t in tools}
+        self.max_workers = max_workers
+        self._pool = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tools")
+        return self._pool
+
+    def _message(self, call, content) -> ToolMessage:
+        return ToolMessage(tool_call_id=call["id"], name=call["name"], content=str(content))
+
+    def run_one(self, call) -> ToolMessage:
+        log.info("calling tool", extra=kv(tool=call["name"], args=call["args"]))
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            log.warning("unknown tool", extra=kv(tool=call["name"]))
+            return self._message(call, f"Error: Tool '{call['name']}' not found. Select a tool from the list of available tools.")
+        try:
+            return self._message(call, tool.invoke(call["args"]))
+        except Exception as e:
+            log.warning("tool error", extra=kv(tool=call["name"], error=str(e)))
+            return self._message(call, f"Error executing tool: {str(e)}")
+
+    async def arun_one(self, call) -> ToolMessage:
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            return self.run_one(call)
+        log.info("calling tool", extra=kv(tool=call["name"], args=call["args"]))
+        try:
+            return self._message(call, await tool.ainvoke(call["args"]))
+        except Exception as e:
+            log.warning("tool error", extra=kv(tool=call["name"], error=str(e)))
+            return self._message(call, f"Error executing tool: {str(e)}")
+
+    def __call__(self, state):
+        calls = state["messages"][-1].tool_calls
+        if len(calls) == 1:
+            results = [self.run_one(calls[0])]
+        else:
+            # Worker threads start with an empty context: copy the caller's per call, so the
+            # run config (callbacks, LangSmith parent run) and tracing spans reach every tool
+            contexts = [contextvars.copy_context() for _ in calls]
+            results = list(self.pool.map(lambda context, call: context.run(self.run_one, call), contexts, calls))
+        log.debug("tools execution completed", extra=kv(count=len(results)))
+        return {"messages": results}
+
+    async def acall(self, state):
+        calls = state["messages"][-1].tool_calls
+        results = await asyncio.gather(*(self.arun_one(c) for c in calls))
+        log.debug("tools execution completed", extra=kv(count=len(results)))
+        return {"messages": list(results)}
+
+    def as_node(self):
+        return RunnableLambda(self, afunc=self.acall, name="execute_tools")
+
+
+# =============== GRAPH ===============
+def build_graph(config: AgentConfig) -> StateGraph:
+    """The uncompiled llm <-> tools graph, for callers that want to add nodes/edges."""
+    llm = config.llm.bind_tools(list(config.tools)) if config.tools else config.llm
+    policy = budget_rules.default_policy() if config.budget is None else (config.budget or None)
+    if not config.tools:
+        policy = None
+
+    graph = StateGraph(config.state_schema)
+    graph.add_node(config.agent_node, make_llm_node(llm, config.system_prompt, config.cache, policy))
+    graph.set_entry_point(config.agent_node)
+
+    if not config.tools:
+        graph.add_edge(config.agent_node, END)
+        return graph
+
+    graph.add_node(config.tools_node, ToolExecutor(config.tools, config.max_workers).as_node())
+    graph.add_edge(config.tools_node, config.agent_node)
+
+    if policy is None:
+        graph.add_conditional_edges(
+            config.agent_node,
+            config.route,
+            {True: config.tools_node, False: END}
+        )
+        return graph
+
+    graph.add_node(config.finalize_node, make_finalize_node(llm, config.system_prompt))
+    graph.add_conditional_edges(
+        config.agent_node,
+        make_router(config.route),
+        {"tools": config.tools_node, "finalize": config.finalize_node, "end": END}
+    )
+    graph.add_edge(config.finalize_node, END)
+    return graph
+
+
+def build_agent(config: AgentConfig):
+    """Compile (and trace) the agent described by `config`."""
+    compiled = build_graph(config).compile()
+    return traced_graph(compiled) if config.trace else compiled
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from structured_log import get_logger, kv
+from tracing import registry
+
+# Run many independent prompts through a compiled agent concurrently and
+# report per-case latency, LLM steps, tokens and tool usage.
+#
+# Concurrency is bounded twice: by the runner's semaphore (cases in flight)
+# and, underneath, by the shared rate limiter every model from models.py goes
+# through, so raising --concurrency never exceeds the provider quota.
+#
+#   python batch_runner.py react_3:agent cases.jsonl --concurrency 16 --out report.jsonl
+#
+# Case files: .jsonl ({"id": ..., "input": "...", "budget": {...}} per line) or
+# plain text (one prompt per line).
+
+DEFAULT_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+ANSWER_CHARS = 500        # answer text kept per case in the report
+
+log = get_logger("batch_runner")
+
+
+class Case(NamedTuple):
+    id: str
+    input: str
+    budget: Optional[dict] = None
+
+
+class CaseResult(NamedTuple):
+    id: str
+    input: str
+    ok: bool
+    seconds: float
+    steps: int
+    tokens: int
+    tool_calls: dict          # tool name -> calls
+    exhausted: Optional[str]  # budget limit that ran out, if any
+    answer: str
+    error: Optional[str] = None
+
+
+def as_case(item, index: int) -> Case:
+    if isinstance(item, Case):
+        return item
+    if isinstance(item, str):
+        return Case(str(index), item)
+    return Case(str(item.get("id", index)), item["input"], item.get("budget"))
+
+
+def load_cases(path: str) -> list:
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            cases.append(as_case(json.loads(line) if path.endswith(".jsonl") else line, i))
+    return cases
+
+
+# =============== RUNNING ===============
+def _inputs(case: Case) -> dict:
+    inputs = {"messages": [HumanMessage(content=case.input)]}
+    if case.budget:
+        inputs["budget"] = case.budget
+    return inputs
+
+
+def _result(case: Case, state: dict, seconds: float) -> CaseResult:
+    messages = state.get("messages", [])
+    replies = [m for m in messages if isinstance(m, AIMessage)]
+    # tools that actually ran (the finalize node answers skipped calls with "Not run: ...")
+    tools = Counter(
+        m.name for m in messages
+        if isinstance(m, ToolMessage) and not str(m.content).startswith("Not run:")
+    )
+    usage = state.get("budget") or {}
+    answer = replies[-1].content if replies else ""
+    return CaseResult(
+        id=case.id,
+        input=case.input,
+        ok=True,
+        seconds=seconds,
+        steps=usage.get("steps", len(replies)),
+        tokens=usage.get("tokens", 0),
+        tool_calls=dict(tools),
+        exhausted=usage.get("exhausted"),
+        answer=str(answer)[:ANSWER_CHARS],
+    )
+
+
+def _failed(case: Case, error: BaseException, seconds: float) -> CaseResult:
+    message = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+    return CaseResult(case.id, case.input, False, seconds, 0, 0, {}, None, "", message)
+
+
+async def arun_batch(agent, cases, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = None,
+                     config: dict = None, on_result=None) -> list:
+    """Run every case through `agent.ainvoke`, at most `concurrency` at a time; results in input order."""
+    cases = [as_case(c, i) for i, c in enumerate(cases)]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(case: Case) -> CaseResult:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                state = await asyncio.wait_for(agent.ainvoke(_inputs(case), config), timeout)
+                result = _result(case, state, time.perf_counter() - started)
+            except Exception as e:    # one bad case must not stop the batch
+                result = _failed(case, e, time.perf_counter() - started)
+                log.warning("case failed", extra=kv(case=case.id, error=result.error))
+        registry.observe("batch_case_seconds", result.seconds)
+        registry.inc("batch_cases_total", status="ok" if result.ok else "error")
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(run(c) for c in cases)))
+
+
+def run_batch(agent, cases, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = None,
+              config: dict = None, on_result=None) -> list:
+    """Blocking wrapper around arun_batch (for scripts)."""
+    return asyncio.run(arun_batch(agent, cases, concurrency, timeout, config, on_result))
+
+
+# =============== REPORT ===============
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summarize(results: list, wall_seconds: float = None) -> dict:
+    """Totals and latency / step percentiles over a batch."""
+    ok = [r for r in results if r.ok]
+    latencies = sorted(r.seconds for r in ok)
+    steps = sorted(r.steps for r in ok)
+    tools = Counter()
+    for r in ok:
+        tools.update(r.tool_calls)
+    summary = {
+        "cases": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "latency_p50_s": round(_percentile(latencies, 0.50), 3),
+        "latency_p95_s": round(_percentile(latencies, 0.95), 3),
+        "latency_max_s": round(latencies[-1], 3) if latencies else 0.0,
+        "steps_mean": round(sum(steps) / len(steps), 2) if steps else 0.0,
+        "steps_max": steps[-1] if steps else 0,
+        "tokens_total": sum(r.tokens for r in ok),
+        "tool_calls": dict(tools.most_common()),
+        "budget_exhausted": dict(Counter(r.exhausted for r in ok if r.exhausted)),
+    }
+    if wall_seconds is not None:
+        summary["wall_s"] = round(wall_seconds, 3)
+        summary["cases_per_s"] = round(len(results) / wall_seconds, 2) if wall_seconds else 0.0
+    return summary
+
+
+def write_report(results: list, summary: dict, path: str) -> None:
+    """One JSON line per case, then a final {"summary": ...} line."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r._asdict(), ensure_ascii=False) + "\n")
+        f.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+
+
+def print_report(results: list, summary: dict, out=sys.stdout) -> None:
+    print(f"{'id':<6} {'ok':<3} {'seconds':>8} {'steps':>5} {'tokens':>7}  tools", file=out)
+    for r in results:
+        tools = ", ".join(f"{name}x{n}" for name, n in r.tool_calls.items()) or (r.error or "-")
+        print(f"{r.id:<6} {'y' if r.ok else 'n':<3} {r.seconds:>8.2f} {r.steps:>5} {r.tokens:>7}  {tools}", file=out)
+    print(json.dumps(summary, indent=2), file=out)
+
+
+def load_agent(spec: str):
+    """'module:attribute', e.g. 'react_3:agent'."""
+    module, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module), attribute or "agent")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run prompts through an agent concurrently and report per-case metrics")
+    parser.add_argument("agent", help="module:attribute of the compiled agent, e.g. react_3:agent")
+    parser.add_argument("cases", help=".jsonl or .txt file with one case per line")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, help="seconds per case")
+    parser.add_argument("--out", help="write the per-case JSONL report here")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+
+    agent = load_agent(args.agent)
+    cases = load_cases(args.cases)
+    started = time.perf_counter()
+    results = run_batch(agent, cases, args.concurrency, args.timeout)
+    summary = summarize(results, time.perf_counter() - started)
+
+    if args.out:
+        write_report(results, summary, args.out)
+    if args.quiet:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(results, summary)
+    sys.exit(1 if summary["errors"] else 0)
@@ -0,0 +1,116 @@
+import argparse
+import os
+import sys
+import time
+from operator import add as add_messages
+from typing import Annotated, Sequence, TypedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.graph import StateGraph, END
+
+from agent_factory import AgentConfig, build_agent
+
+# Graph overhead per llm -> tools step: the hand-rolled graph the scripts used
+# to build vs. agent_factory.build_agent. The LLM is scripted (no network) so
+# only LangGraph + node + tool-executor overhead is measured.
+#
+#   python benchmarks/bench_graph_overhead.py --steps 10 --calls 3 --tool-ms 20
+
+
+class ScriptedLLM:
+    """Asks for `calls` tool calls per step until `steps` steps are done, then answers."""
+
+    def __init__(self, steps: int, calls: int):
+        self.steps = steps
+        self.calls = calls
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages, config=None, **kwargs):
+        done = sum(1 for m in messages if isinstance(m, AIMessage))
+        if done >= self.steps:
+            return AIMessage(content="done")
+        return AIMessage(content="", tool_calls=[
+            {"name": "work", "args": {"n": i}, "id": f"call_{done}_{i}"} for i in range(self.calls)
+        ])
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        return self.invoke(messages, config, **kwargs)
+
+
+def make_tool(tool_ms: float):
+    @tool
+    def work(n: int) -> int:
+        """Pretend to do some I/O."""
+        if tool_ms:
+            time.sleep(tool_ms / 1000)
+        return n
+    return work
+
+
+# The pre-factory shape (rag_db_test.py): sequential tool loop, operator.add state
+def legacy_agent(llm, tools):
+    class AgentState(TypedDict):
+        messages: Annotated[Sequence[BaseMessage], add_messages]
+
+    tools_dict = {t.name: t for t in tools}
+
+    def should_continue(state):
+        last = state["messages"][-1]
+        return hasattr(last, "tool_calls") and len(last.tool_calls) > 0
+
+    def call_llm(state):
+        return {"messages": [llm.invoke(list(state["messages"]))]}
+
+    def execute_tools(state):
+        results = []
+        for t in state["messages"][-1].tool_calls:
+            result = tools_dict[t["name"]].invoke(t["args"])
+            results.append(ToolMessage(tool_call_id=t["id"], name=t["name"], content=str(result)))
+        return {"messages": results}
+
+    graph = StateGraph(AgentState)
+    graph.add_node("llm", call_llm)
+    graph.add_node("tools", execute_tools)
+    graph.add_conditional_edges("llm", should_continue, {True: "tools", False: END})
+    graph.add_edge("tools", "llm")
+    graph.set_entry_point("llm")
+    return graph.compile()
+
+
+def factory_agent(llm, tools):
+    return build_agent(AgentConfig(llm=llm, tools=tools, trace=False))
+
+
+def run(agent, steps: int, repeat: int) -> float:
+    """Median seconds per llm -> tools step."""
+    inputs = {"messages": [HumanMessage(content="go")]}
+    agent.invoke(inputs)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        agent.invoke(inputs, {"recursion_limit": 2 * steps + 5})
+        timings.append((time.perf_counter() - started) / steps)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-step graph overhead: scripts vs agent_factory")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=1, help="tool calls per step")
+    parser.add_argument("--tool-ms", type=float, default=0.0, help="simulated tool latency")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    llm = ScriptedLLM(args.steps, args.calls)
+    tools = [make_tool(args.tool_ms)]
+
+    print(f"steps={args.steps} calls/step={args.calls} tool={args.tool_ms}ms")
+    for name, builder in [("legacy", legacy_agent), ("factory", factory_agent)]:
+        per_step = run(builder(llm, tools), args.steps, args.repeat)
+        print(f"{name:<8} {per_step * 1000:>9.3f} ms/step")
@@ -0,0 +1,103 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from vector_index import VectorIndex, normalize, recall_at_k
+
+# Quantized indexes (vector_index.py) vs. the exact float32 one: RAM per
+# vector, query latency and recall@k against the float32 results, with and
+# without the full-precision re-rank.
+#
+#   python benchmarks/bench_index.py --size 200000 --dim 768
+#   python benchmarks/bench_index.py --size 1000000 --dim 768 --queries 100
+#   python benchmarks/bench_index.py --index <dir from rag.py> --query-file queries.txt
+#
+# The corpus is synthetic but clustered (embeddings of real chunks are not
+# uniform on the sphere); queries are perturbed corpus vectors.
+
+
+def synthetic_corpus(size: int, dim: int, clusters: int = 256, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dim), dtype=np.float32))
+    vectors = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 100_000):
+        n = min(100_000, size - start)
+        noise = rng.standard_normal((n, dim), dtype=np.float32) * 0.6 / np.sqrt(dim)
+        vectors[start:start + n] = normalize(centers[rng.integers(0, clusters, n)] + noise)
+    return vectors
+
+
+def synthetic_queries(vectors, count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    return normalize(picked + rng.standard_normal(picked.shape, dtype=np.float32) * 0.3 / np.sqrt(vectors.shape[1]))
+
+
+def timed_queries(index, queries, k: int, **kwargs):
+    """(ids, median ms per single query)."""
+    ids, timings = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found, _ = index.search(query, k, **kwargs)
+        timings.append(time.perf_counter() - started)
+        ids.append(found)
+    timings.sort()
+    return np.array(ids), 1000 * timings[len(timings) // 2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="float32 vs float16 vs int8 index: RAM, latency, recall@k")
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", help="a saved index (e.g. rag.py's RAG_INDEX=int8 directory) instead of synthetic data")
+    parser.add_argument("--query-file", help="reference queries for --index, one per line (embedded with models.py)")
+    args = parser.parse_args()
+
+    if args.index:
+        from models import gemini_embeddings
+
+        index = VectorIndex.load(args.index)
+        with open(args.query_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        embeddings = gemini_embeddings()
+        queries = np.array([embeddings.embed_query(t) for t in texts], dtype=np.float32)
+        k = min(args.k, len(index))
+        print(f"{args.index}: {len(index)} x {index.dim} {index.kind}, {len(texts)} queries")
+        for rerank in (0, 4):
+            print(f"recall@{k} rerank={rerank}: {index.recall(queries, k, rerank=rerank):.3f}")
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="bench_index_")
+    vectors = synthetic_corpus(args.size, args.dim)
+    np.save(os.path.join(workdir, "vectors.npy"), vectors)
+    del vectors
+    vectors = np.load(os.path.join(workdir, "vectors.npy"), mmap_mode="r")
+    queries = synthetic_queries(vectors, args.queries)
+    print(f"{args.size} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+
+    reference = VectorIndex.build(np.asarray(vectors), "float32")
+    truth, exact_ms = timed_queries(reference, queries, args.k)
+
+    print(f"{'index':<16} {'RAM MB':>8} {'B/vector':>9} {'build s':>8} {'query ms':>9} {'recall@k':>9}")
+    print(f"{'float32':<16} {reference.nbytes / 1e6:>8.1f} {reference.nbytes // args.size:>9} {0:>8.2f} {exact_ms:>9.2f} {1:>9.3f}")
+    for kind in ("float16", "int8"):
+        started = time.perf_counter()
+        index = VectorIndex.build(vectors, kind)
+        build_s = time.perf_counter() - started
+        for rerank in (0, 4):
+            found, ms = timed_queries(index, queries, args.k, rerank=rerank)
+            label = f"{kind}+rerank{rerank}" if rerank else kind
+            print(f"{label:<16} {index.nbytes / 1e6:>8.1f} {index.nbytes // args.size:>9} {build_s:>8.2f} {ms:>9.2f} "
+                  f"{recall_at_k(found, truth):>9.3f}")
+
+    del vectors, reference, index
+    shutil.rmtree(workdir, ignore_errors=True)
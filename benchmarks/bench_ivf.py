@@ -0,0 +1,90 @@
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bench_index import synthetic_corpus, synthetic_queries, timed_queries
+from ivf_index import IVFIndex, default_nlist, train_kmeans
+from vector_index import VectorIndex, recall_at_k
+
+# IVF index (ivf_index.py): k-means training and list build time, then query
+# latency and recall@k against the exact float32 scan for a range of nprobe
+# values (the recall curve).
+#
+#   python benchmarks/bench_ivf.py --size 1000000 --dim 768
+#   python benchmarks/bench_ivf.py --size 200000 --nprobe 1 4 16 64 --csv ivf_curve.csv
+#
+# Uses the clustered synthetic corpus from bench_index.py.
+
+
+def fraction_scanned(index, queries, nprobe: int) -> float:
+    """Mean share of the vectors a query scans (= share of list_codes.npy it pages in)."""
+    sizes = index.list_sizes()
+    probed = np.argsort(-(queries @ index.centroids.T), axis=1)[:, :nprobe]
+    return float(sizes[probed].sum(axis=1).mean() / len(index))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF index: build time, query time and recall@k vs nprobe")
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, help="default ~4*sqrt(size)")
+    parser.add_argument("--kind", default="int8", choices=("float32", "float16", "int8"))
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--csv", help="write the recall curve here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ivf_")
+    path = os.path.join(workdir, "vectors.npy")
+    np.save(path, synthetic_corpus(args.size, args.dim))
+    vectors = np.load(path, mmap_mode="r")
+    queries = synthetic_queries(vectors, args.queries)
+    nlist = args.nlist or default_nlist(args.size)
+    print(f"{args.size} vectors x {args.dim} dims, nlist={nlist}, {args.kind} lists, {args.queries} queries, k={args.k}")
+
+    started = time.perf_counter()
+    centroids = train_kmeans(vectors, nlist)
+    train_s = time.perf_counter() - started
+    started = time.perf_counter()
+    index = IVFIndex.build(vectors, os.path.join(workdir, "ivf"), centroids, kind=args.kind)
+    build_s = time.perf_counter() - started
+    sizes = index.list_sizes()
+    print(f"train {train_s:.2f} s, build {build_s:.2f} s; list sizes min {sizes.min()} / median {int(np.median(sizes))} / max {sizes.max()}")
+
+    truth, flat_ms = timed_queries(VectorIndex(vectors, "float32"), queries, args.k)
+    print(f"exact float32 scan: {flat_ms:.2f} ms/query")
+
+    rows = []
+    print(f"{'nprobe':>6} {'scanned':>8} {'query ms':>9} {'speedup':>8} {'recall@k':>9}")
+    for nprobe in args.nprobe:
+        if nprobe > index.nlist:
+            continue
+        found, ms = timed_queries(index, queries, args.k, nprobe=nprobe)
+        row = {
+            "nprobe": nprobe,
+            "scanned": round(fraction_scanned(index, queries, nprobe), 4),
+            "query_ms": round(ms, 3),
+            "speedup": round(flat_ms / ms, 1) if ms else 0.0,
+            "recall": round(recall_at_k(found, truth), 4),
+        }
+        rows.append(row)
+        print(f"{nprobe:>6} {row['scanned']:>8.2%} {ms:>9.2f} {row['speedup']:>7}x {row['recall']:>9.3f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["nprobe"])
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"recall curve -> {args.csv}")
+
+    del vectors, index
+    shutil.rmtree(workdir, ignore_errors=True)
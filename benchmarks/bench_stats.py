@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import stats_engine
+from stats_engine import describe, describe_chunks, describe_source
+
+# list_statistics at scale: the old pure-Python version (sorted + min/max over
+# a list) vs. stats_engine in memory vs. stats_engine streaming from a .npy file.
+#
+#   python benchmarks/bench_stats.py --size 10000000
+#   python benchmarks/bench_stats.py --size 10000000 --skip-legacy
+
+
+def legacy_statistics(numbers):
+    """The list_statistics body before stats_engine (mean/median/range only)."""
+    sorted_nums = sorted(numbers)
+    n = len(numbers)
+    return {
+        "jumlah_data": n,
+        "minimum": min(numbers),
+        "maksimum": max(numbers),
+        "rata_rata": round(sum(numbers) / n, 2),
+        "median": sorted_nums[n//2] if n % 2 == 1 else (sorted_nums[n//2-1] + sorted_nums[n//2]) / 2,
+        "rentang": max(numbers) - min(numbers)
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    """Median seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def check(exact: dict, streamed: dict):
+    """Streaming stats must match the in-memory ones (quantiles within the bin width)."""
+    for key in ("count", "min", "max"):
+        assert exact[key] == streamed[key], (key, exact[key], streamed[key])
+    for key in ("mean", "variance"):
+        assert abs(exact[key] - streamed[key]) <= 1e-6 * max(1.0, abs(exact[key])), (key, exact[key], streamed[key])
+    for key, value in exact["quantiles"].items():
+        assert abs(value - streamed["quantiles"][key]) <= 2 * streamed["quantile_error"] + 1e-6, key
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="list_statistics: legacy vs NumPy vs streaming")
+    parser.add_argument("--size", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="the pure-Python run takes a while at 10^7")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.lognormal(mean=4.0, sigma=0.8, size=args.size)   # skewed, like order totals
+    print(f"values={args.size:,} chunk={args.chunk_size:,}")
+
+    if not args.skip_legacy:
+        numbers = data.tolist()
+        print(f"{'legacy':<16} {timed(lambda: legacy_statistics(numbers), args.repeat) * 1000:>10.1f} ms")
+        del numbers
+
+    exact = describe(data)
+    print(f"{'numpy':<16} {timed(lambda: describe(data), args.repeat) * 1000:>10.1f} ms")
+
+    chunks = lambda: (data[i:i + args.chunk_size] for i in range(0, data.size, args.chunk_size))
+    streamed = describe_chunks(chunks)
+    print(f"{'stream (array)':<16} {timed(lambda: describe_chunks(chunks), args.repeat) * 1000:>10.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(os.path.join(tmp, "values.npy"), data)
+        os.environ["STATS_DATA_DIR"] = tmp
+        run = lambda: describe_source("values.npy", streaming=True, chunk_size=args.chunk_size)
+        print(f"{'stream (.npy)':<16} {timed(run, args.repeat) * 1000:>10.1f} ms")
+
+    check(exact, streamed)
+    print(f"streaming matches in-memory (quantile error <= {streamed['quantile_error']:.4g}, "
+          f"{stats_engine.QUANTILE_BINS} bins)")
@@ -0,0 +1,347 @@
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# End-to-end benchmark suite for the agents, run offline against the fake
+# LLM/embeddings (models.py, LLM_BACKEND=fake).
+#
+#   python benchmarks/run.py                          # all scenarios
+#   python benchmarks/run.py --only text_to_sql --repeat 20
+#   python benchmarks/run.py --save-baseline          # write benchmarks/baseline.json
+#   python benchmarks/run.py --baseline benchmarks/baseline.json   # exit 1 on regression
+#
+# Every scenario has a setup (not timed) and a body (timed `repeat` times after
+# `warmup` runs). Results go to benchmarks/results/<timestamp>.json; limits per
+# scenario are in benchmarks/thresholds.json.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+THRESHOLDS = os.path.join(HERE, "thresholds.json")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+# Scripted replies of the fake model, keyed by a substring of the user turn
+FAKE_SCRIPT = {
+    # text-to-SQL prompt in rag_db_test_2.generate_sql_from_natural_language
+    "convert the natural language question to a SQL query": [
+        "SELECT c.city, COUNT(*) AS orders, COALESCE(SUM(o.total_amount), 0) AS total_sales "
+        "FROM orders o JOIN customers c ON c.customer_id = o.customer_id "
+        "WHERE o.status = 'Completed' GROUP BY c.city ORDER BY total_sales DESC"
+    ],
+    # react_3 tool loops
+    "sqrt(25)": [
+        {"tool_calls": [{"name": "calculator", "args": {"expression": "sqrt(25) + sin(3.14159/2) * 10"}}]},
+        "Hasilnya sekitar 15.",
+    ],
+    "Fibonacci": [
+        {"tool_calls": [{"name": "generate_fibonacci", "args": {"n": 8}}]},
+        "Ini 8 bilangan Fibonacci pertama.",
+    ],
+    "statistik": [
+        {"tool_calls": [{"name": "list_statistics", "args": {"numbers": [12, 15, 18, 20, 22, 25, 28, 30]}}]},
+        "Ini statistiknya.",
+    ],
+    "fahrenheit": [
+        {"tool_calls": [{"name": "unit_converter", "args": {"value": 100, "from_unit": "fahrenheit", "to_unit": "celsius"}}]},
+        "100 F = 37.78 C.",
+    ],
+    # Drafter turns (user inputs come from _drafter_inputs)
+    "ready to help you update a document": [{"tool_calls": [{"name": "update", "args": {"content": "Draft v0."}}]}],
+    "Edit turn": [{"tool_calls": [{"name": "update", "args": {"content": "Draft with an extra paragraph. " * 40}}]}],
+    "Save the document": [{"tool_calls": [{"name": "save", "args": {"filename": "bench_draft"}}]}],
+}
+
+REACT_CASES = [
+    "Hitung hasil dari sqrt(25) + sin(3.14159/2) * 10",
+    "Generate 8 bilangan Fibonacci pertama",
+    "Hitung statistik dari angka: [12, 15, 18, 20, 22, 25, 28, 30]",
+    "Konversi 100 fahrenheit ke celsius",
+]
+
+RETRIEVER_QUERIES = [
+    "How did the S&P 500 perform in 2024?",
+    "Which sectors led the market?",
+    "What happened to interest rates?",
+    "Nvidia stock performance",
+]
+
+SQL_QUERIES = [
+    "SELECT COUNT(*) FROM orders WHERE status = 'Completed'",
+    "SELECT strftime('%Y-%m', order_date) AS month, SUM(total_amount) FROM orders GROUP BY month",
+    "SELECT p.category, SUM(oi.quantity * oi.unit_price) FROM order_items oi "
+    "JOIN products p ON p.product_id = oi.product_id GROUP BY p.category",
+]
+
+
+def configure_env(workdir: str) -> None:
+    """Offline, quiet, uncached: must run before any project module is imported."""
+    script_path = os.path.join(workdir, "fake_script.json")
+    with open(script_path, "w", encoding="utf-8") as f:
+        json.dump(FAKE_SCRIPT, f)
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_SCRIPT": script_path,
+        "LLM_CACHE": "off",
+        "LOG_LEVEL": "WARNING",
+        "RAG_PERSIST_DIR": os.path.join(workdir, "chroma"),
+    })
+    os.environ.pop("TRACE_FILE", None)
+
+
+# =============== SCENARIOS ===============
+SCENARIOS = {}
+
+
+def scenario(name: str, repeat: int = 5, warmup: int = 1):
+    """Register `setup(ctx) -> body`; only body() is timed. body may return extra metrics."""
+    def decorator(setup):
+        SCENARIOS[name] = {"setup": setup, "repeat": repeat, "warmup": warmup}
+        return setup
+    return decorator
+
+
+@scenario("pdf_ingestion", repeat=3)
+def pdf_ingestion(ctx):
+    import rag
+
+    def body():
+        rag.persist_directory = tempfile.mkdtemp(dir=ctx["workdir"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            ctx["retriever"] = rag.build_retriever()
+        return {}
+    return body
+
+
+@scenario("retriever_query", repeat=10)
+def retriever_query(ctx):
+    import rag
+
+    if "retriever" not in ctx:
+        rag.persist_directory = tempfile.mkdtemp(dir=ctx["workdir"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            ctx["retriever"] = rag.build_retriever()
+    rag.retriever = ctx["retriever"]
+
+    def body():
+        chars = 0
+        for query in RETRIEVER_QUERIES:
+            chars += len(rag.retriever_tool.invoke({"query": query}))
+        return {"queries": len(RETRIEVER_QUERIES), "chars": chars}
+    return body
+
+
+def scale_database(src: str, dst: str, factor: int) -> dict:
+    """Copy sales_data.db and multiply customers/orders/order_items `factor` times."""
+    shutil.copyfile(src, dst)
+    conn = sqlite3.connect(dst)
+    (max_customer,) = conn.execute("SELECT MAX(customer_id) FROM customers").fetchone()
+    (max_order,) = conn.execute("SELECT MAX(order_id) FROM orders").fetchone()
+    (max_item,) = conn.execute("SELECT MAX(order_item_id) FROM order_items").fetchone()
+    for k in range(1, factor):
+        conn.execute(
+            "INSERT INTO customers SELECT customer_id + ?, name, email, city, country, registration_date "
+            "FROM customers WHERE customer_id <= ?", (k * max_customer, max_customer))
+        conn.execute(
+            "INSERT INTO orders SELECT order_id + ?, customer_id + ?, order_date, total_amount, status "
+            "FROM orders WHERE order_id <= ?", (k * max_order, k * max_customer, max_order))
+        conn.execute(
+            "INSERT INTO order_items SELECT order_item_id + ?, order_id + ?, product_id, quantity, unit_price "
+            "FROM order_items WHERE order_item_id <= ?", (k * max_item, k * max_order, max_item))
+    conn.commit()
+    counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("customers", "orders", "order_items")}
+    conn.close()
+    return counts
+
+
+@scenario("text_to_sql", repeat=10)
+def text_to_sql(ctx):
+    import rag_db_test_2
+
+    path = os.path.join(ctx["workdir"], "sales_scaled.db")
+    ctx["db_rows"] = scale_database(os.path.join(ROOT, "sales_data.db"), path, ctx["db_scale"])
+    rag_db_test_2.DATABASE_PATH = path
+
+    def body():
+        answer = rag_db_test_2.database_query_tool.invoke({"question": "Berapa total penjualan yang sudah selesai per kota?"})
+        return {"answer_chars": len(answer), **ctx["db_rows"]}
+    return body
+
+
+@scenario("execute_sql_query", repeat=10)
+def execute_sql(ctx):
+    import rag_db_test_2
+
+    path = os.path.join(ctx["workdir"], "sales_scaled.db")
+    if not os.path.exists(path):
+        ctx["db_rows"] = scale_database(os.path.join(ROOT, "sales_data.db"), path, ctx["db_scale"])
+    rag_db_test_2.DATABASE_PATH = path
+
+    def body():
+        rows = sum(len(rag_db_test_2.execute_sql_query(q)) for q in SQL_QUERIES)
+        return {"queries": len(SQL_QUERIES), "rows": rows}
+    return body
+
+
+@scenario("react_tool_loop", repeat=5)
+def react_tool_loop(ctx):
+    import react_3
+    from langchain_core.messages import HumanMessage
+
+    def body():
+        steps = 0
+        for case in REACT_CASES:
+            result = react_3.agent.invoke({"messages": [HumanMessage(content=case)]})
+            steps += (result.get("budget") or {}).get("steps", 0)
+        return {"cases": len(REACT_CASES), "llm_steps": steps}
+    return body
+
+
+def _drafter_inputs(edits: int):
+    return iter([f"Edit turn {i}: add a paragraph" for i in range(edits)] + ["Save the document"])
+
+
+@scenario("drafter_turns", repeat=5)
+def drafter_turns(ctx):
+    # drafter_2: its agent -> tools edge runs the update/save tool loop every turn
+    from langchain_core.messages import AIMessage
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import drafter_2
+    edits = 5
+    turns = edits + 2           # opening turn, the edits, save
+
+    def body():
+        drafter_2.document_content = ""
+        inputs = _drafter_inputs(edits)
+        original_input, cwd = builtins.input, os.getcwd()
+        builtins.input = lambda prompt="": next(inputs)
+        os.chdir(ctx["workdir"])
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                state = drafter_2.app.invoke({"messages": []}, {"recursion_limit": 4 * edits + 10})
+        finally:
+            builtins.input = original_input
+            os.chdir(cwd)
+        replies = sum(isinstance(m, AIMessage) for m in state["messages"])
+        chars = len(drafter_2.document_content)
+        # a run that stopped early would look fast and pass the threshold, so check it did the work
+        if replies != turns or not chars:
+            raise AssertionError(f"drafter ran {replies}/{turns} turns, document_chars={chars}")
+        return {"turns": replies, "document_chars": chars}
+    return body
+
+
+# =============== RUNNER ===============
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_scenario(name: str, ctx: dict, repeat: int = None) -> dict:
+    spec = SCENARIOS[name]
+    body = spec["setup"](ctx)
+    for _ in range(spec["warmup"]):
+        body()
+    timings, extra = [], {}
+    for _ in range(repeat or spec["repeat"]):
+        started = time.perf_counter()
+        extra = body() or {}
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(_percentile(timings, 0.95), 3),
+        "min_ms": round(min(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "metrics": extra,
+    }
+
+
+def check(results: dict, thresholds: dict, baseline: dict = None) -> list:
+    """Failures: absolute limits (max_median_ms) and growth vs. the baseline (max_regression)."""
+    failures = []
+    default = thresholds.get("default", {})
+    for name, result in results["scenarios"].items():
+        if "error" in result:
+            failures.append(f"{name}: {result['error']}")
+            continue
+        limits = {**default, **thresholds.get(name, {})}
+        if limits.get("max_median_ms") and result["median_ms"] > limits["max_median_ms"]:
+            failures.append(f"{name}: median {result['median_ms']:.1f} ms > limit {limits['max_median_ms']} ms")
+        before = (baseline or {}).get("scenarios", {}).get(name)
+        if before and "median_ms" in before and limits.get("max_regression") is not None:
+            allowed = before["median_ms"] * (1 + limits["max_regression"])
+            if result["median_ms"] > allowed:
+                failures.append(
+                    f"{name}: median {result['median_ms']:.1f} ms vs baseline {before['median_ms']:.1f} ms "
+                    f"(+{result['median_ms'] / before['median_ms'] - 1:.0%}, allowed +{limits['max_regression']:.0%})"
+                )
+    return failures
+
+
+def _load(path):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agent benchmark suite (offline, fake LLM)")
+    parser.add_argument("--only", nargs="*", help="scenario names (default: all)")
+    parser.add_argument("--repeat", type=int, help="override the per-scenario repeat count")
+    parser.add_argument("--db-scale", type=int, default=2000, help="multiply sales_data.db rows by this")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write {BASELINE}")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(SCENARIOS))
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    configure_env(workdir)
+    ctx = {"workdir": workdir, "db_scale": args.db_scale}
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scenarios": {},
+    }
+    try:
+        for name in args.only or SCENARIOS:
+            try:
+                results["scenarios"][name] = result = run_scenario(name, ctx, args.repeat)
+                print(f"{name:<20} median {result['median_ms']:>10.2f} ms   p95 {result['p95_ms']:>10.2f} ms   {result['metrics']}")
+            except Exception as e:
+                results["scenarios"][name] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"{name:<20} ERROR {type(e).__name__}: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(HERE, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        shutil.copyfile(out, BASELINE)
+    print(f"results: {out}")
+
+    failures = check(results, _load(THRESHOLDS) or {}, _load(args.baseline))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,107 @@
+import os
+import time
+from typing import NamedTuple, Optional, TypedDict
+
+from prompting import estimate_tokens
+from tracing import registry
+
+# Per-request budget for the llm <-> tools loop.
+#
+# The llm node counts every LLM call (steps) and its tokens into state["budget"];
+# the router checks the limits before going back to the tools. When a limit is
+# hit the agent goes to a "finalize" node instead, which answers with what it
+# has so far (no more tool calls), so a runaway loop ends with an answer rather
+# than a GraphRecursionError or a huge bill.
+#
+# Defaults come from AGENT_MAX_STEPS (default 8) / AGENT_MAX_TOKENS / AGENT_DEADLINE
+# (seconds), "0" meaning no limit for any of them;
+# a single request can override them in its input:
+#   agent.invoke({"messages": [...], "budget": {"max_steps": 3, "deadline": 20}})
+
+STEPS = "steps"
+TOKENS = "tokens"
+DEADLINE = "deadline"
+
+
+class BudgetPolicy(NamedTuple):
+    max_steps: Optional[int] = 8          # LLM calls per request
+    max_tokens: Optional[int] = None      # input + output tokens per request
+    deadline: Optional[float] = None      # wall-clock seconds per request
+
+
+def default_policy() -> BudgetPolicy:
+    def env(name, cast, default=None):
+        value = os.getenv(name)
+        if value in (None, ""):
+            return default
+        return cast(value) if value != "0" else None   # "0" = no limit
+
+    return BudgetPolicy(
+        max_steps=env("AGENT_MAX_STEPS", int, 8),
+        max_tokens=env("AGENT_MAX_TOKENS", int),
+        deadline=env("AGENT_DEADLINE", float),
+    )
+
+
+class BudgetUsage(TypedDict, total=False):
+    max_steps: int
+    max_tokens: int
+    deadline: float
+    steps: int
+    tokens: int
+    started: float
+    exhausted: str        # which limit ran out: steps | tokens | deadline
+
+
+def merge_budget(left: BudgetUsage | None, right: BudgetUsage | None) -> BudgetUsage:
+    """Reducer for the `budget` key: newer values overwrite older ones."""
+    if not left:
+        return dict(right or {})
+    if not right:
+        return left
+    return {**left, **right}
+
+
+def limits(policy: BudgetPolicy, usage: BudgetUsage | None) -> BudgetUsage:
+    """Policy defaults, overridden by limits passed in with the request."""
+    usage = usage or {}
+    return {
+        "max_steps": usage.get("max_steps", policy.max_steps),
+        "max_tokens": usage.get("max_tokens", policy.max_tokens),
+        "deadline": usage.get("deadline", policy.deadline),
+    }
+
+
+def used_tokens(prompt, message) -> int:
+    """Provider usage when reported, otherwise a ~4 chars/token estimate."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    return sum(estimate_tokens(getattr(m, "content", m)) for m in prompt) + estimate_tokens(message.content)
+
+
+def charge(policy: BudgetPolicy, state, prompt, message, called_at: float) -> dict:
+    """State update for one LLM call: steps + tokens consumed so far."""
+    usage = state.get("budget") or {}
+    return {"budget": {
+        **limits(policy, usage),
+        "started": usage.get("started") or called_at,
+        "steps": usage.get("steps", 0) + 1,
+        "tokens": usage.get("tokens", 0) + used_tokens(prompt, message),
+    }}
+
+
+def exhausted(state) -> Optional[str]:
+    """Name of the first limit that ran out, or None."""
+    usage = state.get("budget") or {}
+    if usage.get("max_steps") and usage.get("steps", 0) >= usage["max_steps"]:
+        return STEPS
+    if usage.get("max_tokens") and usage.get("tokens", 0) >= usage["max_tokens"]:
+        return TOKENS
+    if usage.get("deadline") and usage.get("started") and time.time() - usage["started"] >= usage["deadline"]:
+        return DEADLINE
+    return None
+
+
+def record_exhausted(reason: str) -> None:
+    registry.inc("agent_budget_exhausted_total", reason=reason)
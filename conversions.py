@@ -0,0 +1,183 @@
+import math
+from fractions import Fraction
+
+from data_sources import CHUNK_SIZE, open_source
+
+# Unit and date conversions for react_3's utility tools, single value or batch.
+#
+# Units: every unit is an affine map to its dimension's base unit
+# (value_in_base = value * scale + offset), and the (from, to) pairs are folded
+# into one (a, b) per pair at import time, so a conversion is a single
+# multiply-add; a batch is the same multiply-add over a NumPy array.
+#
+# Dates: numpy.datetime64[D] arrays, shifted by a scalar or per-row day count.
+#
+#   convert(100, "celsius", "fahrenheit")                -> 212.0
+#   convert_many([1, 2, 3], "km", "miles")               -> ndarray
+#   shift_dates(["2024-01-31", "2024-02-29"], 30)        -> (datetime64 array, invalid mask)
+#   load_column("sales_data.db", "orders.order_date")    -> list of raw values
+
+# unit: (dimension, scale, offset) -> value in the base unit (kelvin, metre, kilogram, litre, second)
+UNITS = {
+    "celsius": ("temperature", 1.0, 273.15),
+    "fahrenheit": ("temperature", Fraction(5, 9), Fraction("273.15") - Fraction(160, 9)),
+    "kelvin": ("temperature", 1.0, 0.0),
+    "mm": ("length", 0.001, 0.0),
+    "cm": ("length", 0.01, 0.0),
+    "m": ("length", 1.0, 0.0),
+    "km": ("length", 1000.0, 0.0),
+    "inches": ("length", 0.0254, 0.0),
+    "feet": ("length", 0.3048, 0.0),
+    "yards": ("length", 0.9144, 0.0),
+    "miles": ("length", 1609.344, 0.0),
+    "g": ("mass", 0.001, 0.0),
+    "kg": ("mass", 1.0, 0.0),
+    "ton": ("mass", 1000.0, 0.0),
+    "ounces": ("mass", 0.028349523125, 0.0),
+    "pounds": ("mass", 0.45359237, 0.0),
+    "ml": ("volume", 0.001, 0.0),
+    "liter": ("volume", 1.0, 0.0),
+    "gallons": ("volume", 3.785411784, 0.0),
+    "seconds": ("time", 1.0, 0.0),
+    "minutes": ("time", 60.0, 0.0),
+    "hours": ("time", 3600.0, 0.0),
+    "days": ("time", 86400.0, 0.0),
+}
+
+ALIASES = {
+    "c": "celsius", "°c": "celsius", "f": "fahrenheit", "°f": "fahrenheit", "k": "kelvin",
+    "meter": "m", "metre": "m", "kilometer": "km", "centimeter": "cm", "millimeter": "mm",
+    "inch": "inches", "in": "inches", "foot": "feet", "ft": "feet", "yard": "yards", "yd": "yards",
+    "mile": "miles", "mi": "miles",
+    "gram": "g", "kilogram": "kg", "kilo": "kg", "tonne": "ton", "ounce": "ounces", "oz": "ounces",
+    "pound": "pounds", "lb": "pounds", "lbs": "pounds",
+    "l": "liter", "litre": "liter", "liters": "liter", "milliliter": "ml", "gallon": "gallons", "gal": "gallons",
+    "s": "seconds", "sec": "seconds", "second": "seconds", "min": "minutes", "minute": "minutes",
+    "h": "hours", "hour": "hours", "jam": "hours", "day": "days", "hari": "days",
+}
+
+
+def _pair_table():
+    """(from, to) -> (a, b) with to = a * from + b, for every pair in the same dimension.
+
+    Folded with exact fractions, so e.g. celsius -> fahrenheit is exactly (1.8, 32.0).
+    """
+    exact = {u: (dim, Fraction(str(s)), Fraction(str(o))) for u, (dim, s, o) in UNITS.items()}
+    table = {}
+    for src, (dim_src, s1, o1) in exact.items():
+        for dst, (dim_dst, s2, o2) in exact.items():
+            if dim_src == dim_dst:
+                table[(src, dst)] = (float(s1 / s2), float((o1 - o2) / s2))
+    return table
+
+
+CONVERSIONS = _pair_table()
+
+MAX_INLINE = 50                  # converted values returned inline by the batch tools
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def unit_name(unit: str) -> str:
+    unit = unit.strip().lower()
+    return ALIASES.get(unit, unit)
+
+
+def coefficients(from_unit: str, to_unit: str):
+    key = (unit_name(from_unit), unit_name(to_unit))
+    try:
+        return CONVERSIONS[key]
+    except KeyError:
+        raise ValueError(f"Konversi dari {from_unit} ke {to_unit} tidak didukung") from None
+
+
+def convert(value: float, from_unit: str, to_unit: str) -> float:
+    a, b = coefficients(from_unit, to_unit)
+    return value * a + b
+
+
+def convert_many(values, from_unit: str, to_unit: str):
+    """Vectorised convert() over an array-like (NaN stays NaN)."""
+    import numpy as np
+
+    a, b = coefficients(from_unit, to_unit)
+    result = np.asarray(values, dtype=np.float64) * a
+    result += b
+    return result
+
+
+# =============== DATES ===============
+def parse_dates(values):
+    """datetime64[D] array + mask of entries that are not YYYY-MM-DD dates (those become NaT)."""
+    import numpy as np
+
+    values = ["" if v is None else str(v).strip()[:10] for v in values]
+    try:
+        dates = np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        # Slow path only when something does not parse: element by element
+        dates = np.empty(len(values), dtype="datetime64[D]")
+        for i, v in enumerate(values):
+            try:
+                dates[i] = np.datetime64(v, "D")
+            except ValueError:
+                dates[i] = np.datetime64("NaT")
+    return dates, np.isnat(dates)
+
+
+def shift_dates(dates, days):
+    """Add `days` (a number, or one per date) to every date."""
+    import numpy as np
+
+    dates, invalid = parse_dates(dates)
+    offsets = np.asarray(days, dtype=np.int64).astype("timedelta64[D]")
+    if offsets.ndim and offsets.shape != dates.shape:
+        raise ValueError(f"Got {dates.size} dates but {offsets.size} day offsets")
+    return dates + offsets, invalid
+
+
+def weekdays(dates):
+    """Monday = 0 ... Sunday = 6 (1970-01-01 was a Thursday)."""
+    import numpy as np
+
+    return (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+
+def format_dates(dates) -> list:
+    """'YYYY-MM-DD (Weekday)' strings, None for NaT."""
+    import numpy as np
+
+    text = np.datetime_as_string(dates, unit="D")
+    days = weekdays(dates)
+    invalid = np.isnat(dates)
+    return [None if bad else f"{t} ({WEEKDAYS[d]})" for t, d, bad in zip(text, days, invalid)]
+
+
+# =============== SOURCES ===============
+def load_column(path: str, column=None, numeric: bool = False, chunk_size: int = CHUNK_SIZE):
+    """Whole column of a CSV/DB source (see data_sources.py): a float array, or a list of raw values."""
+    source = open_source(path, column)
+    if numeric:
+        return source.load()
+    values = []
+    for chunk in source.values(chunk_size):
+        values.extend(chunk)
+    return values
+
+
+def numeric_summary(values) -> dict:
+    """min / max / mean of a converted batch, ignoring NaN."""
+    import numpy as np
+
+    if np.isnan(values).all():
+        return {}
+    return {
+        "minimum": round(float(np.nanmin(values)), 4),
+        "maksimum": round(float(np.nanmax(values)), 4),
+        "rata_rata": round(float(np.nanmean(values)), 4),
+    }
+
+
+def preview(values, limit: int = MAX_INLINE) -> list:
+    """First `limit` entries, floats rounded (NaN -> None) for the tool message."""
+    head = list(values[:limit])
+    return [(round(float(v), 4) if math.isfinite(v) else None) if isinstance(v, float) else v for v in head]
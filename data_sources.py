@@ -0,0 +1,235 @@
+import abc
+import csv
+import os
+import sqlite3
+from pathlib import Path
+
+# Numeric inputs for the statistics tools, so a big column does not have to be
+# pasted into the prompt as inline JSON.
+#
+#   open_source("sales_data.db", "orders.total_amount")   # SQLite table.column
+#   open_source("data/prices.csv", "price")               # CSV column (name or 0-based index)
+#   open_source("data/values.txt")                        # numbers separated by spaces/commas/newlines
+#   open_source("data/values.npy")                        # NumPy array, memory-mapped
+#
+# Every source can be read in chunks (numpy arrays) more than once, so the
+# streaming statistics can make a second pass for the histogram. DB and CSV
+# columns can also be read as raw values (dates, see conversions.py). Paths are
+# resolved under STATS_DATA_DIR (default: the working directory); the tools
+# never read files outside it.
+
+CHUNK_SIZE = 1_000_000
+DB_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class DataSourceError(ValueError):
+    pass
+
+
+def data_dir() -> Path:
+    return Path(os.getenv("STATS_DATA_DIR", ".")).resolve()
+
+
+def resolve_path(path: str, must_exist: bool = True) -> Path:
+    base = data_dir()
+    resolved = (base / path).resolve()
+    if resolved != base and base not in resolved.parents:
+        raise DataSourceError(f"{path} is outside the data directory ({base})")
+    if must_exist and not resolved.is_file():
+        raise DataSourceError(f"File not found: {path}")
+    return resolved
+
+
+def write_csv(path: str, columns: dict) -> str:
+    """Write equally long columns ({header: values}) to a CSV under the data directory."""
+    resolved = resolve_path(path, must_exist=False)
+    if resolved.suffix.lower() != ".csv":
+        raise DataSourceError("Output must be a .csv file")
+    resolved.parent.mkdir(parents=True, exist_ok=True)
+    with open(resolved, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*columns.values()))
+    return str(resolved.relative_to(data_dir()))
+
+
+# =============== SOURCES ===============
+class NumericSource(abc.ABC):
+    """A re-readable column of numbers."""
+
+    name = "source"
+
+    @abc.abstractmethod
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        """Yield the values as float64 numpy arrays of up to chunk_size each."""
+
+    @abc.abstractmethod
+    def estimated_count(self) -> int:
+        """Number of values (exact where cheap, else an estimate from the file size)."""
+
+    def values(self, chunk_size: int = CHUNK_SIZE):
+        """Raw values (e.g. date strings) in lists, for columns that are not numbers."""
+        raise DataSourceError(f"{self.name} only holds numbers")
+
+    def load(self):
+        import numpy as np
+
+        parts = list(self.chunks())
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.float64)
+
+
+class SQLiteColumn(NumericSource):
+    def __init__(self, path: Path, table: str, column: str):
+        self.path = path
+        self.table, self.column = self._checked(path, table, column)
+        self.name = f"{path.name}:{self.table}.{self.column}"
+
+    @staticmethod
+    def _checked(path, table, column):
+        # Identifiers cannot be bound as SQL parameters, so they are checked against the schema
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+            if table not in tables:
+                raise DataSourceError(f"Unknown table '{table}' (available: {', '.join(sorted(tables))})")
+            columns = {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+            if column not in columns:
+                raise DataSourceError(f"Unknown column '{column}' in {table} (available: {', '.join(sorted(columns))})")
+        finally:
+            conn.close()
+        return table, column
+
+    def _query(self, conn, select):
+        return conn.execute(f'SELECT {select} FROM "{self.table}" WHERE "{self.column}" IS NOT NULL')
+
+    def estimated_count(self) -> int:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            return self._query(conn, "COUNT(*)").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _rows(self, select, chunk_size):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            cursor = self._query(conn, select)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        import numpy as np
+
+        for rows in self._rows(f'CAST("{self.column}" AS REAL)', chunk_size):
+            yield np.fromiter((r[0] for r in rows), dtype=np.float64, count=len(rows))
+
+    def values(self, chunk_size: int = CHUNK_SIZE):
+        for rows in self._rows(f'"{self.column}"', chunk_size):
+            yield [r[0] for r in rows]
+
+
+class CSVColumn(NumericSource):
+    def __init__(self, path: Path, column):
+        self.path = path
+        self.column = column
+        self.name = f"{path.name}:{column}"
+
+    def _index(self, header):
+        if isinstance(self.column, int) or str(self.column).isdigit():
+            return int(self.column)
+        if self.column not in header:
+            raise DataSourceError(f"Unknown column '{self.column}' (available: {', '.join(header)})")
+        return header.index(self.column)
+
+    def estimated_count(self) -> int:
+        with open(self.path, "rb") as f:
+            return sum(buf.count(b"\n") for buf in iter(lambda: f.read(1 << 20), b""))
+
+    def values(self, chunk_size: int = CHUNK_SIZE):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            index = self._index(header)
+            batch = []
+            for row in reader:
+                if index < len(row) and row[index].strip():
+                    batch.append(row[index].strip())
+                if len(batch) >= chunk_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        import numpy as np
+
+        for batch in self.values(chunk_size):
+            yield np.array(batch, dtype=np.float64)
+
+
+class TextNumbers(NumericSource):
+    """Plain text, numbers separated by whitespace, commas or semicolons."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.name
+
+    def estimated_count(self) -> int:
+        return self.path.stat().st_size // 8   # ~8 bytes per number incl. separator
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        import numpy as np
+
+        table = str.maketrans(",;", "  ")
+        batch = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                batch.extend(line.translate(table).split())
+                if len(batch) >= chunk_size:
+                    yield np.array(batch, dtype=np.float64)
+                    batch = []
+        if batch:
+            yield np.array(batch, dtype=np.float64)
+
+
+class NpyArray(NumericSource):
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.name
+
+    def _array(self):
+        import numpy as np
+
+        return np.load(self.path, mmap_mode="r").reshape(-1)
+
+    def estimated_count(self) -> int:
+        return self._array().size
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        import numpy as np
+
+        array = self._array()
+        for start in range(0, array.size, chunk_size):
+            yield np.asarray(array[start:start + chunk_size], dtype=np.float64)
+
+
+def open_source(path: str, column=None) -> NumericSource:
+    """Pick the reader from the file extension."""
+    resolved = resolve_path(path)
+    suffix = resolved.suffix.lower()
+    if suffix in DB_SUFFIXES:
+        if not column or "." not in str(column):
+            raise DataSourceError("For a database give the column as 'table.column', e.g. 'orders.total_amount'")
+        table, _, name = str(column).partition(".")
+        return SQLiteColumn(resolved, table, name)
+    if suffix == ".csv":
+        if column is None or column == "":
+            raise DataSourceError("For a CSV file give the column name (or its 0-based index)")
+        return CSVColumn(resolved, column)
+    if suffix == ".npy":
+        return NpyArray(resolved)
+    return TextNumbers(resolved)
@@ -0,0 +1,243 @@
+import hashlib
+import re
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+from prompting import estimate_tokens
+from text_splitting import _is_table_row
+from tracing import registry
+
+# Near-duplicate removal for the RAG ingestion path (rag.py), before anything
+# is embedded.
+#
+#   1. strip_boilerplate(pages): lines that recur on many pages (headers,
+#      footers, disclaimers, "Page 3 of 9", source credits) are removed;
+#      only page numbers and dates are normalised, so "Page 3 of 9" matches
+#      "Page 4 of 9" but data rows that differ in their figures never do
+#   2. deduplicate(chunks): exact duplicates by hash, near-duplicates by
+#      MinHash over word 3-shingles with LSH banding (Jaccard >= threshold),
+#      or by SimHash (Hamming distance <= max_distance). Duplicates are dropped
+#      or merged into the first copy (their page numbers kept in metadata).
+#
+# The report says how many chunks / tokens never reach the embedding model.
+#
+#   pages, removed = strip_boilerplate(pages)
+#   chunks, report = deduplicate(splitter.split_documents(pages), boilerplate=removed)
+
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16                   # LSH: 16 bands x 4 rows, ~0.8 Jaccard sits on the steep part of the S-curve
+JACCARD_THRESHOLD = 0.8
+SIMHASH_DISTANCE = 6         # a ~1% edit of a 500-token chunk flips ~6 bits, unrelated chunks differ in ~24+
+BOILERPLATE_FRACTION = 0.5   # a line on >= half the pages (and at least 2) is boilerplate
+MAX_BOILERPLATE_CHARS = 200
+
+_WORD = re.compile(r"\w+")
+_DIGITS = re.compile(r"\d+")
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_PAGE_OR_DATE = re.compile(
+    r"\b(?:page|halaman|hal\.|p\.)\s*\d+(?:\s*(?:of|dari|/)\s*\d+)?"     # Page 3 of 9, hal. 3
+    r"|^[-\u2013\u2014(\s]*\d+(?:\s*/\s*\d+)?[-\u2013\u2014)\s]*$"         # a line that is only "3", "- 3 -", "3 / 9"
+    r"|\b\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b"                             # 2024-01-31, 31/01/2024
+    r"|\b\d{1,2}:\d{2}(?::\d{2})?\b"                                    # 14:05
+    rf"|\b\d{{1,2}}\s+{_MONTH}\s+\d{{4}}\b|\b{_MONTH}\s+\d{{1,2}},?\s+\d{{4}}\b",  # 5 Jan 2024, January 5, 2024
+    re.IGNORECASE,
+)
+
+
+class DedupReport(NamedTuple):
+    chunks_in: int
+    chunks_out: int
+    exact_duplicates: int
+    near_duplicates: int
+    boilerplate_lines: int
+    tokens_saved: int
+
+    @property
+    def embedding_calls_saved(self) -> int:
+        """Texts that are no longer sent to the embedding model."""
+        return self.chunks_in - self.chunks_out
+
+    def __str__(self):
+        return (
+            f"dedup: {self.chunks_in} -> {self.chunks_out} chunks "
+            f"({self.exact_duplicates} exact, {self.near_duplicates} near-duplicate), "
+            f"{self.boilerplate_lines} boilerplate lines stripped, "
+            f"{self.embedding_calls_saved} embedding calls / ~{self.tokens_saved} tokens saved"
+        )
+
+
+# =============== BOILERPLATE ===============
+def _line_key(line: str) -> str:
+    key = " ".join(line.lower().split())
+    bare = _PAGE_OR_DATE.sub("", line)
+    if _is_table_row(bare, 0, len(bare)):
+        return key   # figures are the content of a table row, never normalised
+    return _PAGE_OR_DATE.sub(lambda m: _DIGITS.sub("#", m.group()), key)
+
+
+def boilerplate_lines(texts, fraction: float = BOILERPLATE_FRACTION) -> set:
+    """Normalised lines that occur on at least `fraction` of the texts (and on 2+)."""
+    counts = Counter()
+    for text in texts:
+        counts.update({_line_key(l) for l in text.splitlines() if l.strip() and len(l) <= MAX_BOILERPLATE_CHARS})
+    needed = max(2, fraction * len(texts))
+    return {key for key, n in counts.items() if n >= needed}
+
+
+def strip_boilerplate(pages, fraction: float = BOILERPLATE_FRACTION):
+    """(copies of the pages without their recurring lines, number of lines removed)."""
+    from langchain_core.documents import Document
+
+    pages = list(pages)
+    recurring = boilerplate_lines([p.page_content for p in pages], fraction) if len(pages) > 1 else set()
+    removed, out = 0, []
+    for page in pages:
+        kept = []
+        for line in page.page_content.splitlines():
+            if line.strip() and _line_key(line) in recurring:
+                removed += 1
+            else:
+                kept.append(line)
+        out.append(Document(page_content="\n".join(kept), metadata=dict(page.metadata)))
+    return out, removed
+
+
+# =============== FINGERPRINTS ===============
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def shingles(text: str, size: int = SHINGLE) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the word 3-shingles."""
+    weights = [0] * 64
+    for shingle in shingles(text):
+        h = _hash64(shingle)
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class MinHasher:
+    """NUM_PERM multiply-shift hashes ((a*x + b) mod 2^64, top 32 bits) over the shingle hashes, vectorised."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # odd
+        self.b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str):
+        import numpy as np
+
+        values = shingles(text)
+        if not values:
+            return np.full(len(self.a), 1 << 32, dtype=np.uint64)
+        hashes = np.fromiter((_hash64(s) for s in values), dtype=np.uint64, count=len(values))
+        # uint64 arithmetic wraps around, which is the "mod 2^64" part
+        return ((np.outer(hashes, self.a) + self.b) >> np.uint64(32)).min(axis=0)
+
+
+def jaccard_estimate(sig_a, sig_b) -> float:
+    return float((sig_a == sig_b).mean())
+
+
+# =============== DEDUP ===============
+def _normalised(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _near_duplicates_minhash(texts, threshold: float, bands: int):
+    """{duplicate index: kept index}, candidates from LSH buckets, confirmed on the signature."""
+    hasher = MinHasher()
+    signatures = [hasher.signature(t) for t in texts]
+    rows = len(hasher.a) // bands
+    buckets = defaultdict(list)
+    duplicates = {}
+    for i, sig in enumerate(signatures):
+        candidates = set()
+        for band in range(bands):
+            key = (band, sig[band * rows:(band + 1) * rows].tobytes())
+            candidates.update(buckets[key])
+            buckets[key].append(i)
+        for j in sorted(candidates):
+            if j not in duplicates and jaccard_estimate(sig, signatures[j]) >= threshold:
+                duplicates[i] = j
+                break
+    return duplicates
+
+
+def _near_duplicates_simhash(texts, max_distance: int):
+    """{duplicate index: kept index}; the 64 bits are cut into max_distance + 1 blocks,
+    so any pair within max_distance bits has at least one identical block."""
+    fingerprints = [simhash(t) for t in texts]
+    blocks = max_distance + 1
+    edges = [64 * k // blocks for k in range(blocks + 1)]
+    buckets = defaultdict(list)
+    duplicates = {}
+    for i, fp in enumerate(fingerprints):
+        candidates = set()
+        for block in range(blocks):
+            key = (block, (fp >> edges[block]) & ((1 << (edges[block + 1] - edges[block])) - 1))
+            candidates.update(buckets[key])
+            buckets[key].append(i)
+        for j in sorted(candidates):
+            if j not in duplicates and bin(fp ^ fingerprints[j]).count("1") <= max_distance:
+                duplicates[i] = j
+                break
+    return duplicates
+
+
+def deduplicate(chunks, method: str = "minhash", threshold: float = JACCARD_THRESHOLD,
+                max_distance: int = SIMHASH_DISTANCE, merge: bool = True, boilerplate: int = 0):
+    """(unique chunks, DedupReport). With merge=True a kept chunk lists the pages of its duplicates
+    ("duplicate_pages"); `boilerplate` is the strip_boilerplate() count, carried into the report."""
+    chunks = list(chunks)
+    texts = [c.page_content for c in chunks]
+
+    first_seen, exact = {}, {}
+    for i, text in enumerate(texts):
+        key = hashlib.sha256(_normalised(text).encode("utf-8")).digest()
+        if key in first_seen:
+            exact[i] = first_seen[key]
+        else:
+            first_seen[key] = i
+
+    remaining = [i for i in range(len(texts)) if i not in exact]
+    if method == "minhash":
+        near = _near_duplicates_minhash([texts[i] for i in remaining], threshold, BANDS)
+    elif method == "simhash":
+        near = _near_duplicates_simhash([texts[i] for i in remaining], max_distance)
+    else:
+        raise ValueError(f"Unknown dedup method: {method}")
+    near = {remaining[d]: remaining[k] for d, k in near.items()}
+
+    duplicate_of = {**exact, **near}
+    if merge:
+        for dup, kept in duplicate_of.items():
+            while kept in duplicate_of:
+                kept = duplicate_of[kept]
+            metadata = chunks[kept].metadata
+            page = chunks[dup].metadata.get("page")
+            if page is not None:
+                metadata["duplicate_pages"] = sorted({*metadata.get("duplicate_pages", []), page})
+
+    unique = [c for i, c in enumerate(chunks) if i not in duplicate_of]
+    report = DedupReport(
+        chunks_in=len(chunks),
+        chunks_out=len(unique),
+        exact_duplicates=len(exact),
+        near_duplicates=len(near),
+        boilerplate_lines=boilerplate,
+        tokens_saved=sum(estimate_tokens(texts[i]) for i in duplicate_of),
+    )
+    registry.inc("rag_embeddings_saved_total", report.embedding_calls_saved)
+    return unique, report
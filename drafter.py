@@ -1,25 +1,26 @@
 from typing import Annotated, Sequence, TypedDict
 from dotenv import load_dotenv
-import os
 
 from langchain_core.messages import BaseMessage, ToolMessage, SystemMessage, HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.tools import tool
+from models import gemini_chat, require_api_key
+from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.graph.message import add_messages
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
+from tracing import traced_graph
+from routing import Signals, merge_signals, tool_result, is_set, DOCUMENT_SAVED
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise EnvironmentError("GOOGLE_API_KEY not found in environment.")
+# Tidak wajib kalau LLM_BACKEND=fake (benchmark / CI tanpa network)
+api_key = require_api_key()
 
 document_content = ""
 # Define state
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     tool_calls: list
+    signals: Annotated[Signals, merge_signals]
     
 @tool
 def update(content : str) -> str :
@@ -29,7 +30,7 @@ def update(content : str) -> str :
     return f"Document has been updated successfully ! the current cpntent is {document_content}"
 
 @tool 
-def save(filename : str) -> str : 
+def save(filename : str , tool_call_id : Annotated[str , InjectedToolCallId]) : 
     """ Save the current document to a text file and finish the process 
     
     Args :
@@ -37,7 +38,7 @@ def save(filename : str) -> str :
     """
     
     global document_content
-    if not filename.emdswith(".txt") : 
+    if not filename.endswith(".txt") : 
         filename = f"{filename}.txt"
     
     try : 
@@ -48,9 +49,12 @@ def save(filename : str) -> str :
     except Exception as e :
         return f"Error saving document : {str(e)}"
     
+    # flag ini yang dibaca should_continue, bukan isi pesan
+    return tool_result(f"Document has been saved to {filename}" , tool_call_id , **{DOCUMENT_SAVED : True})
+    
 tools = [update , save]
 
-model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", api_key=api_key ).bind_tools(tools)
+model = gemini_chat(api_key=api_key).bind_tools(tools)
 
 
 # def our_agent(state : AgentState) -> AgentState :
@@ -123,17 +127,8 @@ def our_agent(state: AgentState) -> AgentState:
 def should_continue(state : AgentState) -> str : 
     """Determine if the conversation should continue or end."""
     
-    messages = state["messages"]
-    
-    if not messages :  
-        return "continue"
-    
-    for message in reversed(messages) : 
-        if (isinstance(message , ToolMessage) and
-            "saved" in message.content.lower() and
-            "document" in message.content.lower()
-        ): 
-            return "end"
+    if is_set(state , DOCUMENT_SAVED) : 
+        return "end"
     
     return "continue"
 
@@ -160,7 +155,7 @@ graph.add_conditional_edges(
     }
 )
 
-app = graph.compile()
+app = traced_graph(graph.compile())
 
 def run_document_agent() : 
     print("\n =======DRAFTER=======")
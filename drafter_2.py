@@ -1,11 +1,14 @@
 from typing import Annotated, Sequence, TypedDict
 from dotenv import load_dotenv  
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.tools import tool
+from models import gemini_chat
+from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.graph.message import add_messages
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
+from tracing import traced_graph
+from structured_log import get_logger, kv
+from routing import Signals, merge_signals, tool_result, is_set, DOCUMENT_SAVED
 import os
 
 load_dotenv()
@@ -13,9 +16,11 @@ api_key = os.getenv("GOOGLE_API_KEY")
 
 # This is the global variable to store document content
 document_content = ""
+log = get_logger("drafter_2")
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    signals: Annotated[Signals, merge_signals]
 
 
 @tool
@@ -23,12 +28,13 @@ def update(content: str) -> str:
     """Updates the document with the provided content."""
     global document_content
     document_content = content
-    print(f"✅ [UPDATE TOOL CALLED] document_content updated:\n{document_content}")
+    # Only a truncated preview is logged; the full document is in the tool result
+    log.info("document updated", extra=kv(chars=len(document_content), preview=document_content))
     return f"Document has been updated successfully! The current content is:\n{document_content}"
 
 
 @tool
-def save(filename: str) -> str:
+def save(filename: str, tool_call_id: Annotated[str, InjectedToolCallId]):
     """Save the current document to a text file and finish the process.
     
     Args:
@@ -45,7 +51,12 @@ def save(filename: str) -> str:
         with open(filename, 'w') as file:
             file.write(document_content)
         print(f"\n💾 Document has been saved to: {filename}")
-        return f"Document has been saved successfully to '{filename}'."
+        # The flag is what ends the graph, not the wording of the message
+        return tool_result(
+            f"Document has been saved successfully to '{filename}'.",
+            tool_call_id,
+            **{DOCUMENT_SAVED: True},
+        )
     
     except Exception as e:
         return f"Error saving document: {str(e)}"
@@ -53,7 +64,7 @@ def save(filename: str) -> str:
 
 tools = [update, save]
 
-model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", api_key=api_key ).bind_tools(tools)
+model = gemini_chat(api_key=api_key).bind_tools(tools)
 
 def our_agent(state: AgentState) -> AgentState:
     global document_content
@@ -100,19 +111,10 @@ def our_agent(state: AgentState) -> AgentState:
 def should_continue(state: AgentState) -> str:
     """Determine if we should continue or end the conversation."""
 
-    messages = state["messages"]
-    
-    if not messages:
-        return "continue"
-    
-    # This looks for the most recent tool message....
-    for message in reversed(messages):
-        # ... and checks if this is a ToolMessage resulting from save
-        if (isinstance(message, ToolMessage) and 
-            "saved" in message.content.lower() and
-            "document" in message.content.lower()):
-            return "end" # goes to the end edge which leads to the endpoint
-        
+    # The save tool sets this flag, so there is no need to scan the history
+    if is_set(state, DOCUMENT_SAVED):
+        return "end" # goes to the end edge which leads to the endpoint
+
     return "continue"
 
 def print_messages(messages):
@@ -144,7 +146,7 @@ graph.add_conditional_edges(
     },
 )
 
-app = graph.compile()
+app = traced_graph(graph.compile())
 
 def run_document_agent():
     print("\n ===== DRAFTER =====")
@@ -0,0 +1,342 @@
+import ast
+import functools
+import math
+import operator
+
+# Safe math expressions for the calculator tools (react_3.py).
+#
+# An expression is parsed once, checked against a whitelist of AST nodes and
+# compiled into a tree of small Python closures; the compiled form is cached
+# by expression string. Evaluation counts operations and checks magnitudes
+# before doing big-int work, so "9**9**9" or "10**10**8" fail fast instead of
+# freezing the worker.
+#
+#   compile_expression("sqrt(x) + 1").evaluate(x=16)           -> 5.0
+#   compile_expression("x**2").vectorized(x=np.arange(10**6))   -> ndarray
+#   evaluate_range("sin(x)/x", 1, 1e6, 10**6)                   -> summary dict
+
+MAX_LENGTH = 500          # characters per expression
+MAX_DEPTH = 50            # nesting of the AST
+MAX_OPS = 10_000          # evaluated nodes per call
+MAX_BITS = 4096           # biggest integer result (~1233 digits)
+MAX_POINTS = 10_000_000   # elements in a vectorized evaluation
+MAX_ROUND_DIGITS = 1000   # |ndigits| of round(); round(7, -10**9) would hang the worker
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+FUNCTIONS = {
+    "abs": abs, "round": round, "min": min, "max": max, "pow": pow,
+    "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "log10": math.log10, "log2": math.log2,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "asin": math.asin, "acos": math.acos, "atan": math.atan,
+    "floor": math.floor, "ceil": math.ceil, "factorial": math.factorial,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+_NUMPY_FUNCTIONS = {
+    "abs": "abs", "round": "round", "min": "minimum", "max": "maximum", "pow": "power",
+    "sqrt": "sqrt", "exp": "exp", "log": "log", "log10": "log10", "log2": "log2",
+    "sin": "sin", "cos": "cos", "tan": "tan", "asin": "arcsin", "acos": "arccos", "atan": "arctan",
+    "floor": "floor", "ceil": "ceil",
+}
+_NUMPY_ARITY = {"min": (2, None), "max": (2, None), "round": (1, 2), "pow": (2, 2)}  # default (1, 1)
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+# =============== LIMITS ===============
+class _Budget:
+    __slots__ = ("ops",)
+
+    def __init__(self):
+        self.ops = 0
+
+    def tick(self):
+        self.ops += 1
+        if self.ops > MAX_OPS:
+            raise ExpressionError(f"Expression too expensive (more than {MAX_OPS} operations)")
+
+
+def _bits(value) -> float:
+    """Approximate size of a number in bits (floats count by magnitude)."""
+    if isinstance(value, int):
+        return value.bit_length()
+    if isinstance(value, float) and value and math.isfinite(value):
+        return abs(math.log2(abs(value)))
+    return 0
+
+
+def _check_result(value):
+    if isinstance(value, int) and value.bit_length() > MAX_BITS:
+        raise ExpressionError(f"Result too large (more than {MAX_BITS} bits)")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ExpressionError("Result is not finite (overflow)")
+    if isinstance(value, complex):
+        raise ExpressionError("Result is a complex number")
+    return value
+
+
+def _guarded_pow(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        bits = exponent * math.log2(abs(base))
+        if bits > MAX_BITS:
+            raise ExpressionError(f"Result too large: ~{bits:.0f} bits (max {MAX_BITS})")
+    try:
+        return pow(base, exponent)
+    except OverflowError:
+        raise ExpressionError("Result is not finite (overflow)")
+
+
+def _guarded_mul(a, b):
+    if isinstance(a, int) and isinstance(b, int) and a.bit_length() + b.bit_length() > MAX_BITS + 1:
+        raise ExpressionError(f"Result too large (more than {MAX_BITS} bits)")
+    return a * b
+
+
+def _guarded_call(name, fn):
+    def call(*args):
+        if name == "factorial" and args and isinstance(args[0], int) and args[0] > 450:
+            raise ExpressionError("factorial argument too large (max 450)")
+        if name == "pow" and len(args) == 2:
+            return _guarded_pow(*args)
+        if name == "round" and len(args) == 2 and isinstance(args[1], int) and abs(args[1]) > MAX_ROUND_DIGITS:
+            raise ExpressionError(f"round: digits must be between -{MAX_ROUND_DIGITS} and {MAX_ROUND_DIGITS}")
+        try:
+            return fn(*args)
+        except OverflowError:
+            raise ExpressionError(f"{name}: overflow")
+    return call
+
+
+# =============== VALIDATION ===============
+def _parse(expression: str) -> ast.Expression:
+    if len(expression) > MAX_LENGTH:
+        raise ExpressionError(f"Expression too long (max {MAX_LENGTH} characters)")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid syntax: {e.msg}")
+    return tree
+
+
+def _validate(node, depth=0, variables=None):
+    """Whitelist check; returns the free variable names."""
+    variables = set() if variables is None else variables
+    if depth > MAX_DEPTH:
+        raise ExpressionError("Expression nested too deeply")
+    if isinstance(node, ast.Expression):
+        _validate(node.body, depth + 1, variables)
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Only numbers are allowed, got {node.value!r}")
+    elif isinstance(node, ast.BinOp):
+        if type(node.op) not in _BINARY:
+            raise ExpressionError(f"Operator not allowed: {type(node.op).__name__}")
+        _validate(node.left, depth + 1, variables)
+        _validate(node.right, depth + 1, variables)
+    elif isinstance(node, ast.UnaryOp):
+        if type(node.op) not in _UNARY:
+            raise ExpressionError(f"Operator not allowed: {type(node.op).__name__}")
+        _validate(node.operand, depth + 1, variables)
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise ExpressionError(f"Function not allowed: {ast.unparse(node.func)}")
+        if node.keywords:
+            raise ExpressionError("Keyword arguments are not allowed")
+        for arg in node.args:
+            _validate(arg, depth + 1, variables)
+    elif isinstance(node, ast.Name):
+        if node.id in FUNCTIONS:
+            raise ExpressionError(f"{node.id} must be called")
+        if node.id not in CONSTANTS:
+            if node.id.startswith("_"):
+                raise ExpressionError(f"Name not allowed: {node.id}")
+            variables.add(node.id)
+    else:
+        raise ExpressionError(f"Syntax not allowed: {type(node).__name__}")
+    return variables
+
+
+# =============== COMPILATION ===============
+def _compile_scalar(node):
+    """Closure tree: fn(env, budget) -> number."""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda env, budget: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda env, budget: value
+
+        def lookup(env, budget):
+            try:
+                return env[name]
+            except KeyError:
+                raise ExpressionError(f"Missing value for variable '{name}'")
+        return lookup
+    if isinstance(node, ast.UnaryOp):
+        op, operand = _UNARY[type(node.op)], _compile_scalar(node.operand)
+
+        def unary(env, budget):
+            budget.tick()
+            return op(operand(env, budget))
+        return unary
+    if isinstance(node, ast.BinOp):
+        left, right = _compile_scalar(node.left), _compile_scalar(node.right)
+        op = {ast.Pow: _guarded_pow, ast.Mult: _guarded_mul}.get(type(node.op), _BINARY[type(node.op)])
+
+        def binary(env, budget):
+            budget.tick()
+            a, b = left(env, budget), right(env, budget)
+            if _bits(a) > MAX_BITS or _bits(b) > MAX_BITS:
+                raise ExpressionError(f"Operand too large (more than {MAX_BITS} bits)")
+            try:
+                return _check_result(op(a, b))
+            except ZeroDivisionError:
+                raise ExpressionError("Division by zero")
+            except OverflowError:
+                raise ExpressionError("Result is not finite (overflow)")
+        return binary
+    # ast.Call
+    name = node.func.id
+    fn = _guarded_call(name, FUNCTIONS[name])
+    args = [_compile_scalar(a) for a in node.args]
+
+    def call(env, budget):
+        budget.tick()
+        try:
+            return _check_result(fn(*(a(env, budget) for a in args)))
+        except (TypeError, ValueError) as e:
+            if isinstance(e, ExpressionError):
+                raise
+            raise ExpressionError(f"{name}: {e}")
+    return call
+
+
+def _compile_vector(node, np):
+    """Same tree over NumPy float64 arrays (one pass per node, not per element)."""
+    if isinstance(node, ast.Constant):
+        value = float(node.value)
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda env: value
+
+        def lookup(env):
+            try:
+                return env[name]
+            except KeyError:
+                raise ExpressionError(f"Missing value for variable '{name}'")
+        return lookup
+    if isinstance(node, ast.UnaryOp):
+        op, operand = _UNARY[type(node.op)], _compile_vector(node.operand, np)
+        return lambda env: op(operand(env))
+    if isinstance(node, ast.BinOp):
+        op = _BINARY[type(node.op)]
+        left, right = _compile_vector(node.left, np), _compile_vector(node.right, np)
+        return lambda env: op(left(env), right(env))
+    name = node.func.id
+    if name not in _NUMPY_FUNCTIONS:
+        raise ExpressionError(f"{name} is not supported in vectorized evaluation")
+    low, high = _NUMPY_ARITY.get(name, (1, 1))
+    if len(node.args) < low or (high is not None and len(node.args) > high):
+        expected = f"{low}+" if high is None else str(low) if low == high else f"{low} or {high}"
+        raise ExpressionError(f"{name} takes {expected} argument(s) in vectorized evaluation, got {len(node.args)}")
+    fn = getattr(np, _NUMPY_FUNCTIONS[name])
+    args = [_compile_vector(a, np) for a in node.args]
+    if name in ("min", "max"):
+        # np.minimum/np.maximum are binary: fold min(a, b, c) into min(min(a, b), c)
+        return lambda env: functools.reduce(fn, (a(env) for a in args))
+    if name == "round" and len(args) == 2:
+        digits = args[1]
+
+        def rounded(env):
+            decimals = digits(env)
+            if np.ndim(decimals) or not np.isfinite(decimals) or decimals != int(decimals):
+                raise ExpressionError("round: digits must be a single whole number")
+            if abs(decimals) > MAX_ROUND_DIGITS:
+                raise ExpressionError(f"round: digits must be between -{MAX_ROUND_DIGITS} and {MAX_ROUND_DIGITS}")
+            return fn(args[0](env), int(decimals))
+        return rounded
+    return lambda env: fn(*(a(env) for a in args))
+
+
+class CompiledExpression:
+    """A validated expression, ready to evaluate many times."""
+
+    def __init__(self, source: str, tree: ast.Expression, variables: frozenset):
+        self.source = source
+        self.tree = tree
+        self.variables = variables
+        self._scalar = _compile_scalar(tree.body)
+        self._vector = None
+
+    def evaluate(self, **values):
+        return self._scalar(values, _Budget())
+
+    def vectorized(self, **arrays):
+        """Evaluate over NumPy arrays (float64); non-finite elements become NaN."""
+        import numpy as np
+
+        if self._vector is None:
+            self._vector = _compile_vector(self.tree.body, np)
+        env = {}
+        for name, values in arrays.items():
+            values = np.asarray(values, dtype=np.float64)
+            if values.size > MAX_POINTS:
+                raise ExpressionError(f"Too many points (max {MAX_POINTS})")
+            env[name] = values
+        with np.errstate(all="ignore"):
+            result = np.asarray(self._vector(env), dtype=np.float64)
+            result[~np.isfinite(result)] = np.nan
+        return result
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Parse + validate + compile, cached by the expression string."""
+    tree = _parse(expression)
+    variables = frozenset(_validate(tree))
+    return CompiledExpression(expression, tree, variables)
+
+
+def evaluate(expression: str, **values):
+    return compile_expression(expression).evaluate(**values)
+
+
+def evaluate_range(expression: str, start: float, stop: float, points: int = 1000, variable: str = "x") -> dict:
+    """f(x) for `points` evenly spaced x in [start, stop], summarised (not the full array)."""
+    import numpy as np
+
+    compiled = compile_expression(expression)
+    extra = compiled.variables - {variable}
+    if extra:
+        raise ExpressionError(f"Unknown variables: {', '.join(sorted(extra))} (only '{variable}' is set)")
+    points = int(points)
+    if not 1 <= points <= MAX_POINTS:
+        raise ExpressionError(f"points must be between 1 and {MAX_POINTS}")
+    xs = np.linspace(start, stop, points)
+    ys = compiled.vectorized(**{variable: xs})
+    finite = ~np.isnan(ys)
+    summary = {"expression": expression, "points": points, "start": start, "stop": stop, "invalid": int((~finite).sum())}
+    if finite.any():
+        valid = ys[finite]
+        summary.update({
+            "min": float(valid.min()), "max": float(valid.max()),
+            "mean": float(valid.mean()), "sum": float(valid.sum()),
+            "argmin_x": float(xs[finite][valid.argmin()]), "argmax_x": float(xs[finite][valid.argmax()]),
+            "first": [round(float(v), 6) for v in ys[:5]],
+            "last": [round(float(v), 6) for v in ys[-5:]],
+        })
+    return summary
@@ -0,0 +1,268 @@
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from prompting import estimate_tokens
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+# Offline stand-ins for Gemini, for load tests and benchmarks on hosts
+# without network access or an API key (LLM_BACKEND=fake, see models.py).
+#
+# FakeChatModel
+#   - scripted replies: a list of steps, each a string (final answer) or
+#     {"content": ..., "tool_calls": [{"name": ..., "args": {...}}]}
+#   - scripts can be keyed by a substring of the user's question, so one file
+#     drives a whole benchmark suite (FAKE_LLM_SCRIPT=path/to/script.json)
+#   - without a script: call the first bound tool once with placeholder
+#     arguments, then answer
+#   - latency drawn from a seeded distribution (FAKE_LLM_LATENCY):
+#     "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.05", "lognormal:-1.2,0.4", "exp:0.3"
+#
+# FakeEmbeddings
+#   - feature hashing of the words (blake2b): deterministic across runs and
+#     machines, and texts sharing words get similar vectors, so retrieval
+#     still returns sensible neighbours
+
+
+# =============== LATENCY ===============
+class Latency:
+    """Seeded latency sampler, parsed from "kind:a,b" (seconds)."""
+
+    def __init__(self, spec: str = "fixed:0", seed: int = 0):
+        kind, _, params = (spec or "fixed:0").partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        p = self.params
+        with self.lock:
+            if self.kind == "fixed":
+                value = p[0] if p else 0.0
+            elif self.kind == "uniform":
+                value = self.rng.uniform(p[0], p[1])
+            elif self.kind == "normal":
+                value = self.rng.gauss(p[0], p[1])
+            elif self.kind == "lognormal":
+                value = self.rng.lognormvariate(p[0], p[1])
+            else:
+                value = self.rng.expovariate(1 / p[0]) if p[0] else 0.0
+        return max(0.0, value)
+
+
+# =============== SCRIPTS ===============
+_PLACEHOLDERS = {"string": "test", "integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}
+
+
+def placeholder_args(tool: dict) -> dict:
+    """Arguments for an OpenAI-format tool: defaults where given, else a value of the right type."""
+    parameters = tool.get("function", {}).get("parameters", {})
+    args = {}
+    for name, schema in parameters.get("properties", {}).items():
+        if "default" in schema:
+            args[name] = schema["default"]
+        else:
+            args[name] = _PLACEHOLDERS.get(schema.get("type"), "test")
+    return args
+
+
+def load_script(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _turn(messages: List[BaseMessage]):
+    """(question, step): the last user message and how many AI replies followed it."""
+    step = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content), step
+        if isinstance(message, AIMessage):
+            step += 1
+    return "", step
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic, scriptable chat model with tool calls and simulated latency."""
+
+    model: str = "fake-chat"
+    script: Any = None            # list of steps, or {question substring: list of steps}
+    latency: str = "fixed:0"
+    seed: int = 0
+    _sampler: Any = None
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        self._sampler = Latency(self.latency, self.seed)
+        if self.script is None and os.getenv("FAKE_LLM_SCRIPT"):
+            self.script = load_script(os.getenv("FAKE_LLM_SCRIPT"))
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self):
+        return {"model": self.model, "latency": self.latency, "seed": self.seed}
+
+    def _steps_for(self, question: str):
+        if isinstance(self.script, dict):
+            for key, steps in self.script.items():
+                if key != "*" and key in question:
+                    return steps
+            return self.script.get("*")
+        return self.script
+
+    def _reply(self, messages: List[BaseMessage], tools=None) -> AIMessage:
+        question, step = _turn(messages)
+        steps = self._steps_for(question)
+
+        if steps is not None and step < len(steps):
+            item = steps[step]
+            if isinstance(item, str):
+                item = {"content": item}
+            tool_calls = [
+                {"name": c["name"], "args": c.get("args", {}), "id": f"call_{step}_{i}", "type": "tool_call"}
+                for i, c in enumerate(item.get("tool_calls", []))
+            ]
+            content, calls = item.get("content", ""), tool_calls
+        elif tools and step == 0:
+            first = tools[0]
+            content = ""
+            calls = [{"name": first["function"]["name"], "args": placeholder_args(first), "id": "call_0_0", "type": "tool_call"}]
+        else:
+            results = [m.content for m in messages[-3:] if isinstance(m, ToolMessage)]
+            content = f"Fake answer to: {question[:80]}"
+            if results:
+                content += f" (tool results: {'; '.join(str(r)[:80] for r in results)})"
+            calls = []
+
+        input_tokens = sum(estimate_tokens(m.content) for m in messages)
+        output_tokens = estimate_tokens(content) + estimate_tokens(json.dumps([c["args"] for c in calls]))
+        return AIMessage(
+            content=content,
+            tool_calls=calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self.model},
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._sampler.sample())
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages, kwargs.get("tools")))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._sampler.sample())
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages, kwargs.get("tools")))])
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        for word in re.findall(r"\S+\s*", message.content):
+            yield AIMessageChunk(content=word)
+        yield AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._sampler.sample())
+        for chunk in self._chunks(self._reply(messages, kwargs.get("tools"))):
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._sampler.sample())
+        for chunk in self._chunks(self._reply(messages, kwargs.get("tools"))):
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        if tool_choice:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted, **kwargs)
+
+
+# =============== EMBEDDINGS ===============
+_WORD = re.compile(r"\w+")
+
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    """Signed feature hashing of the lower-cased words, L2-normalised."""
+    vector = [0.0] * dim
+    words = _WORD.findall(text.lower()) or [text]
+    for word in words:
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vector[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash embeddings (no model, no network)."""
+
+    def __init__(self, dim: int = None, latency: str = None, seed: int = 0):
+        self.dim = dim or int(os.getenv("FAKE_EMBEDDING_DIM", 256))
+        self.sampler = Latency(latency or os.getenv("FAKE_EMBEDDING_LATENCY", "fixed:0"), seed)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.sampler.sample())
+        return [hash_embedding(t, self.dim) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.sampler.sample())
+        return hash_embedding(text, self.dim)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.sampler.sample())
+        return [hash_embedding(t, self.dim) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.sampler.sample())
+        return hash_embedding(text, self.dim)
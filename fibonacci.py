@@ -0,0 +1,172 @@
+import decimal
+import functools
+import math
+
+# Fibonacci for the generate_fibonacci / fibonacci_term tools (react_3.py).
+#
+# - single term: fast doubling, O(log n) big-int multiplications, memoised (LRU)
+# - ranges: a chunked generator, so callers never hold more than one chunk
+# - huge n: the answer is summarised instead of returned in full. Digit count
+#   and leading digits come from Binet's formula (decimal, enough precision),
+#   trailing digits from fast doubling mod 10^k, so F(10^18) is described
+#   without ever building a 2*10^17-digit integer.
+#
+#   fibonacci(100)                       -> 354224848179261915075
+#   describe_term(10**18)                -> {"digits": ..., "leading": "...", "trailing": "..."}
+#   for chunk in iter_fibonacci(0, 10**6, 1000): ...
+#   fibonacci_sequence(10**6)            -> summary dict (first/last terms)
+
+MAX_N = 10**18              # biggest index we describe
+MAX_EXACT_N = 1_000_000     # biggest index we build as a full integer (~209k digits)
+MAX_EXACT_DIGITS = 4000     # render terms up to this many digits in full (Python refuses str() past 4300)
+MAX_OUTPUT_CHARS = 4000     # size budget for a tool result before it gets summarised
+SUMMARY_TERMS = 5           # first/last terms shown in a summary
+SUMMARY_DIGITS = 20         # leading/trailing digits shown for a huge term
+
+_LOG10_PHI = math.log10((1 + math.sqrt(5)) / 2)
+
+
+def _check_index(n: int) -> int:
+    n = int(n)
+    if n < 0:
+        raise ValueError("n must be >= 0")
+    if n > MAX_N:
+        raise ValueError(f"n too large (max {MAX_N})")
+    return n
+
+
+# =============== FAST DOUBLING ===============
+def _pair(n: int, mod: int = None):
+    """(F(n), F(n+1)), walking the bits of n from the top.
+
+    F(2k) = F(k) * (2F(k+1) - F(k)),  F(2k+1) = F(k)^2 + F(k+1)^2
+    """
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        if mod:
+            c, d = c % mod, d % mod
+        a, b = (d, c + d) if bit == "1" else (c, d)
+        if mod:
+            b %= mod
+    return a, b
+
+
+@functools.lru_cache(maxsize=64)
+def fibonacci(n: int) -> int:
+    """F(n) as an exact integer (F(0) = 0, F(1) = 1)."""
+    n = _check_index(n)
+    if n > MAX_EXACT_N:
+        raise ValueError(f"n too large for an exact value (max {MAX_EXACT_N}); use describe_term()")
+    return _pair(n)[0]
+
+
+def fibonacci_mod(n: int, mod: int) -> int:
+    """F(n) mod `mod`, O(log n) with small numbers only."""
+    return _pair(_check_index(n), mod)[0] % mod
+
+
+# =============== HUGE TERMS ===============
+def digit_count(n: int) -> int:
+    """Number of decimal digits of F(n)."""
+    n = _check_index(n)
+    if n < 2:
+        return 1
+    if n < 50:
+        return len(str(_pair(n)[0]))
+    return int(_binet_log10(n, 5)) + 1
+
+
+def _binet_log10(n: int, digits: int) -> decimal.Decimal:
+    """log10(F(n)) ~ n*log10(phi) - log10(sqrt 5), with enough precision for `digits` leading digits."""
+    with decimal.localcontext() as ctx:
+        ctx.prec = len(str(n)) + digits + 10
+        sqrt5 = decimal.Decimal(5).sqrt()
+        phi = (1 + sqrt5) / 2
+        return n * phi.log10() - sqrt5.log10()
+
+
+def leading_digits(n: int, k: int = SUMMARY_DIGITS) -> str:
+    n = _check_index(n)
+    if n <= MAX_EXACT_N and n * _LOG10_PHI < MAX_EXACT_DIGITS:
+        return str(fibonacci(n))[:k]
+    with decimal.localcontext() as ctx:
+        ctx.prec = len(str(n)) + k + 10
+        log = _binet_log10(n, k)
+        fraction = log - int(log)
+        return str(int(decimal.Decimal(10) ** (fraction + k - 1)))[:k]
+
+
+def trailing_digits(n: int, k: int = SUMMARY_DIGITS) -> str:
+    value = fibonacci_mod(n, 10 ** k)
+    return str(value).zfill(min(k, digit_count(n)))
+
+
+def describe_term(n: int, max_digits: int = MAX_EXACT_DIGITS) -> dict:
+    """F(n) in full when it is short enough, else digit count + leading/trailing digits."""
+    n = _check_index(n)
+    digits = digit_count(n)
+    if digits <= max_digits:
+        return {"n": n, "digits": digits, "value": str(fibonacci(n))}
+    lead = leading_digits(n)
+    return {
+        "n": n,
+        "digits": digits,
+        "leading": lead,
+        "trailing": trailing_digits(n),
+        "approx": f"{lead[0]}.{lead[1:6]}e+{digits - 1}",
+    }
+
+
+def _render(n: int) -> str:
+    if n * _LOG10_PHI < MAX_EXACT_DIGITS:
+        return str(fibonacci(n))
+    return f"{leading_digits(n)}...{trailing_digits(n)} ({digit_count(n)} digits)"
+
+
+# =============== RANGES ===============
+def iter_fibonacci(start: int = 0, stop: int = None, chunk_size: int = 1000):
+    """Yield F(start) .. F(stop - 1) in lists of `chunk_size` (endless when stop is None)."""
+    start = _check_index(start)
+    if start > MAX_EXACT_N:
+        raise ValueError(f"start too large for exact values (max {MAX_EXACT_N})")
+    a, b = _pair(start)
+    i = start
+    chunk = []
+    while stop is None or i < stop:
+        chunk.append(a)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+        a, b = b, a + b
+        i += 1
+    if chunk:
+        yield chunk
+
+
+def estimated_chars(count: int) -> int:
+    """Rough JSON size of [F(0), ..., F(count - 1)]: sum of the digit counts + separators."""
+    return int(_LOG10_PHI * count * count / 2) + 3 * count
+
+
+def fibonacci_sequence(count: int, max_chars: int = MAX_OUTPUT_CHARS, k: int = SUMMARY_TERMS):
+    """The first `count` terms as a list, or a summary dict when that would exceed `max_chars`."""
+    if count <= 0:
+        return []
+    count = _check_index(count)
+    if estimated_chars(count) <= max_chars:
+        return [x for chunk in iter_fibonacci(0, count) for x in chunk]
+
+    first = [x for chunk in iter_fibonacci(0, min(k, count)) for x in chunk]
+    tail_start = max(count - k, len(first))
+    last = [_render(i) for i in range(tail_start, count)]
+    return {
+        "count": count,
+        "summarized": True,
+        "first_terms": first,
+        "last_terms": last,
+        "last_term_digits": digit_count(count - 1),
+        "total_digits": int(_LOG10_PHI * count * count / 2),
+        "note": f"Deret terlalu panjang untuk ditampilkan penuh (> {max_chars} karakter); hanya ringkasan.",
+    }
@@ -0,0 +1,300 @@
+import argparse
+import json
+import math
+import os
+import time
+
+from structured_log import get_logger, kv
+from tracing import registry
+from vector_index import (
+    EMBED_BATCH, RERANK, DocumentStore, IndexRetriever, ScalarQuantizer, VectorIndex, _top_k, embed_to_file,
+    normalize, recall_at_k,
+)
+
+# Inverted-file (IVF) approximate nearest-neighbour index for large corpora
+# (rag.py: RAG_INDEX=ivf).
+#
+# A spherical k-means "coarse quantizer" (nlist centroids, trained offline on a
+# sample) splits the vectors into lists; a query only scans the vectors of its
+# nprobe closest lists, then re-ranks the best candidates on full precision.
+# nprobe trades latency for recall and can be set per query.
+#
+# On-disk layout (one directory), everything but the centroids memory-mapped,
+# so a node only pages in the lists a query touches:
+#
+#   centroids.npy     (nlist, dim) float32       in RAM, small
+#   list_offsets.npy  (nlist + 1,) int64         list l = rows offsets[l]:offsets[l+1]
+#   list_ids.npy      (count,) int64             original id of every row, in list order
+#   list_codes.npy    (count, dim) int8|f16|f32  the vectors, in list order (contiguous per list)
+#   vectors.npy       (count, dim) float32       by original id, for the re-rank (or a path in meta.json)
+#   docs.jsonl + offsets.npy                     see vector_index.DocumentStore
+#
+#   python ivf_index.py train vectors.npy centroids.npy --nlist 4096      # offline
+#   index = build_ivf_index(chunks, embeddings, "ivf_dir", centroids="centroids.npy")
+#   index.search(query_vector, k=5, nprobe=16)
+#   index.as_retriever(embeddings, k=5, nprobe=8).invoke(query, nprobe=32)
+
+NPROBE = int(os.getenv("IVF_NPROBE", 8))
+KMEANS_ITERATIONS = 20
+SAMPLE_PER_LIST = 64        # k-means training points per centroid (capped at the corpus size)
+ASSIGN_BLOCK = 65_536
+
+log = get_logger("ivf_index")
+
+
+def default_nlist(count: int) -> int:
+    """~4 * sqrt(count) lists, the usual starting point, with at least ~39 vectors per list
+    (fewer points per centroid and k-means has too little to go on)."""
+    return max(1, min(count // 39, int(4 * math.sqrt(count))))
+
+
+# =============== COARSE QUANTIZER ===============
+def assign(vectors, centroids, block: int = ASSIGN_BLOCK):
+    """Closest centroid (max inner product) of every vector, a block at a time."""
+    import numpy as np
+
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        part = np.asarray(vectors[start:start + block], dtype=np.float32)
+        labels[start:start + len(part)] = (part @ centroids.T).argmax(axis=1)
+    return labels
+
+
+def train_kmeans(vectors, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0,
+                 sample_per_list: int = SAMPLE_PER_LIST):
+    """Spherical k-means on a random sample of (normalised) vectors -> (nlist, dim) centroids."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    size = min(len(vectors), nlist * sample_per_list)
+    picked = np.sort(rng.choice(len(vectors), size, replace=False)) if size < len(vectors) else np.arange(len(vectors))
+    sample = normalize(vectors[picked])
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # an empty list gets a random training point, so no centroid is wasted
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        moved = normalize(sums)
+        shift = float(np.abs(moved - centroids).max())
+        centroids = moved
+        if shift < 1e-4:
+            break
+    log.info("k-means trained", extra=kv(nlist=nlist, sample=len(sample), seconds=round(time.perf_counter() - started, 2)))
+    return centroids
+
+
+# =============== INDEX ===============
+class IVFIndex:
+    """Inverted lists over the coarse quantizer's centroids; same search()/as_retriever() as VectorIndex."""
+
+    def __init__(self, centroids, offsets, ids, codes, kind: str = "int8", quantizer=None, vectors=None,
+                 docstore=None, nprobe: int = NPROBE):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.codes = codes
+        self.kind = kind
+        self.quantizer = quantizer
+        self.vectors = vectors
+        self.docstore = docstore
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    def list_sizes(self):
+        import numpy as np
+
+        return np.diff(self.offsets)
+
+    def _probe(self, query, k: int, nprobe: int):
+        """Best k (ids, scores) from the nprobe closest lists, scored on the codes."""
+        import numpy as np
+
+        lists = _top_k((self.centroids @ query)[None, :], nprobe)[0][0]
+        ranges = [(int(self.offsets[l]), int(self.offsets[l + 1])) for l in np.sort(lists)]
+        rows = np.concatenate([np.arange(s, e) for s, e in ranges if e > s] or [np.empty(0, dtype=np.int64)])
+        if not len(rows):
+            return rows, np.empty(0, dtype=np.float32)
+        codes = np.concatenate([self.codes[s:e] for s, e in ranges if e > s]).astype(np.float32, copy=False)
+        if self.kind == "int8":
+            weights, bias = self.quantizer.query_terms(query)
+            scores = codes @ weights + bias
+        else:
+            scores = codes @ query
+        best, best_scores = _top_k(scores[None, :], k)
+        return np.asarray(self.ids[rows[best[0]]]), best_scores[0]
+
+    def search(self, queries, k: int = 5, nprobe: int = None, rerank: int = RERANK):
+        """(ids, scores), each (queries, k), -1 padded; only the nprobe closest lists are scanned."""
+        import numpy as np
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        queries = normalize(queries)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        use_rerank = bool(rerank) and self.vectors is not None and self.kind != "float32"
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        started = time.perf_counter()
+        for row, query in enumerate(queries):
+            found, found_scores = self._probe(query, k * rerank if use_rerank else k, nprobe)
+            if use_rerank and len(found):
+                found = np.sort(found)                        # sequential reads from the memmap
+                exact = np.asarray(self.vectors[found], dtype=np.float32) @ query
+                best = np.argsort(-exact)[:k]
+                found, found_scores = found[best], exact[best]
+            ids[row, :len(found)] = found[:k]
+            scores[row, :len(found)] = found_scores[:k]
+        registry.observe("ivf_search_seconds", time.perf_counter() - started, nprobe=str(nprobe))
+        return (ids[0], scores[0]) if single else (ids, scores)
+
+    def recall(self, queries, k: int = 5, **search_kwargs) -> float:
+        """recall@k against an exact float32 scan of the full-precision vectors."""
+        truth, _ = VectorIndex(self.vectors, "float32").search(queries, k)
+        found, _ = self.search(queries, k, **search_kwargs)
+        return recall_at_k(found.reshape(truth.shape), truth)
+
+    def as_retriever(self, embeddings, k: int = 5, **search_kwargs):
+        return IndexRetriever(index=self, embeddings=embeddings, k=k, search_kwargs=search_kwargs)
+
+    # =============== BUILD / PERSISTENCE ===============
+    @classmethod
+    def build(cls, vectors, directory: str, centroids=None, nlist: int = None, kind: str = "int8",
+              docstore=None, nprobe: int = NPROBE, info: dict = None):
+        """Write the inverted lists for normalised float32 `vectors` (usually directory/vectors.npy, memory-mapped).
+
+        `centroids` come from train_kmeans() (an array or a .npy path); without them k-means is trained here.
+        `info` is kept in meta.json as is (see VectorIndex.save).
+        """
+        import numpy as np
+        from numpy.lib.format import open_memmap
+
+        if centroids is None:
+            centroids = train_kmeans(vectors, nlist or default_nlist(len(vectors)))
+        elif isinstance(centroids, str):
+            centroids = np.load(centroids)
+        centroids = normalize(centroids)
+        if centroids.shape[1] != vectors.shape[1]:
+            raise ValueError(f"Centroids have {centroids.shape[1]} dims, the vectors {vectors.shape[1]}")
+
+        started = time.perf_counter()
+        labels = assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+
+        quantizer = ScalarQuantizer.fit(vectors) if kind == "int8" else None
+        os.makedirs(directory, exist_ok=True)
+        vectors_file = getattr(vectors, "filename", None)
+        if vectors_file is None:
+            vectors_file = os.path.join(directory, "vectors.npy")
+            np.save(vectors_file, vectors)
+        np.save(os.path.join(directory, "centroids.npy"), centroids)
+        np.save(os.path.join(directory, "list_offsets.npy"), offsets)
+        np.save(os.path.join(directory, "list_ids.npy"), order.astype(np.int64))
+        codes = open_memmap(os.path.join(directory, "list_codes.npy"), mode="w+",
+                            dtype=np.int8 if kind == "int8" else np.dtype(kind), shape=vectors.shape)
+        for start in range(0, len(order), ASSIGN_BLOCK):
+            rows = order[start:start + ASSIGN_BLOCK]
+            part = np.asarray(vectors[np.sort(rows)], dtype=np.float32)[np.argsort(np.argsort(rows))]
+            codes[start:start + len(rows)] = quantizer.encode(part) if quantizer is not None else part
+        codes.flush()
+        del codes
+        if quantizer is not None:
+            np.savez(os.path.join(directory, "quantizer.npz"), lo=quantizer.lo, scale=quantizer.scale)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"type": "ivf", "kind": kind, "count": len(vectors), "dim": int(vectors.shape[1]),
+                       "nlist": len(centroids), "vectors": _relative(vectors_file, directory), "info": info or {}}, f)
+        log.info("ivf lists written", extra=kv(count=len(vectors), nlist=len(centroids), kind=kind,
+                                               seconds=round(time.perf_counter() - started, 2)))
+        return cls.load(directory, nprobe=nprobe)
+
+    @classmethod
+    def load(cls, directory: str, nprobe: int = NPROBE):
+        import numpy as np
+
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        quantizer = None
+        if meta["kind"] == "int8":
+            with np.load(os.path.join(directory, "quantizer.npz")) as q:
+                quantizer = ScalarQuantizer(q["lo"], q["scale"])
+        vectors_path = os.path.join(directory, meta.get("vectors", "vectors.npy"))
+        return cls(
+            centroids=np.load(os.path.join(directory, "centroids.npy")),
+            offsets=np.load(os.path.join(directory, "list_offsets.npy")),
+            ids=np.load(os.path.join(directory, "list_ids.npy"), mmap_mode="r"),
+            codes=np.load(os.path.join(directory, "list_codes.npy"), mmap_mode="r"),
+            kind=meta["kind"],
+            quantizer=quantizer,
+            vectors=np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None,
+            docstore=DocumentStore.open(directory) if DocumentStore.exists(directory) else None,
+            nprobe=nprobe,
+        )
+
+
+def _relative(path, directory: str) -> str:
+    """Path stored in meta.json: relative when the file is inside the index directory."""
+    path = os.path.abspath(str(path))
+    inside = os.path.commonpath([path, os.path.abspath(directory)]) == os.path.abspath(directory)
+    return os.path.relpath(path, directory) if inside else path
+
+
+def build_ivf_index(documents, embeddings, directory: str, centroids=None, nlist: int = None, kind: str = "int8",
+                    nprobe: int = NPROBE, batch_size: int = EMBED_BATCH, info: dict = None):
+    """Embed `documents` and write an IVF index under `directory` (see IVFIndex.build)."""
+    documents = list(documents)
+    os.makedirs(directory, exist_ok=True)
+    vectors = embed_to_file(documents, embeddings, os.path.join(directory, "vectors.npy"), batch_size)
+    docstore = DocumentStore.write(directory, documents)
+    index = IVFIndex.build(vectors, directory, centroids, nlist, kind, nprobe=nprobe, info=info)
+    index.docstore = docstore
+    return index
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Train the IVF coarse quantizer offline")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="k-means centroids from a .npy of embeddings")
+    train.add_argument("vectors", help=".npy (count, dim) float32 embeddings")
+    train.add_argument("out", help="where to write the centroids .npy")
+    train.add_argument("--nlist", type=int, help="number of lists (default ~4*sqrt(count))")
+    train.add_argument("--iterations", type=int, default=KMEANS_ITERATIONS)
+    train.add_argument("--seed", type=int, default=0)
+    build = sub.add_parser("build", help="inverted lists for a .npy of embeddings")
+    build.add_argument("vectors")
+    build.add_argument("directory")
+    build.add_argument("--centroids", help="centroids .npy from 'train'")
+    build.add_argument("--kind", default="int8", choices=("float32", "float16", "int8"))
+    args = parser.parse_args()
+
+    vectors = np.load(args.vectors, mmap_mode="r")
+    if args.command == "train":
+        centroids = train_kmeans(vectors, args.nlist or default_nlist(len(vectors)), args.iterations, args.seed)
+        np.save(args.out, centroids)
+        print(f"{len(centroids)} centroids -> {args.out}")
+    else:
+        index = IVFIndex.build(vectors, args.directory, args.centroids, kind=args.kind)
+        sizes = index.list_sizes()
+        print(f"{len(index)} vectors in {index.nlist} lists (min {sizes.min()}, median {int(np.median(sizes))}, "
+              f"max {sizes.max()}) -> {args.directory}")
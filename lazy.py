@@ -0,0 +1,169 @@
+import argparse
+import functools
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+# Deferred construction for faster cold starts.
+#
+# The agent scripts used to import every SDK, build the LLM clients, load the
+# PDF / introspect the DB and compile the graph at import time. With these
+# helpers all of that happens on first use instead:
+#
+#   llm = Lazy(lambda: gemini_chat(temperature=0.1))   # nothing built yet
+#   llm.invoke(...)                                     # built here, once
+#
+#   @cached_graph
+#   def get_agent(): ...                                # compiled once per process
+#
+# EAGER_INIT=1 builds everything at startup instead (long-running servers that
+# would rather pay the cost before the first request).
+#
+# Track import-time regressions with:
+#   python lazy.py profile rag_db_test_2 --top 20
+#   python lazy.py profile rag_db_test_2 --save baseline.json
+#   python lazy.py profile rag_db_test_2 --baseline baseline.json --threshold 0.2
+
+
+_registry = []
+
+
+class Lazy:
+    """Proxy that calls `factory()` on first attribute access (thread-safe, once)."""
+
+    def __init__(self, factory, name: str = None):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name or getattr(factory, "__name__", "lazy"))
+        object.__setattr__(self, "_value", None)
+        object.__setattr__(self, "_ready", False)
+        object.__setattr__(self, "_lock", threading.Lock())
+        _registry.append(self)
+
+    def get(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    object.__setattr__(self, "_value", self._factory())
+                    object.__setattr__(self, "_ready", True)
+        return self._value
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    # enough of the container protocol for schema dicts / tool lists
+    def __getitem__(self, key):
+        return self.get()[key]
+
+    def __contains__(self, key):
+        return key in self.get()
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def __len__(self):
+        return len(self.get())
+
+    def __repr__(self):
+        state = "ready" if self._ready else "pending"
+        return f"<Lazy {self._name} ({state})>"
+
+
+def lazy_import(name: str):
+    """Module proxy; the import runs on first attribute access."""
+    return Lazy(lambda: importlib.import_module(name), name)
+
+
+def cached_graph(build):
+    """Decorator: build + compile the graph once, then reuse it for every request."""
+    return functools.cache(build)
+
+
+def warm_all() -> None:
+    """Build every Lazy created so far."""
+    for item in list(_registry):
+        item.get()
+
+
+def maybe_warm() -> None:
+    if os.getenv("EAGER_INIT", "0") not in ("0", "", "false"):
+        warm_all()
+
+
+# =============== IMPORT-TIME PROFILER ===============
+def profile_imports(module: str) -> dict:
+    """Import `module` in a fresh interpreter with -X importtime.
+
+    Returns {"module": ..., "total_us": ..., "imports": {name: cumulative_us}}.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        imports[name.strip()] = int(cumulative_us)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    return {"module": module, "total_us": imports.get(module, 0), "imports": imports}
+
+
+def top_level(report: dict) -> dict:
+    """Only first-level packages (the ones worth making lazy)."""
+    return {name: us for name, us in report["imports"].items() if "." not in name}
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_us: int = 10_000) -> list:
+    """Packages whose cumulative import time grew by more than `threshold` (fraction).
+
+    Packages under `min_us` in the baseline are ignored, they are mostly noise.
+    """
+    regressions = []
+    current = top_level(report)
+    for name, before in top_level(baseline).items():
+        after = current.get(name)
+        if after is not None and before >= min_us and after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    total_before, total_after = baseline["total_us"], report["total_us"]
+    if total_before >= min_us and total_after > total_before * (1 + threshold):
+        regressions.append((report["module"], total_before, total_after))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time profiler for the agent scripts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prof = sub.add_parser("profile", help="cumulative import time per package")
+    prof.add_argument("module")
+    prof.add_argument("--top", type=int, default=15)
+    prof.add_argument("--save", help="write the report as JSON (baseline for later runs)")
+    prof.add_argument("--baseline", help="compare against a saved report")
+    prof.add_argument("--threshold", type=float, default=0.2, help="allowed growth, default 20%%")
+    args = parser.parse_args()
+
+    report = profile_imports(args.module)
+    print(f"import {args.module}: {report['total_us'] / 1000:.1f} ms")
+    for name, us in sorted(top_level(report).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {us / 1000:>9.1f} ms  {name}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before / 1000:.1f} ms -> {after / 1000:.1f} ms")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,313 @@
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from langchain_core.messages import AIMessageChunk, message_to_dict, messages_from_dict
+from tracing import registry
+
+# Response cache for deterministic chat-model calls (temperature ~0, same
+# prompt): the text-to-SQL prompt, repeated react_3 test prompts, benchmarks.
+#
+# Key   = sha256 of canonical JSON of (model params, bound tools, call kwargs, messages)
+# Value = the AIMessage, serialised with message_to_dict
+#
+# Backends: MemoryCache (LRU + TTL) and SQLiteCache (on disk, LRU + TTL).
+# LLM_CACHE selects the backend: "memory" (default), "sqlite[:path]" or "off".
+# LLM_CACHE_MODE: "readwrite" (default), "replay" (offline: a miss is an
+# error), "record" (always call the model, refresh the cache).
+
+
+class CacheMiss(Exception):
+    pass
+
+
+# =============== KEYS ===============
+def _canonical(value):
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump())
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _describe_model(obj) -> dict:
+    """Model class + identifying params + anything bound (tools, tool_choice)."""
+    bound = {}
+    while True:
+        if hasattr(obj, "inner") and hasattr(obj, "limiter"):  # rate_limit.Throttled
+            obj = obj.inner
+        elif hasattr(obj, "bound") and hasattr(obj, "kwargs"):   # RunnableBinding
+            bound.update(obj.kwargs)
+            obj = obj.bound
+        else:
+            break
+    params = getattr(obj, "_identifying_params", None) or {}
+    return {"class": type(obj).__name__, "params": _canonical(dict(params)), "bound": _canonical(bound)}
+
+
+def _describe_messages(value) -> list:
+    if isinstance(value, str):
+        return [{"type": "human", "content": value}]
+    if isinstance(value, dict):
+        value = value.get("messages", [])
+    described = []
+    for m in value:
+        # ids are random per run, so they must not be part of the key
+        described.append({
+            "type": getattr(m, "type", type(m).__name__),
+            "content": _canonical(getattr(m, "content", m)),
+            "tool_calls": _canonical([
+                {"name": tc["name"], "args": tc["args"]} for tc in getattr(m, "tool_calls", None) or []
+            ]),
+            "tool_call_id": getattr(m, "tool_call_id", None),
+        })
+    return described
+
+
+def cache_key(model, input, kwargs=None) -> str:
+    payload = {
+        "model": _describe_model(model),
+        "kwargs": _canonical(kwargs or {}),
+        "messages": _describe_messages(input),
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# =============== BACKENDS ===============
+class MemoryCache:
+    """In-process LRU with optional per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        with self.lock:
+            self.entries[key] = (time.time() + ttl if ttl else None, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteCache:
+    """On-disk cache (survives restarts, replays whole benchmark runs)."""
+
+    def __init__(self, path: str = "llm_cache.sqlite3", max_entries: int = 100_000, ttl: float = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires REAL,
+            accessed REAL NOT NULL
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self.conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires is not None and expires < now:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now),
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Process-wide cache backend selected by LLM_CACHE (None when "off")."""
+    global _default_cache
+    if _default_cache is None:
+        setting = os.getenv("LLM_CACHE", "memory")
+        if setting == "off":
+            return None
+        if setting.startswith("sqlite"):
+            _, _, path = setting.partition(":")
+            _default_cache = SQLiteCache(path or "llm_cache.sqlite3")
+        else:
+            _default_cache = MemoryCache()
+    return _default_cache
+
+
+# =============== PER-NODE POLICY ===============
+_cache_enabled = contextvars.ContextVar("llm_cache_enabled", default=True)
+
+
+@contextmanager
+def cache_policy_scope(enabled: bool):
+    token = _cache_enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _cache_enabled.reset(token)
+
+
+def cache_policy(enabled: bool):
+    """Decorator for graph nodes: opt in/out of the LLM cache inside this node."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with cache_policy_scope(enabled):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =============== WRAPPER ===============
+stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+
+def hit_ratio() -> float:
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+
+registry.gauge("llm_cache_hit_ratio", hit_ratio)
+
+
+def _dump(message) -> str:
+    return json.dumps(message_to_dict(message))
+
+
+def _load(value: str):
+    return messages_from_dict([json.loads(value)])[0]
+
+
+class Cached:
+    """Proxy that serves a chat model's invoke/stream from a cache."""
+
+    def __init__(self, inner, cache, ttl: float = None, mode: str = None):
+        self.inner = inner
+        self.cache = cache
+        self.ttl = ttl
+        self.mode = mode or os.getenv("LLM_CACHE_MODE", "readwrite")
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _lookup(self, input, kwargs):
+        if not _cache_enabled.get():
+            stats["bypassed"] += 1
+            registry.inc("llm_cache_lookups_total", result="bypassed")
+            return None, None
+        key = cache_key(self.inner, input, kwargs)
+        if self.mode != "record":
+            value = self.cache.get(key)
+            if value is not None:
+                stats["hits"] += 1
+                registry.inc("llm_cache_lookups_total", result="hit")
+                return key, _load(value)
+        stats["misses"] += 1
+        registry.inc("llm_cache_lookups_total", result="miss")
+        if self.mode == "replay":
+            raise CacheMiss(f"No cached response for key {key[:12]} (LLM_CACHE_MODE=replay)")
+        return key, None
+
+    def invoke(self, input, config=None, **kwargs):
+        key, hit = self._lookup(input, kwargs)
+        if hit is not None:
+            return hit
+        result = self.inner.invoke(input, config, **kwargs)
+        if key is not None:
+            self.cache.set(key, _dump(result), self.ttl)
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        key, hit = self._lookup(input, kwargs)
+        if hit is not None:
+            return hit
+        result = await self.inner.ainvoke(input, config, **kwargs)
+        if key is not None:
+            self.cache.set(key, _dump(result), self.ttl)
+        return result
+
+    def stream(self, input, config=None, **kwargs):
+        key, hit = self._lookup(input, kwargs)
+        if hit is not None:
+            yield AIMessageChunk(content=hit.content, tool_calls=hit.tool_calls)
+            return
+        full = None
+        for chunk in self.inner.stream(input, config, **kwargs):
+            full = chunk if full is None else full + chunk
+            yield chunk
+        if key is not None and full is not None:
+            self.cache.set(key, _dump(full), self.ttl)
+
+    def bind_tools(self, *args, **kwargs):
+        return Cached(self.inner.bind_tools(*args, **kwargs), self.cache, self.ttl, self.mode)
+
+    def bind(self, **kwargs):
+        return Cached(self.inner.bind(**kwargs), self.cache, self.ttl, self.mode)
+
+
+def cached(model, cache=None, ttl: float = None, mode: str = None):
+    """Wrap a chat model with a response cache (returns the model unchanged if caching is off)."""
+    cache = cache or get_cache()
+    if cache is None:
+        return model
+    return Cached(model, cache, ttl, mode)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Iterator, Sequence
+
+import httpx
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, HumanMessage, ToolMessage
+
+# Async-first HTTP layer for the LLM providers we call directly over HTTP
+# (openrouter_chat.OpenRouterChat; the Gemini models go through
+# langchain_google_genai's own transport).
+#
+# Every call used to open a fresh TCP+TLS connection (requests.post without a
+# session). Here one pooled httpx client per process (and one AsyncClient per
+# event loop) with keep-alive and HTTP/2 is shared, so short tool-loop turns
+# reuse the same connection. The AsyncClient of a loop is closed when that loop
+# shuts down (asyncio.run), so each run_batch() does not leave one behind.
+#
+# The base URL can be pointed at llm_stub_server.py for local testing:
+#   OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0)
+_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_lock = threading.Lock()
+_sync_client = None
+_async_clients = {}   # event loop -> (AsyncClient, closer async generator)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.Client:
+    """Shared, pooled sync client (keep-alive, HTTP/2 when h2 is installed)."""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(http2=_http2_available(), limits=_LIMITS, timeout=_TIMEOUT)
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared, pooled async client for the running event loop (closed when the loop shuts down)."""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is not None and not entry[0].is_closed:
+        return entry[0]
+    client = httpx.AsyncClient(http2=_http2_available(), limits=_LIMITS, timeout=_TIMEOUT)
+    closer = _close_with_loop(loop, client)
+    _async_clients[loop] = (client, closer)
+    # run it up to its yield: from then on the loop tracks it and finalises it on shutdown
+    asyncio.ensure_future(closer.__anext__())
+    return client
+
+
+async def _close_with_loop(loop, client):
+    """Parked at `yield` until asyncio.run() finalises the loop's async generators (shutdown_asyncgens)."""
+    try:
+        yield
+    finally:
+        entry = _async_clients.get(loop)
+        if entry is not None and entry[0] is client:
+            del _async_clients[loop]
+        await client.aclose()
+
+
+async def aclose_http_clients() -> None:
+    """Close the async client of the running loop now (it is also closed when the loop shuts down)."""
+    entry = _async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].aclose()
+
+
+def close_http_clients() -> None:
+    global _sync_client
+    with _lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+# =============== SSE ===============
+def iter_sse_data(lines: Iterator[str]) -> Iterator[str]:
+    """Yield the `data:` payloads of a server-sent event stream."""
+    for line in lines:
+        if line.startswith("data:"):
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            if data:
+                yield data
+
+
+async def aiter_sse_data(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    async for line in lines:
+        if line.startswith("data:"):
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            if data:
+                yield data
+
+
+# =============== MESSAGE CONVERSION ===============
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in content or []
+    )
+
+
+def to_openai_messages(messages: Sequence[BaseMessage]) -> list:
+    """LangChain messages -> OpenAI/OpenRouter chat format."""
+    converted = []
+    for m in messages:
+        if isinstance(m, SystemMessage):
+            converted.append({"role": "system", "content": _text(m.content)})
+        elif isinstance(m, HumanMessage):
+            converted.append({"role": "user", "content": _text(m.content)})
+        elif isinstance(m, ToolMessage):
+            converted.append({"role": "tool", "tool_call_id": m.tool_call_id, "content": _text(m.content)})
+        elif isinstance(m, AIMessage):
+            entry = {"role": "assistant", "content": _text(m.content)}
+            if m.tool_calls:
+                entry["tool_calls"] = [
+                    {
+                        "id": tc["id"],
+                        "type": "function",
+                        "function": {"name": tc["name"], "arguments": json.dumps(tc["args"])},
+                    }
+                    for tc in m.tool_calls
+                ]
+            converted.append(entry)
+        else:
+            converted.append({"role": "user", "content": _text(m.content)})
+    return converted
@@ -0,0 +1,181 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stub that imitates the OpenRouter endpoint, so the HTTP
+# layer (pooling, streaming) can be exercised without an API key.
+#
+#   python llm_stub_server.py --port 8765
+#   OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1
+#
+# GET /stats returns how many connections and requests the server has seen;
+# with a pooled client, connections stays far below requests.
+#
+# --fail-every N answers every Nth request with 429 (Retry-After: 0) to
+# exercise client retries. When a chat completions request carries tools and
+# the last message is from the user, the stub calls the first tool, filling
+# string arguments with the user text and numbers with 1.
+
+
+def _last_user_text(messages) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return m.get("content") or ""
+    return ""
+
+
+def _stub_tool_call(tools, user_text) -> dict:
+    function = tools[0].get("function", {})
+    args = {}
+    for name, spec in function.get("parameters", {}).get("properties", {}).items():
+        args[name] = 1 if spec.get("type") in ("integer", "number") else user_text
+    return {"id": "call_stub_0", "type": "function", "function": {"name": function.get("name"), "arguments": json.dumps(args)}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count_request(self) -> int:
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+            return self.server.stats["requests"]
+
+    def _rate_limited(self, request_number: int) -> bool:
+        fail_every = self.server.fail_every
+        if not fail_every or request_number % fail_every:
+            return False
+        with self.server.stats_lock:
+            self.server.stats["rate_limited"] += 1
+        data = b'{"error": {"code": 429, "message": "stub rate limit"}}'
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return True
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunks(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        request_number = self._count_request()
+        body = self._read_json()
+        if self._rate_limited(request_number):
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.startswith("/api/v1/chat/completions"):
+            self._openrouter(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _openrouter(self, body):
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        tool_call = None
+        if body.get("tools") and last.get("role") == "user":
+            tool_call = _stub_tool_call(body["tools"], last.get("content") or "")
+            reply = ""
+        elif last.get("role") == "tool":
+            reply = f"stub reply: {last.get('content') or ''}"
+        else:
+            reply = f"stub reply: {_last_user_text(messages)}"
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": reply}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            self._send_json(200, {
+                "id": "stub",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(reply.split()), "total_tokens": 10 + len(reply.split())},
+            })
+            return
+        self._start_sse()
+        if tool_call:
+            event = {"choices": [{"index": 0, "delta": {"tool_calls": [{"index": 0, **tool_call}]}}]}
+            self._send_chunk(f"data: {json.dumps(event)}\n\n")
+        else:
+            for word in reply.split(" "):
+                event = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                self._send_chunk(f"data: {json.dumps(event)}\n\n")
+        self._send_chunk("data: [DONE]\n\n")
+        self._end_chunks()
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.0, fail_every=0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_every = fail_every
+    server.stats = {"connections": 0, "requests": 0, "rate_limited": 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def start_stub_server(latency=0.0, fail_every=0):
+    """Start the stub in a background thread; returns (server, base_url)."""
+    server = make_server(latency=latency, fail_every=fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenRouter stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per request")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with 429")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.fail_every)
+    print(f"Stub LLM server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -2,7 +2,8 @@ from typing import TypedDict , List , Union
 from langchain_core.messages import HumanMessage , AIMessage
 from langgraph.graph import StateGraph , START , END
 from dotenv import load_dotenv
-from langchain_community.chat_models import ChatOllama
+from models import ollama_chat
+from structured_log import ConversationLog
 
 import os
 
@@ -11,7 +12,7 @@ load_dotenv()
 class AgentState(TypedDict) : 
     messages : List[Union[HumanMessage , AIMessage]]
 
-llm = ChatOllama(model="qwen:7b")
+llm = ollama_chat(model="qwen:7b")
 
 
 def process(state : AgentState) -> AgentState :
@@ -32,23 +33,20 @@ graph.add_edge("process" , END)
 agent = graph.compile()
 
 conversation_history = []
+# Log percakapan ditulis langsung per pesan (background writer), bukan di akhir sesi
+conversation_log = ConversationLog("logging.txt")
 
 user_input = input("You : ")
-while user_input != "exit" :
-    conversation_history.append(HumanMessage(content=user_input))
-    result = agent.invoke({"messages" : conversation_history})
-    # print(result["messages"][-1].content)
-    conversation_history = result["messages"]
-    user_input = input("You : ")
-    
-with open("logging.txt" , "w") as file : 
-    file.write("Conversation History : \n")
-    
-    for message in conversation_history :  
-        if(isinstance(message , HumanMessage)) :
-            file.write(f"You : {message.content}\n")
-        if(isinstance(message , AIMessage)) :
-            file.write(f"AI : {message.content}\n")
-    file.write("End of Conversation")
+try :
+    while user_input != "exit" :
+        conversation_history.append(HumanMessage(content=user_input))
+        conversation_log.write("You" , user_input)
+        result = agent.invoke({"messages" : conversation_history})
+        # print(result["messages"][-1].content)
+        conversation_history = result["messages"]
+        conversation_log.write("AI" , conversation_history[-1].content)
+        user_input = input("You : ")
+finally :
+    conversation_log.close()
     
     
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+from rate_limit import throttled, get_limiter
+from llm_cache import cached
+
+# One place to construct the models every script uses, so shared concerns
+# (rate limiting, response caching) are wired in once.
+#
+# LLM_BACKEND selects the provider for every entry point:
+#   gemini (default)  ChatGoogleGenerativeAI / GoogleGenerativeAIEmbeddings
+#   fake              fakes.FakeChatModel / fakes.FakeEmbeddings, offline and
+#                     deterministic (FAKE_LLM_LATENCY, FAKE_LLM_SEED,
+#                     FAKE_LLM_SCRIPT, FAKE_EMBEDDING_DIM)
+
+GEMINI_CHAT_MODEL = "gemini-1.5-flash-latest"
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+
+
+def llm_backend() -> str:
+    return os.getenv("LLM_BACKEND", "gemini").lower()
+
+
+def require_api_key(name: str = "GOOGLE_API_KEY"):
+    """The provider API key; only mandatory when a real backend is selected."""
+    api_key = os.getenv(name)
+    if not api_key and llm_backend() != "fake":
+        raise EnvironmentError(f"{name} not found in environment.")
+    return api_key
+
+
+def fake_chat(**kwargs):
+    """FakeChatModel behind its own (generous) limiter, so the limiter overhead is still measured."""
+    from fakes import FakeChatModel
+
+    kwargs.setdefault("latency", os.getenv("FAKE_LLM_LATENCY", "fixed:0"))
+    kwargs.setdefault("seed", int(os.getenv("FAKE_LLM_SEED", 0)))
+    return throttled(FakeChatModel(**kwargs), get_limiter("fake", rpm=1_000_000, tpm=1e12, max_concurrency=64))
+
+
+def gemini_chat(model: str = GEMINI_CHAT_MODEL, cache: bool = False, **kwargs):
+    """ChatGoogleGenerativeAI behind the shared Gemini rate limiter.
+
+    cache=True puts the response cache in front of the limiter, so cache hits
+    do not use any quota. Only use it for deterministic call sites.
+    """
+    if llm_backend() == "fake":
+        model = fake_chat()
+        return cached(model) if cache else model
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    kwargs.setdefault("api_key", os.getenv("GOOGLE_API_KEY"))
+    model = throttled(ChatGoogleGenerativeAI(model=model, **kwargs), get_limiter("gemini"))
+    return cached(model) if cache else model
+
+
+def gemini_embeddings(model: str = GEMINI_EMBEDDING_MODEL, **kwargs):
+    """GoogleGenerativeAIEmbeddings behind its own rate limiter (separate quota)."""
+    if llm_backend() == "fake":
+        from fakes import FakeEmbeddings
+
+        return throttled(FakeEmbeddings(), get_limiter("fake-embeddings", rpm=1_000_000, tpm=1e12, max_concurrency=64))
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return throttled(GoogleGenerativeAIEmbeddings(model=model, **kwargs), get_limiter("gemini-embeddings"))
+
+
+def ollama_chat(model: str = "qwen:7b", **kwargs):
+    """Local ChatOllama (main.py / stream.py), or the fake model under LLM_BACKEND=fake."""
+    if llm_backend() == "fake":
+        return fake_chat()
+
+    from langchain_community.chat_models import ChatOllama
+
+    return ChatOllama(model=model, **kwargs)
@@ -1,31 +1,343 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from concurrent.futures import Future
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from llm_client import (
+    OPENROUTER_BASE_URL, get_http_client, get_async_http_client,
+    iter_sse_data, aiter_sse_data, to_openai_messages,
+)
+import asyncio
+import hashlib
+import httpx
+import json
 import os
-import requests
+import random
+import threading
+import time
+
+# OpenRouter as a LangChain chat model, usable in any of the graphs:
+#   model = OpenRouterChat(model="qwen/qwen3-30b-a3b").bind_tools(tools)
+#
+# - SSE token streaming (stream / astream, and graph token streaming)
+# - exponential backoff with jitter on 429 and 5xx (honours Retry-After)
+# - tool calls in both directions (bind_tools, AIMessage.tool_calls)
+# - identical in-flight requests are coalesced into one upstream call
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_inflight_lock = threading.Lock()
+_inflight = {}    # payload hash -> concurrent.futures.Future
+_ainflight = {}   # (event loop, payload hash) -> asyncio.Future
+
+
+class OpenRouterError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"OpenRouter error: {status_code} - {text}")
+        self.status_code = status_code
+
+
+def _payload_key(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _parse_tool_calls(raw_calls) -> list:
+    tool_calls = []
+    for call in raw_calls or []:
+        function = call.get("function", {})
+        try:
+            args = json.loads(function.get("arguments") or "{}")
+        except json.JSONDecodeError:
+            args = {}
+        tool_calls.append({"name": function.get("name", ""), "args": args, "id": call.get("id"), "type": "tool_call"})
+    return tool_calls
+
+
+def _message_from_response(data: dict) -> AIMessage:
+    message = data["choices"][0]["message"]
+    usage = data.get("usage") or {}
+    kwargs = {}
+    if usage:
+        kwargs["usage_metadata"] = {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+        }
+    return AIMessage(
+        content=message.get("content") or "",
+        tool_calls=_parse_tool_calls(message.get("tool_calls")),
+        response_metadata={"model_name": data.get("model"), "finish_reason": data["choices"][0].get("finish_reason")},
+        **kwargs,
+    )
+
+
+def _chunk_from_event(event: dict) -> Optional[AIMessageChunk]:
+    choices = event.get("choices") or []
+    if not choices:
+        return None
+    delta = choices[0].get("delta") or {}
+    tool_call_chunks = [
+        {
+            "name": call.get("function", {}).get("name"),
+            "args": call.get("function", {}).get("arguments"),
+            "id": call.get("id"),
+            "index": call.get("index"),
+        }
+        for call in delta.get("tool_calls") or []
+    ]
+    if not delta.get("content") and not tool_call_chunks:
+        return None
+    return AIMessageChunk(content=delta.get("content") or "", tool_call_chunks=tool_call_chunks)
+
+
+class OpenRouterChat(BaseChatModel):
+    model: str = "qwen/qwen3-30b-a3b"
+    temperature: float = 0.7
+    api_key: Optional[str] = None
+    base_url: Optional[str] = None
+    max_retries: int = 5
+    backoff_base: float = 0.5   # seconds, doubled per attempt
+    backoff_max: float = 20.0
+    coalesce: bool = True
 
-class OpenRouterChat(ChatOpenAI):
     @property
     def _llm_type(self):
         return "openrouter-chat"
 
-    def _generate(self, messages, stop=None, **kwargs):
-        headers = {
-            "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+    @property
+    def _identifying_params(self):
+        return {"model": self.model, "temperature": self.temperature}
+
+    # =============== REQUEST HELPERS ===============
+    @property
+    def _url(self) -> str:
+        base = self.base_url or os.getenv("OPENROUTER_BASE_URL") or OPENROUTER_BASE_URL
+        return f"{base.rstrip('/')}/chat/completions"
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key or os.getenv('OPENROUTER_API_KEY')}",
             "HTTP-Referer": "http://localhost",  # optional
             "X-Title": "LangGraph Test",         # optional
         }
 
+    def _payload(self, messages: List[BaseMessage], stop=None, stream=False, **kwargs) -> dict:
         payload = {
-            "model": "qwen/qwen3-30b-a3b",
-            "messages": [m.dict() for m in messages],
-            "temperature": 0.7,
+            "model": self.model,
+            "messages": to_openai_messages(messages),
+            "temperature": self.temperature,
+            "stream": stream,
         }
+        if stop:
+            payload["stop"] = stop
+        for key in ("tools", "tool_choice", "max_tokens", "top_p"):
+            if kwargs.get(key) is not None:
+                payload[key] = kwargs[key]
+        return payload
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)  # jitter spreads out retry bursts
+
+    def _should_retry(self, attempt: int, status: Optional[int]) -> bool:
+        return attempt < self.max_retries and (status is None or status in RETRY_STATUS)
+
+    def _post(self, payload: dict) -> dict:
+        attempt = 0
+        while True:
+            try:
+                response = get_http_client().post(self._url, json=payload, headers=self._headers())
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+                time.sleep(self._backoff(attempt, None))
+                attempt += 1
+                continue
+            if response.status_code == 200:
+                return response.json()
+            if not self._should_retry(attempt, response.status_code):
+                raise OpenRouterError(response.status_code, response.text)
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    async def _apost(self, payload: dict) -> dict:
+        client = get_async_http_client()
+        attempt = 0
+        while True:
+            try:
+                response = await client.post(self._url, json=payload, headers=self._headers())
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, None))
+                attempt += 1
+                continue
+            if response.status_code == 200:
+                return response.json()
+            if not self._should_retry(attempt, response.status_code):
+                raise OpenRouterError(response.status_code, response.text)
+            await asyncio.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    def _post_coalesced(self, payload: dict) -> dict:
+        """Concurrent identical payloads share one upstream call."""
+        if not self.coalesce:
+            return self._post(payload)
+        key = _payload_key(payload)
+        with _inflight_lock:
+            future = _inflight.get(key)
+            leader = future is None
+            if leader:
+                future = _inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(self._post(payload))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+        return future.result()
+
+    async def _apost_coalesced(self, payload: dict) -> dict:
+        if not self.coalesce:
+            return await self._apost(payload)
+        key = (asyncio.get_running_loop(), _payload_key(payload))
+        future = _ainflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = _ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            future.set_result(await self._apost(payload))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            _ainflight.pop(key, None)
+        return future.result()
+
+    def _stream_response(self, payload: dict) -> httpx.Response:
+        """Open the SSE stream, retrying until a 200 comes back."""
+        client = get_http_client()
+        attempt = 0
+        while True:
+            request = client.build_request("POST", self._url, json=payload, headers=self._headers())
+            try:
+                response = client.send(request, stream=True)
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+                time.sleep(self._backoff(attempt, None))
+                attempt += 1
+                continue
+            if response.status_code == 200:
+                return response
+            response.read()
+            response.close()
+            if not self._should_retry(attempt, response.status_code):
+                raise OpenRouterError(response.status_code, response.text)
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    async def _astream_response(self, payload: dict) -> httpx.Response:
+        client = get_async_http_client()
+        attempt = 0
+        while True:
+            request = client.build_request("POST", self._url, json=payload, headers=self._headers())
+            try:
+                response = await client.send(request, stream=True)
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, None))
+                attempt += 1
+                continue
+            if response.status_code == 200:
+                return response
+            await response.aread()
+            await response.aclose()
+            if not self._should_retry(attempt, response.status_code):
+                raise OpenRouterError(response.status_code, response.text)
+            await asyncio.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    # =============== CHAT MODEL API ===============
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        data = self._post_coalesced(self._payload(messages, stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=_message_from_response(data))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        data = await self._apost_coalesced(self._payload(messages, stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=_message_from_response(data))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        response = self._stream_response(self._payload(messages, stop, stream=True, **kwargs))
+        try:
+            for data in iter_sse_data(response.iter_lines()):
+                chunk = _chunk_from_event(json.loads(data))
+                if chunk is None:
+                    continue
+                if run_manager and chunk.content:
+                    run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+        finally:
+            response.close()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        response = await self._astream_response(self._payload(messages, stop, stream=True, **kwargs))
+        try:
+            async for data in aiter_sse_data(response.aiter_lines()):
+                chunk = _chunk_from_event(json.loads(data))
+                if chunk is None:
+                    continue
+                if run_manager and chunk.content:
+                    await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+        finally:
+            await response.aclose()
 
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers)
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        if tool_choice:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted, **kwargs)
 
-        if response.status_code != 200:
-            raise Exception(f"OpenRouter error: {response.status_code} - {response.text}")
 
-        result = response.json()
-        content = result["choices"][0]["message"]["content"]
-        return content
+if __name__ == "__main__":
+    # Quick check against a local stub: python llm_stub_server.py, then
+    # OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1 python openrouter_chat.py
+    chat = OpenRouterChat()
+    for chunk in chat.stream([HumanMessage(content="Hello from LangGraph")]):
+        print(chunk.content, end="", flush=True)
+    print()
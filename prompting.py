@@ -0,0 +1,107 @@
+from collections.abc import Sequence
+from textwrap import dedent
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+
+# Prompt assembly for the agents' model_call / call_llm nodes.
+#
+# The system prompt is compiled into a SystemMessage once at import, and every
+# turn sends it first, byte-for-byte identical, followed by the append-only
+# conversation. That stable prefix is what provider-side context caching
+# (Gemini implicit caching, OpenRouter prompt caching) can hit. The message
+# list is wrapped in a read-only view instead of being copied every turn.
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    if not isinstance(text, str):
+        text = str(text)
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class PromptMessages(Sequence):
+    """Read-only view of [system_message, *messages] without copying."""
+
+    __slots__ = ("_head", "_tail")
+
+    def __init__(self, head: BaseMessage, tail: Sequence[BaseMessage]):
+        self._head = head
+        self._tail = tail
+
+    def __len__(self):
+        return len(self._tail) + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index == 0:
+            return self._head
+        if not 0 < index < len(self):
+            raise IndexError("PromptMessages index out of range")
+        return self._tail[index - 1]
+
+    def __iter__(self):
+        yield self._head
+        yield from self._tail
+
+
+class SystemPrompt:
+    """A system prompt compiled once and reused as the stable prompt prefix."""
+
+    def __init__(self, *parts: str):
+        text = "\n\n".join(dedent(part).strip() for part in parts if part)
+        self.message = SystemMessage(content=text)
+        self.prefix_tokens = estimate_tokens(text)
+        self.last_stats = {}
+        self.totals = {"turns": 0, "prompt_tokens": 0, "cacheable_tokens": 0}
+
+    @property
+    def text(self) -> str:
+        return self.message.content
+
+    def assemble(self, messages: Sequence[BaseMessage]) -> PromptMessages:
+        """Messages for model.invoke, with cache accounting for this turn."""
+        self._account(messages)
+        return PromptMessages(self.message, messages)
+
+    def _account(self, messages: Sequence[BaseMessage]) -> None:
+        # Everything up to the last AI reply was already sent on the previous
+        # turn, so it is part of the cacheable prefix. Only the tail (new user
+        # input or tool results) is new.
+        history_tokens = 0
+        new_tokens = 0
+        seen_ai = False
+        for message in reversed(messages):
+            if isinstance(message, AIMessage):
+                seen_ai = True
+            tokens = estimate_tokens(message.content)
+            if seen_ai:
+                history_tokens += tokens
+            else:
+                new_tokens += tokens
+
+        cacheable = self.prefix_tokens + history_tokens
+        prompt_tokens = cacheable + new_tokens
+        self.last_stats = {
+            "prompt_tokens": prompt_tokens,
+            "cacheable_tokens": cacheable,
+            "cacheable_ratio": round(cacheable / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
+        self.totals["turns"] += 1
+        self.totals["prompt_tokens"] += prompt_tokens
+        self.totals["cacheable_tokens"] += cacheable
+
+    def report(self) -> str:
+        """One-line summary of cacheable tokens so far."""
+        turns = self.totals["turns"]
+        if not turns:
+            return "No prompts assembled yet."
+        total = self.totals["prompt_tokens"]
+        cacheable = self.totals["cacheable_tokens"]
+        return (
+            f"{turns} turns, ~{total} prompt tokens, ~{cacheable} cacheable "
+            f"({cacheable / total:.0%}), ~{cacheable // turns} cacheable per turn"
+        )
@@ -1,13 +1,13 @@
-from langgraph.graph import StateGraph , END
-from langchain_google_genai import GoogleGenerativeAIEmbeddings , ChatGoogleGenerativeAI
+from models import gemini_chat , gemini_embeddings
 from dotenv import load_dotenv
-from typing import TypedDict, Annotated, Sequence
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from operator import add as add_messages
+from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
+from tracing import span
+from prompting import SystemPrompt
+from lazy import Lazy, cached_graph, maybe_warm
+from agent_factory import AgentConfig, build_agent
+from text_splitting import TokenSentenceSplitter
+from dedup import deduplicate, strip_boilerplate
 import os
 
 
@@ -15,57 +15,138 @@ load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
 
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest" , temperature=0.1, api_key=api_key )
+# Semua resource berat (client, PDF, Chroma) baru dibuat saat pertama dipakai
+llm = Lazy(lambda: gemini_chat(temperature=0.1, api_key=api_key ), "llm")
 
 
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001"
-)
+embeddings = Lazy(gemini_embeddings, "embeddings")
 
 pdf_path = "Stock_Market_Performance_2024.pdf"
 
 if not os.path.exists(pdf_path) : 
     raise FileNotFoundError(f"PDF file not found at {pdf_path}")
 
-pdf_loader = PyPDFLoader(pdf_path)
+persist_directory = os.getenv("RAG_PERSIST_DIR", r"C:\Users\FRANS\PycharmProjects\langgraph")
+collection_name = "stock_market"
 
-try : 
-    pages = pdf_loader.load()
-    print(f"PDF loaded with {len(pages)} pages.")
-except Exception as e :
-    print(f"Error loading PDF: {str(e)}")
-    raise
+# "chroma" (default), atau index ringkas dari vector_index.py: "int8" / "float32",
+# atau "ivf" (ivf_index.py, untuk korpus besar; IVF_CENTROIDS = centroid hasil training offline).
+# "float16" juga bisa, tapi query-nya lebih lambat dari float32 (lihat vector_index.py)
+index_kind = os.getenv("RAG_INDEX", "chroma").lower()
+# Index yang sudah ada di disk dipakai lagi (tanpa embed ulang); dibangun ulang kalau belum ada,
+# PDF-nya lebih baru, model embedding / setting split+dedup berubah, atau RAG_REBUILD_INDEX=1
+rebuild_index = os.getenv("RAG_REBUILD_INDEX", "0") == "1"
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=2000,
-    chunk_overlap=100,
-)
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP = 48
 
-pages_split = text_splitter.split_documents(pages) 
 
-persist_directory = r"C:\Users\FRANS\PycharmProjects\langgraph"
-collection_name = "stock_market"
+def index_directory() -> str:
+    # dihitung tiap kali: benchmarks/run.py mengganti persist_directory ke folder sementara
+    return os.path.join(persist_directory, f"{collection_name}_{index_kind}")
+
+
+def index_info() -> dict:
+    """Everything besides the PDF that the saved vectors depend on (stored in meta.json)."""
+    from dedup import BOILERPLATE_FRACTION, JACCARD_THRESHOLD
+    from text_splitting import token_counter
+
+    inner = getattr(embeddings.get(), "inner", embeddings.get())   # under the rate limiter
+    return {
+        "embeddings": f"{type(inner).__name__}:{getattr(inner, 'model', None) or getattr(inner, 'dim', '')}",
+        "splitter": [CHUNK_TOKENS, CHUNK_OVERLAP, token_counter()[0]],
+        "dedup": [BOILERPLATE_FRACTION, JACCARD_THRESHOLD],
+    }
+
+
+def saved_index_is_current() -> bool:
+    from vector_index import read_meta
+
+    directory = index_directory()
+    meta = read_meta(directory)
+    if rebuild_index or meta is None or meta.get("info") != index_info():
+        return False
+    if os.path.getmtime(os.path.join(directory, "meta.json")) < os.path.getmtime(pdf_path):
+        return False
+    return meta["dim"] == len(embeddings.get().embed_query("dimension check"))
+
+
+def build_retriever():
+    """Open the saved index, or load + split the PDF and index it (runs on the first retrieval)."""
+    if index_kind != "chroma" and saved_index_is_current():
+        from vector_index import load_index
+
+        index = load_index(index_directory())
+        print(f"Loaded {index_kind} index from {index_directory()} ({len(index)} vectors)!")
+        return index.as_retriever(embeddings.get(), k=5)
+
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pdf_loader = PyPDFLoader(pdf_path)
+
+    try : 
+        pages = pdf_loader.load()
+        print(f"PDF loaded with {len(pages)} pages.")
+    except Exception as e :
+        print(f"Error loading PDF: {str(e)}")
+        raise
+
+    # Chunk dihitung dalam token model (bukan karakter), tidak memotong kalimat/tabel;
+    # hasil split di-cache per hash dokumen (SPLIT_CACHE_DIR untuk cache di disk)
+    text_splitter = TokenSentenceSplitter(max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP)
+
+    # Header/footer/disclaimer yang muncul di banyak halaman dibuang dulu,
+    # lalu chunk yang (hampir) sama tidak ikut di-embed
+    pages, boilerplate = strip_boilerplate(pages)
+    pages_split = text_splitter.split_documents(pages)
+    print(f"Split into {len(pages_split)} chunks.")
+
+    pages_split, dedup_report = deduplicate(pages_split, boilerplate=boilerplate)
+    print(dedup_report)
+
+    if not os.path.exists(persist_directory) : 
+        os.makedirs(persist_directory)
+
+    if index_kind != "chroma" and os.path.exists(os.path.join(index_directory(), "meta.json")):
+        os.remove(os.path.join(index_directory(), "meta.json"))   # a rebuild cut short is never loaded
+
+    if index_kind == "ivf":
+        from ivf_index import build_ivf_index
+
+        index = build_ivf_index(pages_split, embeddings.get(), index_directory(), centroids=os.getenv("IVF_CENTROIDS"),
+                                info=index_info())
+        print(f"Created IVF index ({len(index)} vectors in {index.nlist} lists, nprobe={index.nprobe})!")
+        return index.as_retriever(embeddings.get(), k=5)
 
-if not os.path.exists(persist_directory) : 
-    os.makedirs(persist_directory)
+    if index_kind != "chroma":
+        from vector_index import build_index
 
-try:
-    vectorstore = Chroma.from_documents(
-        documents=pages_split,
-        embedding=embeddings,
-        persist_directory=persist_directory,
-        collection_name=collection_name
+        index = build_index(pages_split, embeddings.get(), index_directory(), kind=index_kind, info=index_info())
+        print(f"Created {index_kind} vector index ({len(index)} vectors, {index.nbytes} bytes in RAM)!")
+        return index.as_retriever(embeddings.get(), k=5)
+
+    from langchain_chroma import Chroma
+
+    try:
+        vectorstore = Chroma.from_documents(
+            documents=pages_split,
+            embedding=embeddings.get(),
+            persist_directory=persist_directory,
+            collection_name=collection_name
+        )
+        print(f"Created ChromaDB vector store!")
+        
+    except Exception as e:
+        print(f"Error setting up ChromaDB: {str(e)}")
+        raise
+
+    return vectorstore.as_retriever(
+        search_type="similarity",
+        search_kwargs={"k": 5} 
     )
-    print(f"Created ChromaDB vector store!")
-    
-except Exception as e:
-    print(f"Error setting up ChromaDB: {str(e)}")
-    raise
 
-retriever = vectorstore.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 5} 
-)
+
+retriever = Lazy(build_retriever, "retriever")
 
 
 @tool
@@ -74,7 +155,9 @@ def retriever_tool(query: str) -> str:
     This tool searches and returns the information from the Stock Market Performance 2024 document.
     """
 
-    docs = retriever.invoke(query)
+    with span("retriever", "stock_market") as extra:
+        docs = retriever.invoke(query)
+        extra["docs"] = len(docs)
 
     if not docs:
         return "I found no relevant information in the Stock Market Performance 2024 document."
@@ -88,72 +171,26 @@ def retriever_tool(query: str) -> str:
 
 tools = [retriever_tool]
 
-llm = llm.bind_tools(tools)
-
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
-
-
-def should_continue(state: AgentState):
-    """Check if the last message contains tool calls."""
-    result = state['messages'][-1]
-    return hasattr(result, 'tool_calls') and len(result.tool_calls) > 0
-
-system_prompt = """
+system_prompt = SystemPrompt("""
 You are an intelligent AI assistant who answers questions about Stock Market Performance in 2024 based on the PDF document loaded into your knowledge base.
 Use the retriever tool available to answer questions about the stock market performance data. You can make multiple calls if needed.
 If you need to look up some information before asking a follow up question, you are allowed to do that!
 Please always cite the specific parts of the documents you use in your answers.
-"""
-
-tools_dict = {our_tool.name: our_tool for our_tool in tools}
-
-# LLM Agent
-def call_llm(state: AgentState) -> AgentState:
-    """Function to call the LLM with the current state."""
-    messages = list(state['messages'])
-    messages = [SystemMessage(content=system_prompt)] + messages
-    message = llm.invoke(messages)
-    return {'messages': [message]}
-
-# Retriever Agent
-def take_action(state: AgentState) -> AgentState:
-    """Execute tool calls from the LLM's response."""
-
-    tool_calls = state['messages'][-1].tool_calls
-    results = []
-    for t in tool_calls:
-        print(f"Calling Tool: {t['name']} with query: {t['args'].get('query', 'No query provided')}")
-        
-        if not t['name'] in tools_dict: # Checks if a valid tool is present
-            print(f"\nTool: {t['name']} does not exist.")
-            result = "Incorrect Tool Name, Please Retry and Select tool from List of Available tools."
-        
-        else:
-            result = tools_dict[t['name']].invoke(t['args'].get('query', ''))
-            print(f"Result length: {len(str(result))}")
-            
-
-        # Appends the Tool Message
-        results.append(ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result)))
-
-    print("Tools Execution Complete. Back to the model!")
-    return {'messages': results}
+""")
 
 
-graph = StateGraph(AgentState)
-graph.add_node("llm", call_llm)
-graph.add_node("retriever_agent", take_action)
+@cached_graph
+def get_agent():
+    return build_agent(AgentConfig(
+        llm=llm,
+        tools=tools,
+        system_prompt=system_prompt,
+        tools_node="retriever_agent",
+    ))
 
-graph.add_conditional_edges(
-    "llm",
-    should_continue,
-    {True: "retriever_agent", False: END}
-)
-graph.add_edge("retriever_agent", "llm")
-graph.set_entry_point("llm")
 
-rag_agent = graph.compile()
+rag_agent = Lazy(get_agent, "rag_agent")
+maybe_warm()
 
 
 def running_agent():
@@ -162,6 +199,7 @@ def running_agent():
     while True:
         user_input = input("\nWhat is your question: ")
         if user_input.lower() in ['exit', 'quit']:
+            print(f"Prompt prefix cache: {system_prompt.report()}")
             break
             
         messages = [HumanMessage(content=user_input)] # converts back to a HumanMessage type
@@ -172,4 +210,5 @@ def running_agent():
         print(result['messages'][-1].content)
 
 
-running_agent()
\ No newline at end of file
+if __name__ == "__main__":
+    running_agent()
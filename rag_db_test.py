@@ -1,12 +1,14 @@
-from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
+from models import gemini_chat
 from dotenv import load_dotenv
-from typing import TypedDict, Annotated, Sequence, List, Dict, Any
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
+from typing import List, Dict, Any
+from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
-from operator import add as add_messages
+from tracing import traced
+from prompting import SystemPrompt
+from structured_log import get_logger, kv
+from lazy import Lazy, cached_graph, maybe_warm
+from agent_factory import AgentConfig, build_agent
 import sqlite3
-import pandas as pd
 import os
 import json
 
@@ -14,15 +16,18 @@ import json
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash-latest", 
+# Initialize LLM (built on first call, not at import)
+# Text-to-SQL is deterministic enough at temperature=0.1 to be cached
+llm = Lazy(lambda: gemini_chat(
     temperature=0.1, 
-    api_key=api_key
-)
+    api_key=api_key,
+    cache=True
+), "llm")
 
 DATABASE_PATH = "sales_data.db"
 
+log = get_logger("rag_db_test")
+
 
 def get_database_schema():
     """Get database schema information"""
@@ -52,6 +57,7 @@ def get_database_schema():
     conn.close()
     return schema_info
 
+@traced("sql")
 def execute_sql_query(query: str) -> List[Dict[str, Any]]:
     """Execute SQL query and return results"""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -89,7 +95,7 @@ def generate_sql_from_natural_language(question: str, schema: Dict) -> str:
                 schema_description += " [PRIMARY KEY]"
             schema_description += "\n"
     
-    print(f"Schema Description: {schema_description}")
+    log.debug("schema description", extra=kv(schema=schema_description))
     prompt = f"""
     Based on the following database schema, convert the natural language question to a SQL query.
     
@@ -115,7 +121,8 @@ def generate_sql_from_natural_language(question: str, schema: Dict) -> str:
     return sql_query.strip()
 
 
-schema = get_database_schema()
+# Schema is read from the DB on first use
+schema = Lazy(get_database_schema, "schema")
 
 @tool
 def database_query_tool(question: str) -> str:
@@ -126,7 +133,7 @@ def database_query_tool(question: str) -> str:
     try:
         # Generate SQL from natural language
         sql_query = generate_sql_from_natural_language(question, schema)
-        print(f"Generated SQL: {sql_query}")
+        log.info("generated sql", extra=kv(question=question, sql=sql_query))
         
         # Execute the query
         results = execute_sql_query(sql_query)
@@ -186,19 +193,9 @@ def database_schema_tool(table_name: str = "") -> str:
 
 # Tools setup
 tools = [database_query_tool, database_schema_tool]
-llm = llm.bind_tools(tools)
-
-# Agent State
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
-
-def should_continue(state: AgentState):
-    """Check if the last message contains tool calls."""
-    result = state['messages'][-1]
-    return hasattr(result, 'tool_calls') and len(result.tool_calls) > 0
 
 # System prompt
-system_prompt = """
+system_prompt = SystemPrompt("""
 You are an intelligent database assistant that helps users query and analyze sales data.
 You have access to a sales database with the following tables:
 - customers: customer information
@@ -213,62 +210,21 @@ You can use the following tools:
 Always try to provide helpful and accurate information based on the database content.
 If you need to understand the database structure, use the schema tool first.
 When presenting results, format them in a clear and readable way.
-"""
-
-tools_dict = {tool.name: tool for tool in tools}
-
-# LLM Agent
-def call_llm(state: AgentState) -> AgentState:
-    """Function to call the LLM with the current state."""
-    messages = list(state['messages'])
-    messages = [SystemMessage(content=system_prompt)] + messages
-    message = llm.invoke(messages)
-    return {'messages': [message]}
-
-# Tool Execution Agent
-def execute_tools(state: AgentState) -> AgentState:
-    """Execute tool calls from the LLM's response."""
-    tool_calls = state['messages'][-1].tool_calls
-    results = []
-    
-    for tool_call in tool_calls:
-        tool_name = tool_call['name']
-        tool_args = tool_call['args']
-        
-        print(f"Calling Tool: {tool_name} with args: {tool_args}")
-        
-        if tool_name not in tools_dict:
-            result = f"Error: Tool '{tool_name}' not found."
-        else:
-            try:
-                result = tools_dict[tool_name].invoke(tool_args)
-            except Exception as e:
-                result = f"Error executing tool: {str(e)}"
-        
-        results.append(ToolMessage(
-            tool_call_id=tool_call['id'],
-            name=tool_name,
-            content=str(result)
-        ))
-    
-    print("Tools execution completed!")
-    return {'messages': results}
-
-# Build the graph
-graph = StateGraph(AgentState)
-graph.add_node("llm", call_llm)
-graph.add_node("tools", execute_tools)
+""")
 
-graph.add_conditional_edges(
-    "llm",
-    should_continue,
-    {True: "tools", False: END}
-)
-graph.add_edge("tools", "llm")
-graph.set_entry_point("llm")
+# Build the agent (compiled once, on first use).
+# Conversation turns are not cached, only the text-to-SQL calls.
+@cached_graph
+def get_agent():
+    return build_agent(AgentConfig(
+        llm=llm,
+        tools=tools,
+        system_prompt=system_prompt,
+        cache=False,
+    ))
 
-# Compile the agent
-database_rag_agent = graph.compile()
+database_rag_agent = Lazy(get_agent, "database_rag_agent")
+maybe_warm()
 
 def run_database_agent():
     """Run the database RAG agent"""
@@ -298,6 +254,7 @@ def run_database_agent():
         
         if user_input.lower() in ['exit', 'quit']:
             print("Goodbye!")
+            print(f"Prompt prefix cache: {system_prompt.report()}")
             break
         
         try:
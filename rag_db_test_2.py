@@ -1,12 +1,14 @@
-from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
+from models import gemini_chat
 from dotenv import load_dotenv
-from typing import TypedDict, Annotated, Sequence, List, Dict, Any
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
+from typing import List, Dict, Any
+from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
-from operator import add as add_messages
+from tracing import traced
+from prompting import SystemPrompt
+from structured_log import get_logger, kv
+from lazy import Lazy, cached_graph, maybe_warm
+from agent_factory import AgentConfig, build_agent
 import sqlite3
-import pandas as pd
 import os
 import json
 from datetime import datetime, date
@@ -16,15 +18,18 @@ import re
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash-latest", 
+# Initialize LLM (built on first call, not at import)
+# Text-to-SQL is deterministic enough at temperature=0.1 to be cached
+llm = Lazy(lambda: gemini_chat(
     temperature=0.1, 
-    api_key=api_key
-)
+    api_key=api_key,
+    cache=True
+), "llm")
 
 DATABASE_PATH = "sales_data.db"
 
+log = get_logger("rag_db_test_2")
+
 def get_database_schema():
     """Get database schema information with sample data"""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -59,6 +64,7 @@ def get_database_schema():
     conn.close()
     return schema_info
 
+@traced("sql")
 def execute_sql_query(query: str) -> List[Dict[str, Any]]:
     """Execute SQL query and return results with better error handling"""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -66,7 +72,7 @@ def execute_sql_query(query: str) -> List[Dict[str, Any]]:
     
     try:
         # Log the query for debugging
-        print(f"Executing SQL: {query}")
+        log.debug("executing sql", extra=kv(sql=query))
         
         cursor.execute(query)
         columns = [description[0] for description in cursor.description]
@@ -83,7 +89,7 @@ def execute_sql_query(query: str) -> List[Dict[str, Any]]:
         return result_list
     
     except Exception as e:
-        print(f"SQL Error: {str(e)}")
+        log.warning("sql error", extra=kv(error=str(e), sql=query))
         return [{"error": str(e), "query": query}]
     
     finally:
@@ -237,8 +243,8 @@ def generate_sql_from_natural_language(question: str, schema: Dict) -> str:
     
     return sql_query.strip()
 
-# Initialize schema
-schema = get_database_schema()
+# Schema is read from the DB on first use
+schema = Lazy(get_database_schema, "schema")
 
 @tool
 def database_query_tool(question: str) -> str:
@@ -253,9 +259,7 @@ def database_query_tool(question: str) -> str:
         
         # Generate SQL from natural language
         sql_query = generate_sql_from_natural_language(question_processed, schema)
-        print(f"Original question: {question}")
-        print(f"Processed question: {question_processed}")
-        print(f"Generated SQL: {sql_query}")
+        log.info("database query", extra=kv(question=question, processed=question_processed, sql=sql_query))
         
         # Execute the query
         results = execute_sql_query(sql_query)
@@ -346,19 +350,10 @@ def get_current_date_tool() -> str:
 
 # Enhanced tools setup
 tools = [database_query_tool, database_schema_tool, get_current_date_tool]
-llm = llm.bind_tools(tools)
-
-# Agent State
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
-
-def should_continue(state: AgentState):
-    """Check if the last message contains tool calls."""
-    result = state['messages'][-1]
-    return hasattr(result, 'tool_calls') and len(result.tool_calls) > 0
 
-# Enhanced system prompt
-system_prompt = f"""
+# Enhanced system prompt (compiled once; date info is read once at startup)
+_date_info = get_current_date_info()
+system_prompt = SystemPrompt(f"""
 Anda adalah asisten database yang cerdas untuk menganalisis data penjualan.
 Anda memiliki akses ke database penjualan dengan tabel berikut:
 - customers: informasi pelanggan (customer_id, name, email, city, country, registration_date)
@@ -367,8 +362,8 @@ Anda memiliki akses ke database penjualan dengan tabel berikut:
 - order_items: detail item pesanan (order_item_id, order_id, product_id, quantity, unit_price)
 
 INFORMASI PENTING:
-Tanggal hari ini: {get_current_date_info()['current_date']}
-Bulan ini: {get_current_date_info()['current_month']}
+Tanggal hari ini: {_date_info['current_date']}
+Bulan ini: {_date_info['current_month']}
 
 Status pesanan dalam database menggunakan bahasa Inggris:
 - 'Completed' = selesai, sudah selesai, complete, done
@@ -387,62 +382,21 @@ Selalu berikan informasi yang membantu dan akurat berdasarkan konten database.
 Jika perlu memahami struktur database, gunakan schema tool terlebih dahulu.
 Format hasil dengan jelas dan mudah dibaca.
 Respons dalam bahasa Indonesia jika pengguna bertanya dalam bahasa Indonesia.
-"""
-
-tools_dict = {tool.name: tool for tool in tools}
-
-# LLM Agent
-def call_llm(state: AgentState) -> AgentState:
-    """Function to call the LLM with the current state."""
-    messages = list(state['messages'])
-    messages = [SystemMessage(content=system_prompt)] + messages
-    message = llm.invoke(messages)
-    return {'messages': [message]}
-
-# Tool Execution Agent
-def execute_tools(state: AgentState) -> AgentState:
-    """Execute tool calls from the LLM's response."""
-    tool_calls = state['messages'][-1].tool_calls
-    results = []
-    
-    for tool_call in tool_calls:
-        tool_name = tool_call['name']
-        tool_args = tool_call['args']
-        
-        print(f"Calling Tool: {tool_name} with args: {tool_args}")
-        
-        if tool_name not in tools_dict:
-            result = f"Error: Tool '{tool_name}' not found."
-        else:
-            try:
-                result = tools_dict[tool_name].invoke(tool_args)
-            except Exception as e:
-                result = f"Error executing tool: {str(e)}"
-        
-        results.append(ToolMessage(
-            tool_call_id=tool_call['id'],
-            name=tool_name,
-            content=str(result)
-        ))
-    
-    print("Tools execution completed!")
-    return {'messages': results}
-
-# Build the graph
-graph = StateGraph(AgentState)
-graph.add_node("llm", call_llm)
-graph.add_node("tools", execute_tools)
+""")
 
-graph.add_conditional_edges(
-    "llm",
-    should_continue,
-    {True: "tools", False: END}
-)
-graph.add_edge("tools", "llm")
-graph.set_entry_point("llm")
+# Build the agent (compiled once, on first use).
+# Conversation turns are not cached, only the text-to-SQL calls.
+@cached_graph
+def get_agent():
+    return build_agent(AgentConfig(
+        llm=llm,
+        tools=tools,
+        system_prompt=system_prompt,
+        cache=False,
+    ))
 
-# Compile the agent
-database_rag_agent = graph.compile()
+database_rag_agent = Lazy(get_agent, "database_rag_agent")
+maybe_warm()
 
 def run_database_agent():
     """Run the enhanced database RAG agent"""
@@ -480,6 +434,7 @@ def run_database_agent():
         
         if user_input.lower() in ['exit', 'quit', 'keluar']:
             print("Terima kasih! Sampai jumpa!")
+            print(f"Prompt prefix cache: {system_prompt.report()}")
             break
         
         try:
@@ -0,0 +1,360 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+from langchain_core.runnables import Runnable
+
+from prompting import estimate_tokens
+from tracing import registry
+
+# Client-side throttling for Gemini (or any other) model calls.
+#
+# - two token buckets: requests per minute and tokens per minute
+# - AIMD concurrency: the number of calls in flight grows by one per "window"
+#   of fast successes and is halved on every 429 / slow response; other
+#   errors leave it unchanged
+#
+# throttled(obj, limiter) wraps a chat model or an embeddings object and puts
+# every invoke/stream/embed call through the limiter. Batch runs therefore go
+# as fast as the quota allows, instead of sleeping a fixed time between calls.
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Best-effort detection of 429 / quota errors across providers."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "resourceexhausted" in text or "resource_exhausted" in text or "rate limit" in text
+
+
+class TokenBucket:
+    """Classic token bucket; `rate` is tokens per second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount: float) -> float:
+        """Take `amount` if available; otherwise return seconds to wait."""
+        amount = min(amount, self.capacity)  # a single huge request must still pass eventually
+        with self.lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Refund (negative) or charge extra (positive) after the fact."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight calls, driven by 429s and latency."""
+
+    def __init__(self, initial=2, minimum=1, maximum=16, target_latency=10.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.aconds = weakref.WeakKeyDictionary()  # event loop -> asyncio.Condition of its waiters
+
+    def try_enter(self) -> bool:
+        with self.cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def enter(self) -> None:
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    async def aenter(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self.cond:
+            acond = self.aconds.get(loop)
+            if acond is None:
+                acond = self.aconds[loop] = asyncio.Condition()
+        async with acond:
+            await acond.wait_for(self.try_enter)
+
+    def leave(self, latency: float, throttled: bool, failed: bool = False) -> None:
+        with self.cond:
+            self.in_flight -= 1
+            if throttled or (not failed and latency > self.target_latency):
+                self.limit = max(self.minimum, self.limit / 2)          # multiplicative decrease
+            elif not failed:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)  # additive increase
+            # any other error says nothing about the quota: limit unchanged
+            self.cond.notify_all()
+            waiting = list(self.aconds.items())
+        for loop, acond in waiting:
+            try:
+                loop.call_soon_threadsafe(_notify_soon, acond)
+            except RuntimeError:  # loop already closed
+                pass
+
+
+def _notify_soon(acond: asyncio.Condition) -> None:
+    async def notify():
+        async with acond:
+            acond.notify_all()
+
+    asyncio.ensure_future(notify())
+
+
+class RateLimiter:
+    """Requests/min + tokens/min buckets with adaptive concurrency."""
+
+    def __init__(self, rpm=15, tpm=1_000_000, max_concurrency=8, initial_concurrency=2,
+                 target_latency=10.0, max_retries=3, name="default"):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, 1, max_concurrency, target_latency)
+        self.max_retries = max_retries
+        self.stats = {"calls": 0, "throttled": 0, "waited_seconds": 0.0}
+        self.stats_lock = threading.Lock()
+        self.name = name
+
+    def _wait_time(self, estimated_tokens: int) -> float:
+        wait = self.requests.try_take(1)
+        if wait:
+            return wait
+        wait = self.tokens.try_take(estimated_tokens)
+        if wait:
+            self.requests.adjust(-1)  # give the request slot back
+        return wait
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0):
+        """Block until the quota allows one more call; yields a result dict."""
+        started = time.monotonic()
+        while True:
+            wait = self._wait_time(estimated_tokens)
+            if not wait:
+                break
+            time.sleep(wait)
+        self.concurrency.enter()
+        self._waited(time.monotonic() - started)
+        outcome = {"tokens": None, "throttled": False, "failed": False}
+        call_started = time.monotonic()
+        try:
+            yield outcome
+        except BaseException:
+            outcome["failed"] = True
+            raise
+        finally:
+            self._finish(outcome, estimated_tokens, time.monotonic() - call_started)
+
+    @asynccontextmanager
+    async def aslot(self, estimated_tokens: int = 0):
+        started = time.monotonic()
+        while True:
+            wait = self._wait_time(estimated_tokens)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        await self.concurrency.aenter()
+        self._waited(time.monotonic() - started)
+        outcome = {"tokens": None, "throttled": False, "failed": False}
+        call_started = time.monotonic()
+        try:
+            yield outcome
+        except BaseException:
+            outcome["failed"] = True
+            raise
+        finally:
+            self._finish(outcome, estimated_tokens, time.monotonic() - call_started)
+
+    def _waited(self, seconds: float) -> None:
+        with self.stats_lock:
+            self.stats["waited_seconds"] += seconds
+        if seconds > 0.001:
+            registry.observe("llm_rate_limit_wait_seconds", seconds, limiter=self.name)
+
+    def _finish(self, outcome: dict, estimated_tokens: int, latency: float) -> None:
+        with self.stats_lock:
+            self.stats["calls"] += 1
+            if outcome["throttled"]:
+                self.stats["throttled"] += 1
+        if outcome["throttled"]:
+            registry.inc("llm_rate_limited_total", limiter=self.name)
+        if outcome["tokens"] is not None:
+            self.tokens.adjust(outcome["tokens"] - estimated_tokens)
+        self.concurrency.leave(latency, outcome["throttled"], outcome["failed"])
+
+    def backoff(self, attempt: int) -> float:
+        return min(30.0, 1.0 * (2 ** attempt))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str = "gemini", rpm=15, tpm=1_000_000, max_concurrency=8) -> RateLimiter:
+    """Process-wide limiter per quota, configured from the environment.
+
+    GEMINI_RPM, GEMINI_TPM and GEMINI_MAX_CONCURRENCY (prefix = name upper-cased);
+    the arguments are the defaults when those are not set.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            prefix = name.upper().replace("-", "_")
+            _limiters[name] = RateLimiter(
+                rpm=float(os.getenv(f"{prefix}_RPM", rpm)),
+                tpm=float(os.getenv(f"{prefix}_TPM", tpm)),
+                max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", max_concurrency)),
+                name=name,
+            )
+        return _limiters[name]
+
+
+# =============== WRAPPER ===============
+def _estimate_input_tokens(value) -> int:
+    if isinstance(value, str):
+        return estimate_tokens(value)
+    if isinstance(value, dict):
+        value = value.get("messages", [])
+    total = 0
+    for item in value or []:
+        content = getattr(item, "content", item)
+        total += estimate_tokens(content)
+    return total
+
+
+def _used_tokens(result):
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens")
+    return None
+
+
+class Throttled(Runnable):
+    """Proxy that sends a chat model's / embedder's calls through a RateLimiter.
+
+    A Runnable itself, so `prompt | model`, with_config, with_retry, with_fallbacks
+    etc. wrap the proxy (and stay throttled) instead of the inner model.
+    """
+
+    def __init__(self, inner, limiter: RateLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _call(self, estimated, fn, *args, **kwargs):
+        for attempt in range(self.limiter.max_retries + 1):
+            with self.limiter.slot(estimated) as outcome:
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == self.limiter.max_retries:
+                        raise
+                    outcome["throttled"] = True
+                else:
+                    outcome["tokens"] = _used_tokens(result)
+                    return result
+            time.sleep(self.limiter.backoff(attempt))
+
+    async def _acall(self, estimated, fn, *args, **kwargs):
+        for attempt in range(self.limiter.max_retries + 1):
+            async with self.limiter.aslot(estimated) as outcome:
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == self.limiter.max_retries:
+                        raise
+                    outcome["throttled"] = True
+                else:
+                    outcome["tokens"] = _used_tokens(result)
+                    return result
+            await asyncio.sleep(self.limiter.backoff(attempt))
+
+    # chat models
+    def invoke(self, input, config=None, **kwargs):
+        return self._call(_estimate_input_tokens(input), self.inner.invoke, input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self._acall(_estimate_input_tokens(input), self.inner.ainvoke, input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        with self.limiter.slot(_estimate_input_tokens(input)) as outcome:
+            try:
+                yield from self.inner.stream(input, config, **kwargs)
+            except Exception as e:
+                outcome["throttled"] = is_rate_limit_error(e)
+                raise
+
+    async def astream(self, input, config=None, **kwargs):
+        async with self.limiter.aslot(_estimate_input_tokens(input)) as outcome:
+            try:
+                async for chunk in self.inner.astream(input, config, **kwargs):
+                    yield chunk
+            except Exception as e:
+                outcome["throttled"] = is_rate_limit_error(e)
+                raise
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        # One call per input so each one goes through the limiter
+        if not inputs:
+            return []
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+
+        def one(pair):
+            try:
+                return self.invoke(pair[0], pair[1], **kwargs)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        workers = max(1, min(len(inputs), self.limiter.concurrency.maximum))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(one, zip(inputs, configs)))
+
+    def bind_tools(self, *args, **kwargs):
+        return Throttled(self.inner.bind_tools(*args, **kwargs), self.limiter)
+
+    def bind(self, **kwargs):
+        return Throttled(self.inner.bind(**kwargs), self.limiter)
+
+    def with_structured_output(self, *args, **kwargs):
+        return Throttled(self.inner.with_structured_output(*args, **kwargs), self.limiter)
+
+    # embeddings
+    def embed_documents(self, texts):
+        return self._call(sum(estimate_tokens(t) for t in texts), self.inner.embed_documents, texts)
+
+    def embed_query(self, text):
+        return self._call(estimate_tokens(text), self.inner.embed_query, text)
+
+    async def aembed_documents(self, texts):
+        return await self._acall(sum(estimate_tokens(t) for t in texts), self.inner.aembed_documents, texts)
+
+    async def aembed_query(self, text):
+        return await self._acall(estimate_tokens(text), self.inner.aembed_query, text)
+
+
+def throttled(obj, limiter: RateLimiter = None) -> Throttled:
+    """Wrap a chat model or embeddings object with a (shared) rate limiter."""
+    return Throttled(obj, limiter or get_limiter())
@@ -1,23 +1,18 @@
-from typing import Annotated, Sequence, TypedDict
 from dotenv import load_dotenv
+import asyncio
 import os
 
-from langchain_core.messages import BaseMessage, ToolMessage, SystemMessage, HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import HumanMessage
+from models import gemini_chat, require_api_key
 from langchain_core.tools import tool
-from langgraph.graph.message import add_messages
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
+from agent_factory import AgentConfig, build_agent
+from prompting import SystemPrompt
+from streaming import stream_agent, astream_agent, print_stream
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise EnvironmentError("GOOGLE_API_KEY not found in environment.")
-
-# Define state
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
+# Tidak wajib kalau LLM_BACKEND=fake (benchmark / CI tanpa network)
+api_key = require_api_key()
 
 # Tool function
 @tool
@@ -33,53 +28,21 @@ def multiply(a: int, b: int) -> int:
 
 tools = [add , multiply]
 
-# Initialize model and bind tools
-model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", api_key=api_key ).bind_tools(tools)
-
-# Agent node
-def model_call(state: AgentState) -> AgentState:
-    system_prompt = SystemMessage(content="You are my AI Assistant, please answer my query to the best of your ability.")
-    response = model.invoke([system_prompt] + state["messages"])
-    return {"messages": [response]}
-
-# Conditional check for whether to continue
-def should_continue(state: AgentState) -> str:
-    messages = state["messages"]
-    last_message = messages[-1]
-
-    tool_calls = getattr(last_message, "tool_calls", None)
-    if tool_calls:
-        return "continue"
-    return "end"
+# Initialize model (the factory binds the tools)
+model = gemini_chat(api_key=api_key)
 
-# Graph construction
-graph = StateGraph(AgentState)
-graph.add_node("our_agent", model_call)
+# System prompt is compiled once and reused as a stable prefix
+system_prompt = SystemPrompt("You are my AI Assistant, please answer my query to the best of your ability.")
 
-tool_node = ToolNode(tools=tools)
-graph.add_node("tools", tool_node)
+# Graph construction; the agent node has a sync and an async path, so
+# agent.ainvoke / agent.astream never block the event loop
+agent = build_agent(AgentConfig(
+    llm=model,
+    tools=tools,
+    system_prompt=system_prompt,
+    agent_node="our_agent",
+))
 
-graph.set_entry_point("our_agent")
-graph.add_conditional_edges(
-    "our_agent",
-    should_continue,
-    {
-        "continue": "tools",
-        "end": END,
-    },
-)
-graph.add_edge("tools", "our_agent")
-
-agent = graph.compile()
-
-# Print streaming result
-def print_stream(stream):
-    for s in stream:
-        message = s["messages"][-1]
-        if hasattr(message, "pretty_print"):
-            message.pretty_print()
-        else:
-            print(message)
 
 # Test input
 
@@ -89,4 +52,13 @@ inputs = {
     "messages": [message]
 }
 
-print_stream(agent.stream(inputs, stream_mode="values"))
\ No newline at end of file
+async def run_async(inputs):
+    async for event in astream_agent(agent, inputs):
+        if event.kind == "token":
+            print(event.data, end="", flush=True)
+    print()
+
+if os.getenv("ASYNC_MODE"):
+    asyncio.run(run_async(inputs))
+else:
+    print_stream(stream_agent(agent, inputs))
\ No newline at end of file
@@ -1,29 +1,33 @@
-from typing import Annotated, Sequence, TypedDict, List
+from typing import List, Optional, Union
 from dotenv import load_dotenv
-import time
 import os
-import requests
+import sys
 import json
 import random
 import datetime
-from math import sqrt, pow, sin, cos, tan, pi
+import time
 
-from langchain_core.messages import BaseMessage, ToolMessage, SystemMessage, HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import HumanMessage
+from models import gemini_chat, require_api_key
 from langchain_core.tools import tool
-from langgraph.graph.message import add_messages
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
+from agent_factory import AgentConfig, build_agent
+from prompting import SystemPrompt
+import llm_cache
+from expr_engine import ExpressionError, compile_expression, evaluate_range
+from fibonacci import describe_term, fibonacci_sequence
+from stats_engine import describe, describe_source
+from text_tokenizer import analyze_file, analyze_text
+from conversions import (
+    MAX_INLINE, convert, convert_many, format_dates, load_column, numeric_summary, preview, shift_dates
+)
+from data_sources import write_csv
+from streaming import stream_agent, print_stream, write_deltas
+from batch_runner import run_batch, summarize, print_report
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise EnvironmentError("GOOGLE_API_KEY not found in environment.")
-
-# Define state
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
+# Tidak wajib kalau LLM_BACKEND=fake (benchmark / CI tanpa network)
+api_key = require_api_key()
 
 # =============== MATHEMATICAL TOOLS ===============
 @tool
@@ -33,50 +37,58 @@ def calculator(expression: str) -> str:
     Contoh: "2 + 3 * 4", "sqrt(16)", "sin(3.14159/2)"
     """
     try:
-        # Daftar fungsi yang diizinkan
-        allowed_names = {
-            "abs": abs, "round": round, "min": min, "max": max,
-            "sum": sum, "pow": pow, "sqrt": sqrt,
-            "sin": sin, "cos": cos, "tan": tan, "pi": pi,
-            "__builtins__": {}
-        }
-        
-        result = eval(expression, allowed_names)
+        # AST whitelist + cache hasil kompilasi, dengan batas operasi & ukuran angka
+        result = compile_expression(expression).evaluate()
         return f"Hasil dari {expression} = {result}"
-    except Exception as e:
+    except ExpressionError as e:
         return f"Error dalam perhitungan: {str(e)}"
 
 @tool
-def generate_fibonacci(n: int) -> List[int]:
-    """Generate deret Fibonacci sampai n bilangan"""
-    if n <= 0:
-        return []
-    elif n == 1:
-        return [0]
-    elif n == 2:
-        return [0, 1]
-    
-    fib = [0, 1]
-    for i in range(2, n):
-        fib.append(fib[i-1] + fib[i-2])
-    
-    return fib
+def evaluate_over_range(expression: str, start: float, stop: float, points: int = 1000) -> dict:
+    """
+    Evaluasi f(x) untuk banyak nilai x sekaligus (vectorized), x dari start sampai stop.
+    Contoh: expression="x**2 + 1", start=1, stop=1000000, points=1000000.
+    Mengembalikan ringkasan (min, max, mean, sum, beberapa nilai awal/akhir).
+    """
+    try:
+        return evaluate_range(expression, start, stop, points)
+    except ExpressionError as e:
+        return {"error": str(e)}
+
+@tool
+def generate_fibonacci(n: int) -> Union[List[int], dict]:
+    """Generate deret Fibonacci sampai n bilangan.
+    Kalau deretnya terlalu panjang, hasilnya ringkasan (beberapa suku awal/akhir + jumlah digit)."""
+    try:
+        return fibonacci_sequence(n)
+    except ValueError as e:
+        return {"error": str(e)}
+
+@tool
+def fibonacci_term(n: int) -> dict:
+    """Suku ke-n deret Fibonacci, F(0)=0, F(1)=1 (n boleh sangat besar, sampai 10^18).
+    Untuk angka yang sangat panjang dikembalikan jumlah digit + digit awal/akhir."""
+    try:
+        return describe_term(n)
+    except ValueError as e:
+        return {"error": str(e)}
 
 # =============== TEXT PROCESSING TOOLS ===============
 @tool
-def text_analyzer(text: str) -> dict:
-    """Analisis teks: hitung kata, karakter, kalimat"""
-    words = len(text.split())
-    chars = len(text)
-    chars_no_space = len(text.replace(' ', ''))
-    sentences = len([s for s in text.split('.') if s.strip()])
-    
+def text_analyzer(text: str = "", source: str = "") -> dict:
+    """Analisis teks: hitung kata, karakter, kalimat.
+    Untuk teks panjang (buku, dokumen) kirim path file lewat source, bukan isi teksnya."""
+    try:
+        stats = (analyze_file(source) if source else analyze_text(text)).summary()
+    except ValueError as e:
+        return {"error": str(e)}
+
     return {
-        "jumlah_kata": words,
-        "jumlah_karakter": chars,
-        "karakter_tanpa_spasi": chars_no_space,
-        "jumlah_kalimat": sentences,
-        "rata_rata_kata_per_kalimat": round(words/sentences, 2) if sentences > 0 else 0
+        "jumlah_kata": stats["words"],
+        "jumlah_karakter": stats["chars"],
+        "karakter_tanpa_spasi": stats["chars_no_whitespace"],
+        "jumlah_kalimat": stats["sentences"],
+        "rata_rata_kata_per_kalimat": stats["words_per_sentence"]
     }
 
 @tool
@@ -117,68 +129,139 @@ def get_current_time() -> str:
     now = datetime.datetime.now()
     return f"Waktu saat ini: {now.strftime('%Y-%m-%d %H:%M:%S (%A)')}"
 
-# =============== DATA PROCESSING TOOLS ===============
 @tool
-def list_statistics(numbers: List[float]) -> dict:
-    """Hitung statistik dasar dari list angka"""
-    if not numbers:
-        return {"error": "List kosong"}
-    
-    sorted_nums = sorted(numbers)
-    n = len(numbers)
-    
-    stats = {
-        "jumlah_data": n,
-        "minimum": min(numbers),
-        "maksimum": max(numbers),
-        "rata_rata": round(sum(numbers) / n, 2),
-        "median": sorted_nums[n//2] if n % 2 == 1 else (sorted_nums[n//2-1] + sorted_nums[n//2]) / 2,
-        "rentang": max(numbers) - min(numbers)
+def batch_date_calculator(days_to_add: int = 0, dates: Optional[List[str]] = None, source: str = "",
+                          column: str = "", days: Optional[List[int]] = None, output: str = "") -> dict:
+    """
+    Tambah/kurangi hari untuk BANYAK tanggal sekaligus (format YYYY-MM-DD), satu kali panggil.
+    Tanggal dari dates, atau dari source (mis. source="sales_data.db", column="orders.order_date").
+    days_to_add untuk semua tanggal, atau days = satu angka per tanggal.
+    output="hasil.csv" untuk menyimpan semua hasil; yang dikembalikan hanya 50 hasil pertama.
+    """
+    try:
+        values = load_column(source, column or None) if source else (dates or [])
+        if not values:
+            return {"error": "Tidak ada tanggal"}
+        shifted, invalid = shift_dates(values, days if days is not None else days_to_add)
+        formatted = format_dates(shifted)
+        saved = write_csv(output, {"tanggal": values, "hasil": formatted}) if output else None
+    except ValueError as e:
+        return {"error": str(e)}
+
+    summary = {
+        "jumlah": len(formatted),
+        "tanggal_tidak_valid": int(invalid.sum()),
+        "hasil": preview(formatted),
     }
-    
-    return stats
+    if len(formatted) > MAX_INLINE:
+        summary["catatan"] = f"Hanya {MAX_INLINE} hasil pertama yang ditampilkan"
+    if saved:
+        summary["file_output"] = saved
+    return summary
 
+# =============== DATA PROCESSING TOOLS ===============
 @tool
-def word_frequency(text: str) -> dict:
-    """Hitung frekuensi kata dalam teks"""
-    words = text.lower().replace(',', '').replace('.', '').replace('!', '').replace('?', '').split()
-    frequency = {}
-    
-    for word in words:
-        if word in frequency:
-            frequency[word] += 1
+def list_statistics(numbers: Optional[List[float]] = None, source: str = "", column: str = "",
+                    streaming: bool = False) -> dict:
+    """
+    Hitung statistik dari list angka: jumlah, min, max, rata-rata, median, kuartil,
+    standar deviasi, varians, histogram.
+    Untuk data besar jangan kirim angka inline, pakai source:
+      - database: source="sales_data.db", column="orders.total_amount"
+      - CSV: source="data.csv", column="nama_kolom"; file .txt / .npy juga bisa
+    streaming=True untuk data yang tidak muat di memori (kuartil jadi perkiraan).
+    """
+    try:
+        if source:
+            stats = describe_source(source, column or None, streaming=streaming or None)
+        elif numbers:
+            stats = describe(numbers)
         else:
-            frequency[word] = 1
-    
-    # Sort by frequency (descending)
-    sorted_freq = dict(sorted(frequency.items(), key=lambda x: x[1], reverse=True))
-    
-    return {"frekuensi_kata": sorted_freq, "total_kata_unik": len(sorted_freq)}
+            return {"error": "List kosong"}
+    except ValueError as e:
+        return {"error": str(e)}
+
+    result = {
+        "jumlah_data": stats["count"],
+        "minimum": stats["min"],
+        "maksimum": stats["max"],
+        "rata_rata": round(stats["mean"], 2),
+        "median": stats["median"],
+        "rentang": stats["range"],
+        "standar_deviasi": stats["std"],
+        "varians": stats["variance"],
+        "kuartil": stats["quantiles"],
+        "histogram": stats["histogram"],
+    }
+    if "source" in stats:
+        result["sumber"] = stats["source"]
+    if stats.get("streaming"):
+        result["perkiraan_error_kuartil"] = stats["quantile_error"]
+    return result
+
+@tool
+def word_frequency(text: str = "", source: str = "", top_k: int = 20, exclude_stopwords: bool = False) -> dict:
+    """Hitung frekuensi kata dalam teks, hanya top_k kata terbanyak (maks 200).
+    Untuk teks panjang kirim path file lewat source. exclude_stopwords=True
+    membuang kata umum (yang, dan, di, ...)."""
+    try:
+        stats = analyze_file(source) if source else analyze_text(text)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return {
+        "frekuensi_kata": dict(stats.top_words(top_k, exclude_stopwords)),
+        "total_kata_unik": len(stats.words),
+        "total_kata": stats.word_count
+    }
 
 # =============== UTILITY TOOLS ===============
 @tool
 def unit_converter(value: float, from_unit: str, to_unit: str) -> str:
     """
     Konversi satuan sederhana.
-    Supported: celsius/fahrenheit, km/miles, kg/pounds, cm/inches
+    Supported: suhu (celsius/fahrenheit/kelvin), panjang (mm/cm/m/km/inches/feet/yards/miles),
+    berat (g/kg/ton/ounces/pounds), volume (ml/liter/gallons), waktu (seconds/minutes/hours/days)
+    """
+    try:
+        result = convert(value, from_unit, to_unit)
+    except ValueError as e:
+        return str(e)
+    return f"{value} {from_unit} = {round(result, 4)} {to_unit}"
+
+@tool
+def batch_unit_converter(from_unit: str, to_unit: str, values: Optional[List[float]] = None,
+                         source: str = "", column: str = "", output: str = "") -> dict:
     """
-    conversions = {
-        ("celsius", "fahrenheit"): lambda x: (x * 9/5) + 32,
-        ("fahrenheit", "celsius"): lambda x: (x - 32) * 5/9,
-        ("km", "miles"): lambda x: x * 0.621371,
-        ("miles", "km"): lambda x: x / 0.621371,
-        ("kg", "pounds"): lambda x: x * 2.20462,
-        ("pounds", "kg"): lambda x: x / 2.20462,
-        ("cm", "inches"): lambda x: x / 2.54,
-        ("inches", "cm"): lambda x: x * 2.54,
+    Konversi satuan untuk BANYAK angka sekaligus (satu kali panggil, jangan panggil
+    unit_converter berulang-ulang). Angka dari values, atau dari source:
+      - database: source="sales_data.db", column="tabel.kolom"
+      - CSV: source="data.csv", column="nama_kolom"
+    output="hasil.csv" untuk menyimpan semua hasil ke file; yang dikembalikan hanya 50 nilai pertama.
+    """
+    try:
+        numbers = load_column(source, column or None, numeric=True) if source else values
+        if numbers is None or len(numbers) == 0:
+            return {"error": "Tidak ada angka untuk dikonversi"}
+        result = convert_many(numbers, from_unit, to_unit)
+        # from_unit == to_unit (atau alias) akan menimpa kolom yang sama, jadi namanya dibedakan
+        columns = {f"{from_unit} (input)": numbers, f"{to_unit} (output)": result.round(6)}
+        saved = write_csv(output, columns) if output else None
+    except ValueError as e:
+        return {"error": str(e)}
+
+    summary = {
+        "jumlah": int(result.size),
+        "dari": from_unit,
+        "ke": to_unit,
+        "hasil": preview(result),
+        **numeric_summary(result),
     }
-    
-    key = (from_unit.lower(), to_unit.lower())
-    if key in conversions:
-        result = conversions[key](value)
-        return f"{value} {from_unit} = {round(result, 4)} {to_unit}"
-    else:
-        return f"Konversi dari {from_unit} ke {to_unit} tidak didukung"
+    if result.size > MAX_INLINE:
+        summary["catatan"] = f"Hanya {MAX_INLINE} hasil pertama yang ditampilkan"
+    if saved:
+        summary["file_output"] = saved
+    return summary
 
 @tool
 def random_quote_generator() -> str:
@@ -197,20 +280,16 @@ def random_quote_generator() -> str:
 
 # Daftar semua tools
 tools = [
-    calculator, generate_fibonacci, text_analyzer, password_generator,
-    date_calculator, get_current_time, list_statistics, word_frequency,
-    unit_converter, random_quote_generator
+    calculator, evaluate_over_range, generate_fibonacci, fibonacci_term, text_analyzer, password_generator,
+    date_calculator, batch_date_calculator, get_current_time, list_statistics, word_frequency,
+    unit_converter, batch_unit_converter, random_quote_generator
 ]
 
-# Initialize model and bind tools
-model = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash-latest", 
-    api_key=api_key
-).bind_tools(tools)
+# Initialize model (lewat rate limiter Gemini bersama, tools di-bind oleh factory)
+model = gemini_chat(api_key=api_key, cache=True)
 
-# Agent node
-def model_call(state: AgentState) -> AgentState:
-    system_prompt = SystemMessage(content="""
+# System prompt + katalog tools dikompilasi sekali saja (prefix stabil untuk context caching)
+system_prompt = SystemPrompt("""
     Kamu adalah AI Assistant yang sangat membantu dengan berbagai tools praktis.
     
     Tools yang tersedia:
@@ -220,56 +299,28 @@ def model_call(state: AgentState) -> AgentState:
     4. password_generator - generate password aman
     5. date_calculator - kalkulasi tanggal
     6. get_current_time - waktu saat ini
-    7. list_statistics - statistik dari list angka
-    8. word_frequency - frekuensi kata dalam teks
+    7. list_statistics - statistik dari list angka, file, atau kolom database (sales_data.db)
+    8. word_frequency - frekuensi kata (top-k) dalam teks atau file teks
     9. unit_converter - konversi satuan
     10. random_quote_generator - quote motivasi
+    11. evaluate_over_range - evaluasi f(x) untuk banyak nilai x sekaligus (vectorized)
+    12. fibonacci_term - suku ke-n Fibonacci (cepat, juga untuk n sangat besar)
+    13. batch_unit_converter - konversi satuan untuk banyak angka / satu kolom data sekaligus
+    14. batch_date_calculator - geser banyak tanggal / satu kolom tanggal sekaligus
     
+    Untuk banyak nilai sekaligus selalu pakai tool batch_*, jangan panggil tool satuan berulang-ulang.
     Gunakan tools ini untuk membantu user dengan berbagai kebutuhan mereka.
     Berikan penjelasan yang jelas dan helpful.
     """)
-    
-    response = model.invoke([system_prompt] + state["messages"])
-    return {"messages": [response]}
-
-# Conditional check for whether to continue
-def should_continue(state: AgentState) -> str:
-    messages = state["messages"]
-    last_message = messages[-1]
-    
-    tool_calls = getattr(last_message, "tool_calls", None)
-    if tool_calls:
-        return "continue"
-    return "end"
 
-# Graph construction
-graph = StateGraph(AgentState)
-graph.add_node("our_agent", model_call)
+# Graph: llm <-> tools, tool calls dijalankan paralel
+agent = build_agent(AgentConfig(
+    llm=model,
+    tools=tools,
+    system_prompt=system_prompt,
+    agent_node="our_agent",
+))
 
-tool_node = ToolNode(tools=tools)
-graph.add_node("tools", tool_node)
-
-graph.set_entry_point("our_agent")
-graph.add_conditional_edges(
-    "our_agent",
-    should_continue,
-    {
-        "continue": "tools",
-        "end": END,
-    },
-)
-graph.add_edge("tools", "our_agent")
-
-agent = graph.compile()
-
-# Print streaming result
-def print_stream(stream):
-    for s in stream:
-        message = s["messages"][-1]
-        if hasattr(message, "pretty_print"):
-            message.pretty_print()
-        else:
-            print(message)
 
 # =============== CONTOH PENGGUNAAN ===============
 if __name__ == "__main__":
@@ -287,9 +338,22 @@ if __name__ == "__main__":
         "Berikan saya quote motivasi hari ini"
     ]
     
-    for i, test in enumerate(test_cases, 1):
-        print(f"\n--- Test {i}: {test} ---")
-        inputs = {"messages": [HumanMessage(content=test)]}
-        print_stream(agent.stream(inputs, stream_mode="values"))
-        time.sleep(5)
-        print("-" * 50)
\ No newline at end of file
+    if "--stream" in sys.argv or os.getenv("STREAM_FORMAT"):
+        # Demo satu per satu, jawaban di-stream ke terminal
+        for i, test in enumerate(test_cases, 1):
+            print(f"\n--- Test {i}: {test} ---")
+            inputs = {"messages": [HumanMessage(content=test)]}
+            if os.getenv("STREAM_FORMAT"):
+                # "jsonl" atau "frames": kirim delta state ke stdout untuk client lain
+                write_deltas(agent, inputs, sys.stdout.buffer, os.getenv("STREAM_FORMAT"))
+            else:
+                print_stream(stream_agent(agent, inputs))
+            print("-" * 50)
+    else:
+        # Semua test case jalan bersamaan (dibatasi BATCH_CONCURRENCY + rate limiter bersama)
+        started = time.perf_counter()
+        results = run_batch(agent, test_cases)
+        print_report(results, summarize(results, time.perf_counter() - started))
+
+    print(f"Prompt prefix cache: {system_prompt.report()}")
+    print(f"LLM response cache: {llm_cache.stats} (hit ratio {llm_cache.hit_ratio():.0%})")
\ No newline at end of file
@@ -0,0 +1,56 @@
+from typing import Annotated, TypedDict
+from langchain_core.messages import ToolMessage
+from langgraph.types import Command
+
+# Routing signals are small typed flags that nodes and tools write into the
+# graph state. should_continue functions read them with a dict lookup instead
+# of scanning (and lowercasing) the whole message history on every step.
+
+DOCUMENT_SAVED = "document_saved"
+TOOL_CALLS_PENDING = "tool_calls_pending"
+
+
+class Signals(TypedDict, total=False):
+    document_saved: bool
+    tool_calls_pending: bool
+
+
+def merge_signals(left: Signals | None, right: Signals | None) -> Signals:
+    """Reducer for the `signals` key: newer flags overwrite older ones."""
+    if not left:
+        return dict(right or {})
+    if not right:
+        return left
+    return {**left, **right}
+
+
+class SignalState(TypedDict):
+    signals: Annotated[Signals, merge_signals]
+
+
+def signal(**flags) -> dict:
+    """State update that only sets routing flags."""
+    return {"signals": flags}
+
+
+def tool_result(content: str, tool_call_id: str, **flags) -> Command:
+    """Return a tool result together with routing flags.
+
+    Use from a tool that takes an `InjectedToolCallId` argument; ToolNode
+    applies the Command's update to the graph state.
+    """
+    return Command(update={
+        "messages": [ToolMessage(content=content, tool_call_id=tool_call_id)],
+        "signals": flags,
+    })
+
+
+def is_set(state: dict, flag: str) -> bool:
+    """O(1) check of a routing flag in the state."""
+    signals = state.get("signals")
+    return bool(signals and signals.get(flag))
+
+
+def tool_calls_signal(message) -> dict:
+    """Routing flags for an LLM response: are there tool calls to run?"""
+    return signal(**{TOOL_CALLS_PENDING: bool(getattr(message, "tool_calls", None))})
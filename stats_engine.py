@@ -0,0 +1,210 @@
+import math
+import os
+
+from data_sources import CHUNK_SIZE, open_source
+
+# Descriptive statistics for list_statistics (react_3.py).
+#
+# In memory (NumPy, a handful of vectorised passes, no full sort):
+#   - one np.partition puts min, max and every quantile position in place
+#   - sum / sum of squared deviations via np.dot
+#   - np.histogram over [min, max]
+#
+# Streaming, for inputs that do not fit in memory (file or DB column read in
+# chunks, see data_sources.py):
+#   - pass 1: Welford / Chan merge per chunk -> count, mean, variance, min, max (exact)
+#   - pass 2: fixed-range histogram -> histogram (exact) + quantiles
+#     interpolated inside a fine histogram (error <= range / QUANTILE_BINS)
+#
+#   describe([3, 1, 2])
+#   describe_source("sales_data.db", "orders.total_amount")
+#   describe_source("big.npy", streaming=True)
+
+QUANTILES = (0.25, 0.5, 0.75)
+HISTOGRAM_BINS = 10
+QUANTILE_BINS = 1 << 16                   # resolution of streaming quantiles
+MAX_IN_MEMORY = int(os.getenv("STATS_MAX_IN_MEMORY", 20_000_000))   # values (~160 MB as float64)
+
+
+def _round(value, digits=6):
+    return round(float(value), digits)
+
+
+def _histogram(counts, edges) -> dict:
+    return {"edges": [_round(e) for e in edges], "counts": [int(c) for c in counts]}
+
+
+def _quantile_key(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+# =============== IN MEMORY ===============
+def describe(values, quantiles=QUANTILES, bins: int = HISTOGRAM_BINS, ddof: int = 1) -> dict:
+    """Full stats set for an array-like of numbers (NaN values are ignored)."""
+    import numpy as np
+
+    data = np.asarray(values, dtype=np.float64).reshape(-1)
+    data = data[~np.isnan(data)]
+    n = data.size
+    if n == 0:
+        raise ValueError("No numeric values")
+
+    quantiles = sorted(set(quantiles) | {0.5})
+    positions = [q * (n - 1) for q in quantiles]
+    kth = sorted({0, n - 1} | {math.floor(p) for p in positions} | {math.ceil(p) for p in positions})
+    part = np.partition(data, kth)
+    lo, hi = part[0], part[n - 1]
+
+    def at(p):
+        below = math.floor(p)
+        return part[below] + (part[math.ceil(p)] - part[below]) * (p - below)
+
+    total = float(data.sum())
+    mean = total / n
+    deviations = data - mean
+    m2 = float(np.dot(deviations, deviations))
+    variance = m2 / (n - ddof) if n > ddof else 0.0
+    counts, edges = np.histogram(data, bins=bins, range=(lo, hi) if hi > lo else (lo - 0.5, hi + 0.5))
+
+    return {
+        "count": n,
+        "sum": _round(total),
+        "min": _round(lo),
+        "max": _round(hi),
+        "range": _round(hi - lo),
+        "mean": _round(mean),
+        "median": _round(at(0.5 * (n - 1))),
+        "variance": _round(variance),
+        "std": _round(math.sqrt(variance)),
+        "quantiles": {_quantile_key(q): _round(at(p)) for q, p in zip(quantiles, positions)},
+        "histogram": _histogram(counts, edges),
+    }
+
+
+# =============== STREAMING ===============
+class OnlineStats:
+    """Welford's running mean/variance, merged chunk by chunk (Chan et al.)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, chunk):
+        import numpy as np
+
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(-1)
+        chunk = chunk[~np.isnan(chunk)]
+        n = chunk.size
+        if n == 0:
+            return self
+        chunk_mean = float(chunk.mean())
+        deviations = chunk - chunk_mean
+        chunk_m2 = float(np.dot(deviations, deviations))
+
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.total += float(chunk.sum())
+        self.min = min(self.min, float(chunk.min()))
+        self.max = max(self.max, float(chunk.max()))
+        return self
+
+    def add(self, value: float):
+        """Single value (plain Welford step)."""
+        if math.isnan(value):
+            return self
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        return self
+
+    def variance(self, ddof: int = 1) -> float:
+        return self.m2 / (self.count - ddof) if self.count > ddof else 0.0
+
+
+class StreamingHistogram:
+    """Counts over a fixed [lo, hi] range, filled chunk by chunk."""
+
+    def __init__(self, lo: float, hi: float, bins: int):
+        import numpy as np
+
+        if hi <= lo:
+            lo, hi = lo - 0.5, hi + 0.5
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, chunk):
+        import numpy as np
+
+        chunk = np.asarray(chunk, dtype=np.float64)
+        self.counts += np.histogram(chunk[~np.isnan(chunk)], bins=self.edges)[0]
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bin holding the q-th value."""
+        import numpy as np
+
+        total = int(self.counts.sum())
+        target = q * (total - 1)
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, target, side="right"))
+        i = min(i, len(self.counts) - 1)
+        before = cumulative[i - 1] if i else 0
+        inside = (target - before + 0.5) / self.counts[i] if self.counts[i] else 0.5
+        return float(self.edges[i] + (self.edges[i + 1] - self.edges[i]) * min(max(inside, 0.0), 1.0))
+
+
+def describe_chunks(make_chunks, quantiles=QUANTILES, bins: int = HISTOGRAM_BINS, ddof: int = 1) -> dict:
+    """Two streaming passes over `make_chunks()` (a fresh iterator of arrays per call)."""
+    stats = OnlineStats()
+    for chunk in make_chunks():
+        stats.update(chunk)
+    if stats.count == 0:
+        raise ValueError("No numeric values")
+
+    fine = StreamingHistogram(stats.min, stats.max, QUANTILE_BINS)
+    coarse = StreamingHistogram(stats.min, stats.max, bins)
+    for chunk in make_chunks():
+        fine.update(chunk)
+        coarse.update(chunk)
+
+    quantiles = sorted(set(quantiles) | {0.5})
+    variance = stats.variance(ddof)
+    return {
+        "count": stats.count,
+        "sum": _round(stats.total),
+        "min": _round(stats.min),
+        "max": _round(stats.max),
+        "range": _round(stats.max - stats.min),
+        "mean": _round(stats.mean),
+        "median": _round(fine.quantile(0.5)),
+        "variance": _round(variance),
+        "std": _round(math.sqrt(variance)),
+        "quantiles": {_quantile_key(q): _round(fine.quantile(q)) for q in quantiles},
+        "histogram": _histogram(coarse.counts, coarse.edges),
+        "streaming": True,
+        "quantile_error": _round((fine.edges[1] - fine.edges[0])),
+    }
+
+
+def describe_source(path: str, column=None, streaming: bool = None, chunk_size: int = CHUNK_SIZE,
+                    quantiles=QUANTILES, bins: int = HISTOGRAM_BINS) -> dict:
+    """Stats for a file / DB column; streams automatically when it is bigger than MAX_IN_MEMORY."""
+    source = open_source(path, column)
+    if streaming is None:
+        streaming = source.estimated_count() > MAX_IN_MEMORY
+    if streaming:
+        result = describe_chunks(lambda: source.chunks(chunk_size), quantiles, bins)
+    else:
+        result = describe(source.load(), quantiles, bins)
+    return {"source": source.name, **result}
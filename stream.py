@@ -1,28 +1,24 @@
-from typing import TypedDict , List
-from langchain_core.messages import HumanMessage
+from typing import TypedDict , List , Union
+from langchain_core.messages import HumanMessage , AIMessage
 from langgraph.graph import StateGraph , START , END
-from langchain_community.chat_models import ChatOllama
+from models import ollama_chat
 from dotenv import load_dotenv
+from streaming import stream_agent , print_stream
 import os
 
 load_dotenv()
 
 class AgentState(TypedDict):
-    messages: List[HumanMessage]
+    messages: List[Union[HumanMessage , AIMessage]]
 
-llm = ChatOllama(model="qwen:7b") 
+llm = ollama_chat(model="qwen:7b") 
 
 def process(state: AgentState) -> AgentState:
-    print("\nAI: ", end="", flush=True)
-    full_response = ""
-    
-    for chunk in llm.stream(state["messages"]):
-        content = chunk.content if chunk.content else ""
-        print(content, end="", flush=True)
-        full_response += content
+    # Token tetap di-stream: stream_agent meneruskan token dari invoke ini
+    response = llm.invoke(state["messages"])
 
     return {
-        "messages": state["messages"] + [HumanMessage(content=full_response)]
+        "messages": state["messages"] + [response]
     }
 
 graph = StateGraph(AgentState)
@@ -33,4 +29,4 @@ graph.add_edge("process", END)
 agent = graph.compile()
 
 user_input = input("You: ")
-agent.invoke({"messages": [HumanMessage(content=user_input)]})
+print_stream(stream_agent(agent, {"messages": [HumanMessage(content=user_input)]}))
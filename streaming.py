@@ -0,0 +1,255 @@
+from typing import Any, AsyncIterator, BinaryIO, Iterable, Iterator, NamedTuple
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage, messages_to_dict, messages_from_dict
+from langgraph.graph.message import add_messages
+import json
+import struct
+import zlib
+
+# Unified streaming for the tool-loop agents.
+#
+# agent.stream(..., stream_mode="values") re-emits the whole state after every
+# node and nothing shows up until the model has finished a full message.
+# Here we ask LangGraph for two modes at once:
+#   - "messages": token deltas from the chat model inside model_call, as they
+#     arrive (works with model.invoke, LangGraph hooks the callbacks)
+#   - "updates":  only what each node returned, not the full state
+
+
+class StreamEvent(NamedTuple):
+    kind: str   # "token" | "tool_call" | "update"
+    node: str
+    data: Any
+
+
+def _chunk_text(content) -> str:
+    """Text of a message chunk (Gemini can send a list of parts)."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+    return "".join(parts)
+
+
+def _events(mode: str, chunk) -> Iterator[StreamEvent]:
+    """One (mode, chunk) pair from LangGraph as StreamEvents."""
+    if mode == "messages":
+        message, metadata = chunk
+        if not isinstance(message, AIMessageChunk):
+            # Complete messages (e.g. ToolMessages) arrive with "updates"
+            return
+        node = metadata.get("langgraph_node", "")
+        text = _chunk_text(message.content)
+        if text:
+            yield StreamEvent("token", node, text)
+        for tool_chunk in message.tool_call_chunks:
+            yield StreamEvent("tool_call", node, tool_chunk)
+    else:
+        for node, update in chunk.items():
+            yield StreamEvent("update", node, update)
+
+
+def stream_agent(agent, inputs, config=None) -> Iterator[StreamEvent]:
+    """Stream token deltas, tool-call chunks and per-node state deltas."""
+    for mode, chunk in agent.stream(inputs, config, stream_mode=["messages", "updates"]):
+        yield from _events(mode, chunk)
+
+
+async def astream_agent(agent, inputs, config=None) -> AsyncIterator[StreamEvent]:
+    """Async version of stream_agent, for graphs with async nodes."""
+    async for mode, chunk in agent.astream(inputs, config, stream_mode=["messages", "updates"]):
+        for event in _events(mode, chunk):
+            yield event
+
+
+def _print_reply(message: AIMessage) -> None:
+    text = _chunk_text(message.content)
+    if text:
+        print(f"\nAI: {text}", flush=True)
+    for call in message.tool_calls:
+        print(f"\n🔧 TOOL CALL: {call['name']}", flush=True)
+
+
+def print_stream(events: Iterator[StreamEvent]) -> None:
+    """Print tokens as they arrive, then tool calls and tool results.
+
+    A node whose reply produced no token events (response-cache hit, non-streaming
+    model) gets its AIMessage printed from the update instead.
+    """
+    streaming = False
+    streamed = set()          # nodes that streamed something since their last update
+    for event in events:
+        if event.kind == "token":
+            if not streaming:
+                print("\nAI: ", end="", flush=True)
+                streaming = True
+            streamed.add(event.node)
+            print(event.data, end="", flush=True)
+        elif event.kind == "tool_call":
+            streamed.add(event.node)
+            if event.data.get("name"):
+                print(f"\n🔧 TOOL CALL: {event.data['name']}", flush=True)
+            streaming = False
+        elif event.kind == "update":
+            streaming = False
+            replayed = event.node not in streamed
+            streamed.discard(event.node)
+            # ToolNode returns a list of updates when tools return Commands
+            updates = event.data if isinstance(event.data, list) else [event.data]
+            for update in updates:
+                messages = (update or {}).get("messages", [])
+                for message in messages:
+                    if isinstance(message, ToolMessage):
+                        print(f"\n🛠️ TOOL RESULT ({message.name}): {message.content}")
+                replies = [m for m in messages if isinstance(m, AIMessage)]
+                if replayed and replies:
+                    # only the newest one: some nodes (the Drafter) return the whole history
+                    _print_reply(replies[-1])
+    print()
+
+
+# =============== DELTA STREAMING (WIRE FORMAT) ===============
+# Every delta carries a sequence number, the node that produced it, the
+# messages that are new since the previous delta and any other keys the node
+# changed. A client that applies them in order rebuilds the same state, and
+# the payload only grows with new content instead of with the whole history.
+
+def _update_list(update) -> list:
+    if update is None:
+        return []
+    return update if isinstance(update, list) else [update]
+
+
+def _message_key(message):
+    """The id add_messages assigned, or the content for a message that has none yet."""
+    if message.id:
+        return message.id
+    return (message.type, json.dumps(message.content, sort_keys=True, default=str),
+            getattr(message, "tool_call_id", None))
+
+
+def state_deltas(agent, inputs, config=None) -> Iterator[dict]:
+    """Stream state deltas: {"seq", "node", "messages"?, "set"?}."""
+    if inputs.get("messages"):
+        # give the inputs the ids the graph state will hold, so a node that returns
+        # them again (with those ids) is recognised
+        inputs = {**inputs, "messages": add_messages([], inputs["messages"])}
+    seen = set()
+
+    def make_delta(seq, node, update):
+        delta = {"seq": seq, "node": node}
+        new_messages = []
+        for message in update.get("messages") or []:
+            key = _message_key(message)
+            if key in seen:
+                # Nodes like the Drafter return the whole history again
+                continue
+            seen.add(key)
+            new_messages.append(message)
+        if new_messages:
+            delta["messages"] = messages_to_dict(new_messages)
+        changed = {k: v for k, v in update.items() if k != "messages"}
+        if changed:
+            delta["set"] = changed
+        return delta
+
+    seq = 0
+    yield make_delta(seq, "__input__", inputs)
+    for chunk in agent.stream(inputs, config, stream_mode="updates"):
+        for node, update in chunk.items():
+            for part in _update_list(update):
+                seq += 1
+                yield make_delta(seq, node, part)
+
+
+def encode_jsonl(delta: dict) -> bytes:
+    """One delta as a compact JSON line."""
+    return json.dumps(delta, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+
+
+def decode_jsonl(lines: Iterable[bytes | str]) -> Iterator[dict]:
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# Binary frame: 4-byte big-endian length, 1 flag byte (1 = zlib), payload
+_FRAME_HEADER = struct.Struct(">IB")
+_COMPRESS_MIN_BYTES = 512
+
+
+def encode_frame(delta: dict) -> bytes:
+    """One delta as a length-prefixed frame, compressed when it pays off."""
+    payload = encode_jsonl(delta)[:-1]
+    flag = 0
+    if len(payload) >= _COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(payload, 6)
+        if len(compressed) < len(payload):
+            payload, flag = compressed, 1
+    return _FRAME_HEADER.pack(len(payload), flag) + payload
+
+
+def decode_frames(stream: BinaryIO) -> Iterator[dict]:
+    """Read frames written by encode_frame from a binary stream."""
+    while True:
+        header = stream.read(_FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < _FRAME_HEADER.size:
+            raise ValueError("Truncated frame header")
+        length, flag = _FRAME_HEADER.unpack(header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            raise ValueError("Truncated frame payload")
+        if flag == 1:
+            payload = zlib.decompress(payload)
+        yield json.loads(payload)
+
+
+def write_deltas(agent, inputs, out: BinaryIO, fmt: str = "jsonl", config=None) -> int:
+    """Stream deltas to a binary stream ("jsonl" or "frames"); returns bytes written."""
+    encode = encode_frame if fmt == "frames" else encode_jsonl
+    written = 0
+    for delta in state_deltas(agent, inputs, config):
+        data = encode(delta)
+        out.write(data)
+        out.flush()
+        written += len(data)
+    return written
+
+
+class StateRebuilder:
+    """Client side: apply deltas in order to rebuild the agent state.
+
+    Messages are appended; other keys are replaced, except dicts which are
+    merged (that is how the `signals` reducer behaves).
+    """
+
+    def __init__(self):
+        self.state = {"messages": []}
+        self.last_seq = -1
+
+    def apply(self, delta: dict) -> dict:
+        seq = delta["seq"]
+        if seq != self.last_seq + 1:
+            raise ValueError(f"Missing delta: expected seq {self.last_seq + 1}, got {seq}")
+        self.last_seq = seq
+
+        if delta.get("messages"):
+            self.state["messages"].extend(messages_from_dict(delta["messages"]))
+        for key, value in delta.get("set", {}).items():
+            current = self.state.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                self.state[key] = {**current, **value}
+            else:
+                self.state[key] = value
+        return self.state
+
+    def apply_all(self, deltas: Iterable[dict]) -> dict:
+        for delta in deltas:
+            self.apply(delta)
+        return self.state
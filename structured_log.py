@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+# Leveled, structured logging that never blocks the request path.
+#
+# Records are truncated and sampled in the calling thread (cheap), then put on
+# a bounded in-memory queue. A background QueueListener thread does the
+# formatting and the actual I/O. If the queue is full the record is dropped and
+# counted instead of blocking.
+#
+#   log = get_logger(__name__)
+#   log.debug("executing sql", extra=kv(sql=query))
+#
+# Environment:
+#   LOG_LEVEL        DEBUG | INFO (default) | WARNING | ...
+#   LOG_FORMAT       text (default) | json
+#   LOG_FILE         write to this file instead of stderr
+#   LOG_MAX_CHARS    truncate long arguments/fields (default 500)
+#   LOG_SAMPLE_RATE  fraction of DEBUG/INFO records kept (default 1.0)
+
+_QUEUE_SIZE = 10_000
+_configured = False
+_listeners = []
+dropped = {"records": 0}
+
+
+def kv(**fields) -> dict:
+    """Structured fields for the `extra=` argument of a log call."""
+    return {"fields": fields}
+
+
+def _truncate(value, limit: int):
+    if isinstance(value, str):
+        if len(value) > limit:
+            return f"{value[:limit]}... [{len(value) - limit} more chars]"
+        return value
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return _truncate(repr(value), limit)
+
+
+class TruncateFilter(logging.Filter):
+    """Cap the size of arguments and fields before the message is rendered."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def filter(self, record):
+        if record.args:
+            if isinstance(record.args, dict):
+                record.args = {k: _truncate(v, self.limit) for k, v in record.args.items()}
+            else:
+                record.args = tuple(_truncate(a, self.limit) for a in record.args)
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {k: _truncate(v, self.limit) for k, v in fields.items()}
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Keep a fraction of DEBUG/INFO records; WARNING and above always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # QueueHandler.prepare() would render the message (and traceback) here,
+        # in the calling thread. Pass the record as is and let the listener's
+        # formatter do it; TruncateFilter has already turned non-primitive args
+        # into repr strings, so nothing mutable crosses the thread.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped["records"] += 1
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _start_listener(handler: logging.Handler, formatter: logging.Formatter, filters=()):
+    """Queue handler for the caller side + a background listener that does the I/O."""
+    record_queue = queue.Queue(_QUEUE_SIZE)
+    handler.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(record_queue, handler, respect_handler_level=False)
+    listener.start()
+    _listeners.append(listener)
+
+    queue_handler = NonBlockingQueueHandler(record_queue)
+    for f in filters:
+        queue_handler.addFilter(f)
+    return queue_handler, listener
+
+
+def _stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(_stop_listeners)
+
+
+def configure() -> None:
+    """Set up the root handler once (idempotent)."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    log_file = os.getenv("LOG_FILE")
+    handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler(sys.stderr)
+    formatter = JsonFormatter() if os.getenv("LOG_FORMAT") == "json" else TextFormatter()
+    queue_handler, _ = _start_listener(handler, formatter, [
+        SampleFilter(float(os.getenv("LOG_SAMPLE_RATE", "1.0"))),
+        TruncateFilter(int(os.getenv("LOG_MAX_CHARS", "500"))),
+    ])
+
+    root = logging.getLogger("agents")
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the shared "agents" hierarchy."""
+    configure()
+    return logging.getLogger(f"agents.{name}")
+
+
+class ConversationLog:
+    """Streams a conversation to a text file as it happens.
+
+    Each message is handed to a background writer immediately, so nothing is
+    lost if the session dies, and the chat loop never waits on the disk.
+    """
+
+    def __init__(self, path: str = "logging.txt"):
+        self.logger = logging.getLogger(f"conversation.{path}.{time.monotonic_ns()}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.handler = logging.FileHandler(path, mode="w", encoding="utf-8")
+        self.queue_handler, self.listener = _start_listener(self.handler, logging.Formatter("%(message)s"))
+        self.logger.addHandler(self.queue_handler)
+        self.logger.info("Conversation History : ")
+
+    def write(self, speaker: str, content: str) -> None:
+        self.logger.info("%s : %s", speaker, content)
+
+    def close(self) -> None:
+        self.logger.info("End of Conversation")
+        self.logger.removeHandler(self.queue_handler)
+        self.listener.stop()  # drains the queue
+        if self.listener in _listeners:
+            _listeners.remove(self.listener)
+        self.handler.close()
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from dedup import deduplicate, strip_boilerplate
+
+
+def _pages(bodies):
+    return [
+        Document(page_content=f"ACME Corp Annual Report 2024\n{body}\nPage {i + 1} of {len(bodies)}", metadata={"page": i})
+        for i, body in enumerate(bodies)
+    ]
+
+
+def test_varying_numeric_rows_survive_boilerplate():
+    pages = _pages([
+        f"Revenue: ${1000 + 1000 * i + 7}M\nTotal  1.{i + 5}  3.{i + 2}%\nQuarter {i + 1} was fine."
+        for i in range(4)
+    ])
+    stripped, removed = strip_boilerplate(pages)
+
+    assert removed == 8   # the header and the "Page n of 4" footer on each of the 4 pages
+    for i, page in enumerate(stripped):
+        assert f"Revenue: ${1000 + 1000 * i + 7}M" in page.page_content
+        assert f"Total  1.{i + 5}  3.{i + 2}%" in page.page_content
+        assert "ACME Corp" not in page.page_content
+        assert "Page" not in page.page_content
+
+
+def test_identical_rows_are_still_boilerplate():
+    pages = _pages([f"Disclaimer: figures in USD  1  2\nBody {i}" for i in range(4)])
+    stripped, _ = strip_boilerplate(pages)
+
+    assert all("Disclaimer" not in p.page_content for p in stripped)
+
+
+def test_dates_are_normalised():
+    pages = [Document(page_content=f"Printed 2024-0{i + 1}-15 14:0{i}\nBody {i}") for i in range(3)]
+    stripped, removed = strip_boilerplate(pages)
+
+    assert removed == 3
+    assert [p.page_content for p in stripped] == ["Body 0", "Body 1", "Body 2"]
+
+
+def test_near_duplicates_merged():
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = [
+        Document(page_content=text, metadata={"page": 0}),
+        Document(page_content=text.replace("word100", "changed"), metadata={"page": 3}),
+        Document(page_content="something else entirely, unrelated to the rest", metadata={"page": 5}),
+    ]
+    unique, report = deduplicate(chunks)
+
+    assert len(unique) == 2
+    assert report.near_duplicates == 1
+    assert unique[0].metadata["duplicate_pages"] == [3]
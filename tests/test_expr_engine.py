@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expr_engine import MAX_ROUND_DIGITS, ExpressionError, compile_expression, evaluate
+
+
+@pytest.mark.parametrize("digits", ["-10**9", "-10**7", str(MAX_ROUND_DIGITS + 1), f"-{MAX_ROUND_DIGITS + 1}"])
+def test_round_digits_are_bounded(digits):
+    started = time.perf_counter()
+    with pytest.raises(ExpressionError, match="round"):
+        evaluate(f"round(7, {digits})")
+    assert time.perf_counter() - started < 1
+
+
+def test_round_within_bounds():
+    assert evaluate("round(1234.5678, 2)") == 1234.57
+    assert evaluate("round(1234, -2)") == 1200
+    assert evaluate(f"round(7, -{MAX_ROUND_DIGITS})") == 0
+
+
+def test_vectorized_round_digits_are_bounded():
+    import numpy as np
+
+    with pytest.raises(ExpressionError, match="round"):
+        compile_expression("round(x, -10**9)").vectorized(x=np.arange(3))
+    assert compile_expression("round(x / 3, 2)").vectorized(x=np.arange(3)).tolist() == [0.0, 0.33, 0.67]
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_tokenizer import analyze_chunks, analyze_text
+
+
+def test_indonesian_numbers_are_one_word():
+    stats = analyze_text("Total penjualan Rp 1.500.000 naik 3,5 persen. Bagus.")
+    summary = stats.summary()
+
+    assert summary["words"] == 8
+    assert summary["sentences"] == 2
+    words = dict(stats.top_words(20))
+    assert words["1.500.000"] == 1 and words["3,5"] == 1
+    assert "500" not in words and "000" not in words
+
+
+def test_number_at_sentence_end():
+    summary = analyze_text("Harganya naik jadi 10.000. Turun lagi ke 9.500!").summary()
+
+    assert summary["words"] == 8
+    assert summary["sentences"] == 2
+
+
+def test_reduplication_and_chunk_boundaries():
+    text = "Anak-anak bermain sehari-hari. Jum'at libur 2.500,75 kali."
+    whole = analyze_text(text)
+    chunked = analyze_chunks(text[i:i + 7] for i in range(0, len(text), 7))
+
+    assert whole.summary() == chunked.summary()
+    assert whole.summary()["words"] == 7 and whole.summary()["sentences"] == 2
+    assert dict(whole.top_words())["anak-anak"] == 1
@@ -0,0 +1,320 @@
+import bisect
+import functools
+import hashlib
+import json
+import os
+import re
+from typing import NamedTuple
+
+from prompting import estimate_tokens
+from structured_log import get_logger, kv
+
+# Token-aware splitter for the RAG ingestion path (rag.py).
+#
+# RecursiveCharacterTextSplitter sizes chunks in characters and re-splits the
+# text recursively (a new substring per level). This one makes a single pass:
+#
+#   1. lines are scanned by index (no copies) and grouped into paragraphs and
+#      table blocks (financial PDFs: rows full of numbers / column gaps / pipes)
+#   2. paragraphs are cut into sentences (abbreviations like "Inc." or "U.S."
+#      do not end a sentence); a table block is one unit
+#   3. every unit is measured in model tokens once, then units are packed
+#      greedily up to max_tokens, with whole sentences as overlap
+#
+# A table only gets split (by rows) when it alone is bigger than a chunk, and a
+# sentence or row only when it alone is bigger than a chunk (between words, and
+# a word bigger than a chunk by characters), so no chunk exceeds max_tokens.
+#
+# split_documents() joins the pages of one source first, so a chunk is not cut
+# short just because a PDF page ended.
+#
+# Results are cached by sha256 of the text + settings: in memory, and on disk
+# when SPLIT_CACHE_DIR is set, so re-ingesting an unchanged PDF skips the split.
+#
+# Tokens are counted with tiktoken (cl100k_base) when it is installed, else the
+# ~4 chars/token estimate from prompting.py (SPLITTER_TOKENIZER=chars to force it).
+
+log = get_logger("text_splitting")
+
+MAX_TOKENS = 512
+OVERLAP_TOKENS = 48
+
+_ABBREVIATIONS = frozenset(
+    "inc corp co ltd plc llc no vs etc e.g i.e mr mrs ms dr st jan feb mar apr jun jul aug sep sept oct nov dec "
+    "u.s u.k fig approx est".split()
+)
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9$])")
+_WORD_BEFORE = re.compile(r"([\w.]+)[.!?][\"')\]]*\s*$")
+_COLUMN_GAP = re.compile(r"\S(?: {2,}|\t)\S")
+_TWO_DIGITS = re.compile(r"\d\D*\d")
+_FIGURES = re.compile(r"[\d.,%$()-]+")
+
+
+class Chunk(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    kind: str          # "sentence" | "table" | "row" | "word"
+
+
+@functools.cache
+def token_counter(name: str = None):
+    """(name, fn(text) -> tokens)."""
+    name = name or os.getenv("SPLITTER_TOKENIZER", "cl100k_base")
+    if name != "chars":
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(name)
+            return name, lambda text: len(encoding.encode_ordinary(text))
+        except Exception as e:   # not installed, unknown name, or the BPE file cannot be downloaded (offline)
+            log.warning("tokenizer unavailable, using the chars/4 estimate", extra=kv(tokenizer=name, error=str(e)[:200]))
+    return "chars", estimate_tokens
+
+
+# =============== UNITS ===============
+def _is_table_row(text: str, start: int, end: int) -> bool:
+    if text.count("|", start, end) >= 2:
+        return True
+    if not _TWO_DIGITS.search(text, start, end):
+        return False
+    if _COLUMN_GAP.search(text, start, end):
+        return True
+    # mostly figures: "Apple 383.3 391.0 2.0% $3.8T"
+    figures = sum(map(len, _FIGURES.findall(text, start, end)))
+    visible = (end - start) - text.count(" ", start, end)
+    return figures >= 0.4 * max(visible, 1)
+
+
+def _lines(text: str):
+    """(start, end) of every line, end excluding the newline."""
+    start, size = 0, len(text)
+    while start < size:
+        end = text.find("\n", start)
+        if end < 0:
+            end = size
+        yield start, end
+        start = end + 1
+
+
+def _sentences(text: str, start: int, end: int):
+    """Sentence spans inside a paragraph span."""
+    begin = start
+    for match in _SENTENCE_END.finditer(text, start, end):
+        before = _WORD_BEFORE.search(text, max(begin, match.start() - 12), match.end())
+        if before and before.group(1).lower().rstrip(".") in _ABBREVIATIONS:
+            continue
+        yield begin, match.end()
+        begin = match.end()
+    if begin < end:
+        yield begin, end
+
+
+def _blocks(text: str):
+    """("prose" | "table", [(start, end) of its lines]) in document order."""
+    kind, lines = None, []
+    for start, end in _lines(text):
+        if text[start:end].isspace() or start == end:
+            if lines:
+                yield kind, lines
+            kind, lines = None, []
+            continue
+        line_kind = "table" if _is_table_row(text, start, end) else "prose"
+        if line_kind != kind and lines:
+            yield kind, lines
+            lines = []
+        kind = line_kind
+        lines.append((start, end))
+    if lines:
+        yield kind, lines
+
+
+def _units(text: str, count, max_tokens: int):
+    for kind, lines in _blocks(text):
+        if kind == "table":
+            rows = [_Unit(s, e, count(text[s:e]), "row") for s, e in lines]
+            total = count(text[lines[0][0]:lines[-1][1]])   # the newlines between rows count too
+            if total <= max_tokens:
+                yield _Unit(lines[0][0], lines[-1][1], total, "table")
+            else:
+                for row in rows:
+                    if row.tokens <= max_tokens:
+                        yield row
+                    else:
+                        yield from _words(text, row.start, row.end, count, max_tokens)
+            continue
+        for s, e in _sentences(text, lines[0][0], lines[-1][1]):
+            tokens = count(text[s:e])
+            if tokens <= max_tokens:
+                yield _Unit(s, e, tokens, "sentence")
+            else:
+                yield from _words(text, s, e, count, max_tokens)
+
+
+def _words(text: str, start: int, end: int, count, max_tokens: int):
+    """Last resort for a single sentence bigger than a chunk: cut between words."""
+    piece_start, piece_tokens = start, 0
+    for match in re.finditer(r"\S+\s*", text[start:end]):
+        tokens = count(match.group())
+        if tokens > max_tokens:
+            if piece_tokens:
+                yield _Unit(piece_start, start + match.start(), piece_tokens, "word")
+            yield from _cut(text, start + match.start(), start + match.end(), count, max_tokens)
+            piece_tokens = 0
+            continue
+        if piece_tokens and piece_tokens + tokens > max_tokens:
+            yield _Unit(piece_start, start + match.start(), piece_tokens, "word")
+            piece_tokens = 0
+        if not piece_tokens:
+            piece_start = start + match.start()   # leading whitespace is left to the gap between units
+        piece_tokens += tokens
+    if piece_tokens:
+        yield _Unit(piece_start, end, piece_tokens, "word")
+
+
+def _cut(text: str, start: int, end: int, count, max_tokens: int):
+    """A single "word" bigger than a chunk (a URL, base64, a run without spaces): cut by characters."""
+    while start < end:
+        size = min(end - start, 4 * max_tokens)
+        tokens = count(text[start:start + size])
+        while tokens > max_tokens and size > 1:
+            size = max(1, size * max_tokens // tokens)
+            tokens = count(text[start:start + size])
+        yield _Unit(start, start + size, tokens, "word")
+        start += size
+
+
+# =============== PACKING ===============
+def _pack(units, text: str, count, max_tokens: int, overlap_tokens: int):
+    def gap(before, after):
+        # blank lines between blocks belong to no unit but are inside the chunk span
+        return count(text[before.end:after.start]) if after.start > before.end else 0
+
+    chunks, current, size = [], [], 0
+    for unit in units:
+        join = gap(current[-1], unit) if current else 0
+        if current and size + join + unit.tokens > max_tokens:
+            chunks.append(Chunk(current[0].start, current[-1].end, size))
+            # carry whole trailing sentences as overlap (never tables)
+            carry, carried = [], 0
+            for previous in reversed(current):
+                extra = previous.tokens + (gap(previous, carry[0]) if carry else 0)
+                if previous.kind != "sentence" or carried + extra > overlap_tokens:
+                    break
+                carry.insert(0, previous)
+                carried += extra
+            join = gap(carry[-1], unit) if carry else 0
+            if carried + join + unit.tokens > max_tokens:
+                carry, carried, join = [], 0, 0
+            current, size = carry, carried
+        current.append(unit)
+        size += join + unit.tokens
+    if current:
+        chunks.append(Chunk(current[0].start, current[-1].end, size))
+    return chunks
+
+
+_memory_cache = {}
+_CACHE_VERSION = 2   # bump when the packing changes, so old spans on disk are not reused
+
+
+def _cache_path(key: str):
+    directory = os.getenv("SPLIT_CACHE_DIR")
+    return os.path.join(directory, key[:2], key + ".json") if directory else None
+
+
+def split_spans(text: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS,
+                tokenizer: str = None) -> list:
+    """Chunk spans (start, end, tokens) of `text`, cached by content hash + settings."""
+    name, count = token_counter(tokenizer)
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    key = hashlib.sha256(f"{digest}:{max_tokens}:{overlap_tokens}:{name}:{_CACHE_VERSION}".encode()).hexdigest()
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    path = _cache_path(key)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            chunks = [Chunk(*c) for c in json.load(f)]
+    else:
+        chunks = _pack(_units(text, count, max_tokens), text, count, max_tokens, overlap_tokens)
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+    _memory_cache[key] = chunks
+    return chunks
+
+
+def split_text(text: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS,
+               tokenizer: str = None) -> list:
+    return [text[c.start:c.end].strip() for c in split_spans(text, max_tokens, overlap_tokens, tokenizer)]
+
+
+class TokenSentenceSplitter:
+    """Drop-in for the LangChain splitters' split_documents()."""
+
+    def __init__(self, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS, tokenizer: str = None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = tokenizer
+
+    def split_text(self, text: str) -> list:
+        return split_text(text, self.max_tokens, self.overlap_tokens, self.tokenizer)
+
+    def split_documents(self, documents) -> list:
+        """Split consecutive pages of the same source as one text, so chunks can cross page breaks.
+
+        Each chunk keeps the metadata of the page it starts on, plus "pages" (first-last page index).
+        """
+        from langchain_core.documents import Document
+
+        out = []
+        for group in _by_source(documents):
+            text, offsets = _join(group)
+            for i, chunk in enumerate(split_spans(text, self.max_tokens, self.overlap_tokens, self.tokenizer)):
+                raw = text[chunk.start:chunk.end]
+                content = raw.strip()
+                if not content:
+                    continue
+                start = chunk.start + len(raw) - len(raw.lstrip())
+                first = bisect.bisect_right(offsets, start) - 1
+                last = bisect.bisect_right(offsets, start + len(content) - 1) - 1
+                metadata = {
+                    **group[first].metadata,
+                    "chunk": i,
+                    "start_index": start - offsets[first],
+                    "pages": f"{group[first].metadata.get('page', first)}-{group[last].metadata.get('page', last)}",
+                    "tokens": chunk.tokens,
+                }
+                out.append(Document(page_content=content, metadata=metadata))
+        return out
+
+
+PAGE_BREAK = "\n\n"
+
+
+def _by_source(documents):
+    group = []
+    for doc in documents:
+        if group and doc.metadata.get("source") != group[-1].metadata.get("source"):
+            yield group
+            group = []
+        group.append(doc)
+    if group:
+        yield group
+
+
+def _join(pages):
+    """(text, start offset of every page in it)."""
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page.page_content) + len(PAGE_BREAK)
+    return PAGE_BREAK.join(p.page_content for p in pages), offsets
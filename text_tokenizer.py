@@ -0,0 +1,126 @@
+import re
+from collections import Counter
+
+from data_sources import resolve_path
+
+# Word / sentence counting for text_analyzer and word_frequency (react_3.py).
+#
+# One compiled regex walks the (lower-cased) text once and yields either a
+# word or a run of sentence punctuation (re.findall + Counter, both in C);
+# only the top-k words come back (Counter.most_common(k) is a heap selection,
+# not a full sort). Input can be a string, an iterable of chunks or a file, so a
+# multi-megabyte book is never split/copied several times.
+#
+# Words are runs of Unicode word characters, with Indonesian reduplication and
+# apostrophes kept in one token: "anak-anak", "sehari-hari", "jum'at". Numbers
+# with thousands / decimal separators are one word too, so "Rp 1.500.000" or
+# "3,5 persen" do not end a sentence or split into "1", "500", "000".
+#
+#   analyze_text("Halo dunia. Halo lagi!").summary()
+#   analyze_file("buku.txt").top_words(20, exclude_stopwords=True)
+
+TOP_K = 20
+MAX_TOP_K = 200
+CHUNK_SIZE = 1 << 20           # characters per read when streaming a file
+MAX_TAIL = 1 << 16             # longest token we wait for across a chunk boundary
+
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)+|\w+(?:[-'’]\w+)*|[.!?…]+")
+_ENDS = ".!?…"
+_WHITESPACE = " \t\n\r\f\v"
+
+# Kata umum bahasa Indonesia (+ beberapa bahasa Inggris) yang biasanya tidak menarik di top-k
+STOPWORDS = frozenset("""
+yang dan di ke dari ini itu untuk dengan pada adalah dalam tidak akan juga atau ada karena oleh
+sebagai saya kamu kami kita mereka dia ia anda bisa sudah telah masih lebih harus hanya jika
+kalau saat agar supaya namun tetapi tapi maka lalu setelah sebelum seperti bagi para pun nya
+the a an and or of to in on for is are was were be it this that with as at by from
+""".split())
+
+
+class TextStats:
+    """Running counts, fed chunk by chunk (a token split across two chunks is joined)."""
+
+    def __init__(self):
+        self.words = Counter()
+        self.word_count = 0
+        self.char_count = 0
+        self.whitespace_count = 0
+        self.sentence_count = 0
+        self._open_sentence = False    # words seen since the last . ! ?
+        self._tail = ""
+
+    def _scan(self, text: str):
+        tokens = _TOKEN.findall(text.lower())
+        if not tokens:
+            return
+        counts = Counter(tokens)
+        ends = [t for t in counts if t[0] in _ENDS]
+        self.sentence_count += sum(counts.pop(t) for t in ends)
+        if tokens[0][0] in _ENDS and not self._open_sentence:
+            self.sentence_count -= 1       # punctuation with no sentence before it
+        self._open_sentence = tokens[-1][0] not in _ENDS
+        self.word_count += sum(counts.values())
+        self.words.update(counts)
+
+    def feed(self, chunk: str):
+        self.char_count += len(chunk)
+        self.whitespace_count += sum(chunk.count(c) for c in _WHITESPACE)
+        text = self._tail + chunk
+        cut = max(text.rfind(c) for c in _WHITESPACE)
+        if cut < 0 and len(text) < MAX_TAIL:
+            self._tail = text
+            return self
+        cut = len(text) if cut < 0 else cut
+        self._scan(text[:cut])
+        self._tail = text[cut:]
+        return self
+
+    def close(self):
+        if self._tail:
+            self._scan(self._tail)
+            self._tail = ""
+        if self._open_sentence:      # last sentence without a full stop
+            self.sentence_count += 1
+            self._open_sentence = False
+        return self
+
+    def top_words(self, k: int = TOP_K, exclude_stopwords: bool = False):
+        k = max(1, min(int(k), MAX_TOP_K))
+        if not exclude_stopwords:
+            return self.words.most_common(k)
+        # most_common over a filtered view; over-fetch so stopwords do not eat the k slots
+        candidates = self.words.most_common(k + len(STOPWORDS))
+        return [(w, c) for w, c in candidates if w not in STOPWORDS][:k]
+
+    def summary(self) -> dict:
+        sentences = self.sentence_count
+        return {
+            "words": self.word_count,
+            "chars": self.char_count,
+            "chars_no_whitespace": self.char_count - self.whitespace_count,
+            "sentences": sentences,
+            "unique_words": len(self.words),
+            "words_per_sentence": round(self.word_count / sentences, 2) if sentences else 0,
+        }
+
+
+def analyze_chunks(chunks) -> TextStats:
+    stats = TextStats()
+    for chunk in chunks:
+        stats.feed(chunk)
+    return stats.close()
+
+
+def analyze_text(text: str) -> TextStats:
+    return TextStats().feed(text).close()
+
+
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    """Text file in chunks (paths are confined to STATS_DATA_DIR, see data_sources.py)."""
+    with open(resolve_path(path), encoding="utf-8", errors="replace") as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            yield chunk
+
+
+def analyze_file(path: str, chunk_size: int = CHUNK_SIZE) -> TextStats:
+    return analyze_chunks(read_chunks(path, chunk_size))
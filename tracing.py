@@ -0,0 +1,303 @@
+import argparse
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Per-step latency and token instrumentation for the agent graphs.
+#
+# - TraceCallbackHandler: LangChain callback that times every graph node,
+#   every LLM call (with token usage) and every tool call. Attach it once:
+#       agent = traced_graph(graph.compile())
+# - span() / traced(): time anything else (SQL execution, retriever calls)
+#
+# Every record goes to an in-process Prometheus-style registry and, when
+# TRACE_FILE is set, to a JSON-lines file. Summarise a trace file with:
+#   python tracing.py summarize trace.jsonl
+
+
+# =============== METRICS REGISTRY ===============
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Minimal counters + histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.gauges = {}      # name -> callable
+
+    def inc(self, name: str, value: float = 1, /, **labels) -> None:
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, /, **labels) -> None:
+        key = (name, _labels_key(labels))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def gauge(self, name: str, fn) -> None:
+        """Register a gauge whose value is read at render time."""
+        self.gauges[name] = fn
+
+    def render(self) -> str:
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{fmt(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                for bound, count in zip(LATENCY_BUCKETS, hist):
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist[-1]}")
+                lines.append(f"{name}_sum{fmt(labels)} {hist[-2]}")
+                lines.append(f"{name}_count{fmt(labels)} {hist[-1]}")
+        for name, fn in sorted(self.gauges.items()):
+            lines.append(f"{name} {fn()}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def start_metrics_server(port: int = 9464) -> ThreadingHTTPServer:
+    """Serve registry.render() on http://127.0.0.1:<port>/metrics."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200 if self.path == "/metrics" else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =============== TRACE FILE ===============
+class TraceWriter:
+    """Buffered JSON-lines writer; flushed every `flush_every` records and at exit."""
+
+    def __init__(self, path: str, flush_every: int = 64):
+        self.file = open(path, "a", encoding="utf-8")
+        self.flush_every = flush_every
+        self.buffer = []
+        self.lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.file.flush()
+            self.buffer.clear()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush_locked()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    path = os.getenv("TRACE_FILE")
+    if not path:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TraceWriter(path)
+    return _writer
+
+
+def record(kind: str, name: str, seconds: float, **fields) -> None:
+    """Record one timed step (kind: node | llm | tool | sql | retriever)."""
+    registry.observe("agent_step_seconds", seconds, kind=kind, name=name)
+    writer = _get_writer()
+    if writer is not None:
+        writer.write({"ts": time.time(), "kind": kind, "name": name, "ms": round(seconds * 1000, 3), **fields})
+
+
+@contextmanager
+def span(kind: str, name: str, **fields):
+    """Time a block; extra fields can be added to the yielded dict."""
+    extra = dict(fields)
+    started = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        record(kind, name, time.perf_counter() - started, **extra)
+
+
+def traced(kind: str, name: str = None):
+    """Decorator version of span()."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =============== LANGCHAIN CALLBACKS ===============
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Times graph nodes, LLM calls (with token usage) and tool calls."""
+
+    def __init__(self):
+        self.started = {}  # run_id -> (kind, name, start, node)
+
+    def _start(self, run_id, kind, name, metadata):
+        node = (metadata or {}).get("langgraph_node")
+        self.started[run_id] = (kind, name, time.perf_counter(), node)
+
+    def _end(self, run_id, **fields):
+        entry = self.started.pop(run_id, None)
+        if entry is None:
+            return
+        kind, name, started, node = entry
+        if node and node != name:
+            fields["node"] = node
+        record(kind, name, time.perf_counter() - started, **fields)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        # Only the node runnables themselves, not everything nested inside them
+        if metadata and name and name == metadata.get("langgraph_node"):
+            self._start(run_id, "node", name, metadata)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        name = (metadata or {}).get("ls_model_name") or kwargs.get("name") or "chat_model"
+        self._start(run_id, "llm", name, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        fields = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            usage = {}
+        if usage:
+            fields = {"input_tokens": usage.get("input_tokens", 0), "output_tokens": usage.get("output_tokens", 0)}
+            registry.inc("llm_tokens_total", fields["input_tokens"], direction="input")
+            registry.inc("llm_tokens_total", fields["output_tokens"], direction="output")
+        registry.inc("llm_calls_total")
+        self._end(run_id, **fields)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, "tool", name, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+
+tracer = TraceCallbackHandler()
+
+
+def traced_graph(compiled_graph):
+    """Attach the tracing callback to a compiled graph."""
+    return compiled_graph.with_config({"callbacks": [tracer]})
+
+
+# =============== SUMMARY CLI ===============
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(path: str, kind: str = None) -> list:
+    """p50/p95/p99 (ms) per (kind, name) from a trace file."""
+    groups = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if kind and entry["kind"] != kind:
+                continue
+            groups.setdefault((entry["kind"], entry["name"]), []).append(entry["ms"])
+
+    rows = []
+    for (k, name), values in sorted(groups.items()):
+        values.sort()
+        rows.append({
+            "kind": k,
+            "name": name,
+            "count": len(values),
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "total": sum(values),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise agent trace files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summarize", help="p50/p95/p99 per node from a trace file")
+    summary.add_argument("path")
+    summary.add_argument("--kind", help="only node | llm | tool | sql | retriever")
+    args = parser.parse_args()
+
+    rows = summarize(args.path, args.kind)
+    print(f"{'kind':<10} {'name':<32} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'total ms':>12}")
+    for row in rows:
+        print(f"{row['kind']:<10} {row['name'][:32]:<32} {row['count']:>7} "
+              f"{row['p50']:>10.2f} {row['p95']:>10.2f} {row['p99']:>10.2f} {row['total']:>12.1f}")
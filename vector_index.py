@@ -0,0 +1,368 @@
+import json
+import os
+import time
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from tracing import registry
+
+# Compact vector index for rag.py, as an alternative to Chroma (RAG_INDEX=int8).
+#
+# Chroma keeps every embedding as float32 (4 bytes per dimension). Here the
+# scanned copy ("codes") is stored smaller and the float32 vectors stay on disk,
+# memory-mapped, for re-ranking:
+#
+#   float32  4 bytes/dim  exact, the reference the others are measured against
+#   float16  2 bytes/dim  half the RAM but SLOWER to query: NumPy has no fast
+#                         float16 matmul, so every scan converts each block to
+#                         float32 (~9x the float32 query time at 20k x 128);
+#                         only worth it when RAM, not latency, is the limit
+#   int8     1 bytes/dim  per-dimension scalar quantization (min/max -> 256 levels)
+#
+# A query scans the codes for the top k * rerank candidates, then re-scores only
+# those candidates against the full-precision vectors (a few pages of the
+# memory-mapped file), so int8 holds 4x the chunks in the same RAM with
+# recall@k close to 1.
+#
+# Vectors are L2-normalised, the score is the inner product (= cosine).
+#
+#   index = build_index(chunks, embeddings, "index_dir", kind="int8")
+#   retriever = index.as_retriever(embeddings, k=5)     # same .invoke(query) as Chroma's
+#   index = VectorIndex.load("index_dir")
+#   index.recall(query_vectors, k=10)                   # vs. an exact float32 scan
+
+KINDS = ("float32", "float16", "int8")
+RERANK = 4              # candidates re-ranked per result (k * RERANK)
+SCAN_BLOCK = 4096       # rows converted to float32 per step: small enough to stay in cache
+QUERY_BLOCK = 16        # queries scored together (bounds the (queries, vectors) score matrix)
+EMBED_BATCH = 256
+
+
+def normalize(vectors):
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def recall_at_k(found, truth) -> float:
+    """Mean fraction of the true top-k ids (rows of `truth`) that were found."""
+    hits = sum(len(set(f[f >= 0].tolist()) & set(t[t >= 0].tolist())) for f, t in zip(found, truth))
+    return hits / max(1, sum(int((t >= 0).sum()) for t in truth))
+
+
+# =============== QUANTIZATION ===============
+class ScalarQuantizer:
+    """int8 code = round((x - lo) / scale) - 128, one (lo, scale) per dimension."""
+
+    def __init__(self, lo, scale):
+        self.lo = lo
+        self.scale = scale
+
+    @classmethod
+    def fit(cls, vectors, block: int = 65_536):
+        import numpy as np
+
+        lo = np.full(vectors.shape[1], np.inf, dtype=np.float32)
+        hi = np.full(vectors.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, len(vectors), block):
+            part = vectors[start:start + block]
+            np.minimum(lo, part.min(axis=0), out=lo)
+            np.maximum(hi, part.max(axis=0), out=hi)
+        scale = (hi - lo) / 255
+        scale[scale == 0] = 1.0
+        return cls(lo, scale.astype(np.float32))
+
+    def encode(self, vectors):
+        import numpy as np
+
+        codes = np.rint((vectors - self.lo) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return (codes.astype("float32") + 128) * self.scale + self.lo
+
+    def query_terms(self, queries):
+        """(weights, bias): q . decode(c) == c @ weights + bias, so codes never have to be decoded."""
+        weights = queries * self.scale
+        bias = queries @ self.lo + 128 * weights.sum(axis=-1)
+        return weights, bias
+
+
+def _encode(vectors, kind: str, quantizer=None, block: int = 65_536):
+    """Codes for a (possibly memory-mapped) float32 array, a block at a time."""
+    import numpy as np
+
+    codes = np.empty(vectors.shape, dtype=np.int8 if kind == "int8" else np.dtype(kind))
+    for start in range(0, len(vectors), block):
+        part = np.asarray(vectors[start:start + block], dtype=np.float32)
+        codes[start:start + len(part)] = quantizer.encode(part) if kind == "int8" else part
+    return codes
+
+
+def _top_k(scores, k: int):
+    """(ids, scores) of the k best columns per row, best first."""
+    import numpy as np
+
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.int64), np.empty((len(scores), 0), dtype=np.float32)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+# =============== INDEX ===============
+class VectorIndex:
+    """Flat (exhaustive) index over compact codes, with full-precision re-ranking."""
+
+    def __init__(self, codes, kind: str, quantizer: ScalarQuantizer = None, vectors=None, docstore=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown index kind '{kind}' (choose from {', '.join(KINDS)})")
+        self.codes = codes
+        self.kind = kind
+        self.quantizer = quantizer
+        self.vectors = vectors          # float32, usually memory-mapped; None = no re-rank
+        self.docstore = docstore
+
+    @classmethod
+    def build(cls, vectors, kind: str = "int8", docstore=None):
+        """Index already-normalised float32 vectors (an array or a memmap)."""
+        quantizer = ScalarQuantizer.fit(vectors) if kind == "int8" else None
+        codes = _encode(vectors, kind, quantizer) if kind != "float32" else vectors
+        return cls(codes, kind, quantizer, vectors if kind != "float32" else None, docstore)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes that have to stay in RAM for a scan (codes + quantizer), not the memory-mapped vectors."""
+        extra = 2 * 4 * self.dim if self.quantizer is not None else 0
+        return int(self.codes.nbytes) + extra
+
+    def _scores(self, queries, block: int = SCAN_BLOCK):
+        """(queries, vectors) scores, scanning the codes a cache-sized block at a time."""
+        import numpy as np
+
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        weights, bias = self.quantizer.query_terms(queries) if self.kind == "int8" else (queries, None)
+        weights = np.ascontiguousarray(weights.T)
+        for start in range(0, len(self.codes), block):
+            part = self.codes[start:start + block]
+            np.matmul(part.astype(np.float32, copy=False), weights, out=scores[:, start:start + len(part)].T)
+        if bias is not None:
+            scores += bias[:, None]
+        return scores
+
+    def _scan(self, queries, k: int):
+        import numpy as np
+
+        ids, scores = [], []
+        for start in range(0, len(queries), QUERY_BLOCK):
+            block_ids, block_scores = _top_k(self._scores(queries[start:start + QUERY_BLOCK]), k)
+            ids.append(block_ids)
+            scores.append(block_scores)
+        return np.concatenate(ids), np.concatenate(scores)
+
+    def _rerank(self, queries, candidates, k: int):
+        import numpy as np
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, (query, cand) in enumerate(zip(queries, candidates)):
+            cand = np.unique(cand[cand >= 0])          # sorted: sequential reads from the memmap
+            exact = self.vectors[cand] @ query
+            best = np.argsort(-exact)[:k]
+            ids[row, :len(best)] = cand[best]
+            scores[row, :len(best)] = exact[best]
+        return ids, scores
+
+    def search(self, queries, k: int = 5, rerank: int = RERANK):
+        """(ids, scores), each (queries, k); ids are -1 where the index has fewer than k vectors."""
+        import numpy as np
+
+        queries = normalize(queries)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        started = time.perf_counter()
+        if rerank and self.vectors is not None:
+            ids, scores = self._rerank(queries, self._scan(queries, k * rerank)[0], k)
+        else:
+            ids, scores = self._scan(queries, k)
+            if ids.shape[1] < k:
+                pad = k - ids.shape[1]
+                ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+                scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        registry.observe("vector_index_search_seconds", time.perf_counter() - started, kind=self.kind)
+        return (ids[0], scores[0]) if single else (ids, scores)
+
+    def recall(self, queries, k: int = 5, **search_kwargs) -> float:
+        """recall@k of search() against an exact float32 scan of the same (memory-mapped) vectors."""
+        if self.vectors is None:
+            return 1.0
+        truth, _ = VectorIndex(self.vectors, "float32").search(queries, k)
+        found, _ = self.search(queries, k, **search_kwargs)
+        return recall_at_k(found.reshape(truth.shape), truth)
+
+    def as_retriever(self, embeddings, k: int = 5, **search_kwargs):
+        return IndexRetriever(index=self, embeddings=embeddings, k=k, search_kwargs=search_kwargs)
+
+    # =============== PERSISTENCE ===============
+    def save(self, directory: str, info: dict = None) -> str:
+        """codes.npy + meta.json (+ quantizer.npz); the vectors/documents are written by build_index.
+
+        `info` (e.g. the embedding model and splitter settings) is kept in meta.json as is.
+        """
+        import numpy as np
+
+        os.makedirs(directory, exist_ok=True)
+        if self.kind != "float32":
+            np.save(os.path.join(directory, "codes.npy"), self.codes)
+        if self.quantizer is not None:
+            np.savez(os.path.join(directory, "quantizer.npz"), lo=self.quantizer.lo, scale=self.quantizer.scale)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"type": "flat", "kind": self.kind, "count": len(self), "dim": self.dim, "info": info or {}}, f)
+        return directory
+
+    @classmethod
+    def load(cls, directory: str):
+        import numpy as np
+
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        docstore = DocumentStore.open(directory) if DocumentStore.exists(directory) else None
+        if meta["kind"] == "float32":
+            return cls(vectors, "float32", docstore=docstore)
+        quantizer = None
+        if meta["kind"] == "int8":
+            with np.load(os.path.join(directory, "quantizer.npz")) as q:
+                quantizer = ScalarQuantizer(q["lo"], q["scale"])
+        codes = np.load(os.path.join(directory, "codes.npy"))    # the part that lives in RAM
+        return cls(codes, meta["kind"], quantizer, vectors, docstore)
+
+
+def read_meta(directory: str):
+    """meta.json of a saved index (written last, so only a finished build has one), or None."""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_index(directory: str, **kwargs):
+    """VectorIndex or IVFIndex, whichever was saved in `directory`."""
+    kind = read_meta(directory).get("type", "flat")
+    if kind == "ivf":
+        from ivf_index import IVFIndex
+
+        return IVFIndex.load(directory, **kwargs)
+    return VectorIndex.load(directory)
+
+
+# =============== DOCUMENTS ===============
+class DocumentStore:
+    """docs.jsonl + offsets.npy: documents are read back by id with one seek each."""
+
+    def __init__(self, path: str, offsets):
+        self.path = path
+        self.offsets = offsets
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "docs.jsonl"))
+
+    @classmethod
+    def write(cls, directory: str, documents):
+        import numpy as np
+
+        path = os.path.join(directory, "docs.jsonl")
+        offsets = []
+        with open(path, "wb") as f:
+            for doc in documents:
+                offsets.append(f.tell())
+                record = {"page_content": doc.page_content, "metadata": doc.metadata}
+                f.write(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        offsets = np.asarray(offsets, dtype=np.int64)
+        np.save(os.path.join(directory, "offsets.npy"), offsets)
+        return cls(path, offsets)
+
+    @classmethod
+    def open(cls, directory: str):
+        import numpy as np
+
+        return cls(os.path.join(directory, "docs.jsonl"), np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, ids) -> List[Document]:
+        docs = []
+        with open(self.path, "rb") as f:
+            for i in ids:
+                f.seek(int(self.offsets[int(i)]))
+                record = json.loads(f.readline())
+                docs.append(Document(page_content=record["page_content"], metadata=record["metadata"]))
+        return docs
+
+
+class IndexRetriever(BaseRetriever):
+    """LangChain retriever over any index with search(query_vector, k, ...) and a docstore (VectorIndex, IVFIndex)."""
+
+    index: Any
+    embeddings: Any
+    k: int = 5
+    search_kwargs: dict = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                **kwargs) -> List[Document]:
+        # per-call overrides: retriever.invoke(query, nprobe=32)
+        ids, scores = self.index.search(self.embeddings.embed_query(query), self.k, **{**self.search_kwargs, **kwargs})
+        keep = ids >= 0
+        docs = self.index.docstore.get(ids[keep])
+        for doc, score in zip(docs, scores[keep]):
+            doc.metadata["score"] = round(float(score), 4)
+        return docs
+
+
+# =============== BUILD ===============
+def embed_to_file(documents, embeddings, path: str, batch_size: int = EMBED_BATCH):
+    """Embed in batches straight into a float32 .npy (normalised), returned memory-mapped."""
+    import numpy as np
+    from numpy.lib.format import open_memmap
+
+    vectors = None
+    for start in range(0, len(documents), batch_size):
+        batch = normalize(embeddings.embed_documents([d.page_content for d in documents[start:start + batch_size]]))
+        if vectors is None:
+            vectors = open_memmap(path, mode="w+", dtype=np.float32, shape=(len(documents), batch.shape[1]))
+        vectors[start:start + len(batch)] = batch
+    if vectors is None:
+        raise ValueError("Nothing to index: no documents")
+    vectors.flush()
+    del vectors
+    return np.load(path, mmap_mode="r")
+
+
+def build_index(documents, embeddings, directory: str, kind: str = "int8", batch_size: int = EMBED_BATCH,
+                info: dict = None):
+    """Embed `documents`, write vectors + documents + codes under `directory`, return the index."""
+    documents = list(documents)
+    os.makedirs(directory, exist_ok=True)
+    vectors = embed_to_file(documents, embeddings, os.path.join(directory, "vectors.npy"), batch_size)
+    docstore = DocumentStore.write(directory, documents)
+    index = VectorIndex.build(vectors, kind, docstore)
+    index.save(directory, info)
+    return index